@@ -1,12 +1,13 @@
-from .scoring import get_top_80_percent_cpu_multithread_providers
+from .scoring import get_top_80_percent_cpu_multithread_providers, WHITELIST_CACHE_KEY
 from .schemas import BulkTaskCostUpdateSchema
-from .models import BlacklistedOperator, BlacklistedProvider
+from .blacklist import get_blacklisted_provider_ids, get_blacklisted_wallets
 from django.db.models import Count, Q
 from django.utils import timezone
 from ninja import Query
 import os
 from ninja.security import HttpBearer
-import redis
+from core.celery import app
+from core.redis_clients import redis_client, async_redis
 from ninja import NinjaAPI
 from .models import Provider, TaskCompletion, Task
 from .schemas import TaskCompletionSchema, ProviderSuccessRate, TaskCreateSchema, BulkTaskCostUpdateSchema, BulkBenchmarkSchema
@@ -14,7 +15,9 @@ from django.http import JsonResponse
 from typing import List
 import json
 from django.db.models import Count, Q
-from .bulkutils import process_disk_benchmark, process_cpu_benchmark, process_memory_benchmark, process_network_benchmark, process_gpu_task
+from .bulkutils import process_bulk_benchmarks, process_task_completions
+from .submissions import stage_submission, get_submission
+from ninja import Header
 api = NinjaAPI(
     title="Golem Reputation API",
     version="1.0.0",
@@ -30,11 +33,11 @@ class AuthBearer(HttpBearer):
             return token
 
 
-r = redis.Redis(host='redis', port=6379, db=0)
+r = redis_client
 
 
 @api.get("/providers/scores", tags=["Reputation"])
-def list_provider_scores(request, network: str = Query('polygon', description="The network parameter specifies the blockchain network for which provider scores are retrieved. Valid options include 'polygon', 'mainnet' for the main Ethereum network, 'goerli', 'mumbai', or 'holesky' for test networks. Any other value will result in a 404 error, indicating that the network is not supported.")):
+async def list_provider_scores(request, network: str = Query('polygon', description="The network parameter specifies the blockchain network for which provider scores are retrieved. Valid options include 'polygon', 'mainnet' for the main Ethereum network, 'goerli', 'mumbai', or 'holesky' for test networks. Any other value will result in a 404 error, indicating that the network is not supported.")):
     """
     Retrieve provider scores for a specified network.
 
@@ -95,9 +98,11 @@ def list_provider_scores(request, network: str = Query('polygon', description="T
         }
     """
     if network == 'polygon' or network == 'mainnet':
-        response = r.get('provider_scores_v1_mainnet')
+        async with async_redis() as client:
+            response = await client.get('provider_scores_v1_mainnet')
     elif network == 'goerli' or network == 'mumbai' or network == 'holesky':
-        response = r.get('provider_scores_v1_testnet')
+        async with async_redis() as client:
+            response = await client.get('provider_scores_v1_testnet')
     else:
         return JsonResponse({"error": "Network not found"}, status=404)
 
@@ -108,59 +113,49 @@ def list_provider_scores(request, network: str = Query('polygon', description="T
         return JsonResponse({"error": "Data not available"}, status=503)
 
 
+def accept_submission(submission_id, kind, payload):
+    """
+    Stages a bulk upload for the process_bulk_submission task and returns 202.
+    Resubmitting an ID that is already known only returns its current status,
+    unless its processing failed or went stale, in which case it is queued again.
+    """
+    if stage_submission(submission_id, kind, payload):
+        # Sent by name, importing api.tasks would load the scanner's
+        # dependencies (yapapi) into the web workers
+        app.send_task('api.tasks.process_bulk_submission', args=[submission_id])
+    return JsonResponse(get_submission(submission_id), status=202)
+
+
 @api.post("/benchmark/bulk", auth=AuthBearer(), include_in_schema=False,)
-def create_bulk_benchmark(request, bulk_data: BulkBenchmarkSchema):
+def create_bulk_benchmark(request, bulk_data: BulkBenchmarkSchema, x_submission_id: str = Header(None)):
+    if x_submission_id:
+        return accept_submission(x_submission_id, 'benchmark', bulk_data.dict())
+
     organized_data = {"disk": [], "cpu": [],
                       "memory": [], "network": [], "gpu": []}
     for benchmark in bulk_data.benchmarks:
         organized_data[benchmark.type].append(benchmark.data)
 
-    disk_response = process_disk_benchmark(organized_data["disk"])
-    cpu_response = process_cpu_benchmark(organized_data["cpu"])
-    memory_response = process_memory_benchmark(organized_data["memory"])
-    network_response = process_network_benchmark(organized_data["network"])
-    gpu_response = process_gpu_task(organized_data["gpu"])
-
-    return {
-        "disk": disk_response,
-        "cpu": cpu_response,
-        "memory": memory_response,
-        "network": network_response,
-        "gpu": gpu_response
-    }
+    try:
+        return process_bulk_benchmarks(organized_data)
+    except (KeyError, TypeError, ValueError) as e:
+        return JsonResponse({"status": "error", "message": f"Invalid benchmark data: {e!r}"}, status=400)
 
 
 @api.post("/submit/task/status/bulk", auth=AuthBearer(), include_in_schema=False,)
-def create_bulk_task_completion(request, data: List[TaskCompletionSchema]):
-    task_completion_data = []
-    errors = []
-
-    for item in data:
-        try:
-            provider = Provider.objects.filter(node_id=item.node_id).first()
-            task = Task.objects.filter(id=item.task_id).first()
-
-            if not provider or not task:
-                errors.append(f"Provider or Task not found for item with node_id {item.node_id} and task_id {item.task_id}")
-                continue
-
-            task_completion_data.append(TaskCompletion(
-                provider=provider,
-                task=task,
-                task_name=item.task_name,
-                is_successful=item.is_successful,
-                error_message=item.error_message,
-                type=item.type,
-            ))
-        except Exception as e:
-            errors.append(f"Error processing item with node_id {item.node_id}: {str(e)}")
-
-    TaskCompletion.objects.bulk_create(task_completion_data)
-
-    if errors:
-        return {"status": "error", "message": "Errors occurred during processing", "errors": errors}
-    else:
-        return {"status": "success", "message": f"Bulk task completion data saved successfully, processed {len(task_completion_data)} items."}
+def create_bulk_task_completion(request, data: List[TaskCompletionSchema], x_submission_id: str = Header(None)):
+    if x_submission_id:
+        return accept_submission(x_submission_id, 'task_status', [item.dict() for item in data])
+
+    return process_task_completions([item.dict() for item in data])
+
+
+@api.get("/submissions/{submission_id}", auth=AuthBearer(), include_in_schema=False,)
+def submission_status(request, submission_id: str):
+    submission = get_submission(submission_id)
+    if submission is None:
+        return JsonResponse({"status": "error", "message": "Submission not found"}, status=404)
+    return submission
 
 
 @api.get("scores/task", response=List[ProviderSuccessRate], include_in_schema=False,)
@@ -202,13 +197,8 @@ def provider_success_rate(request):
     """,
     response=List[str]
 )
-def blacklisted_operators(request):
-    rejected_operators = BlacklistedOperator.objects.all().values('wallet')
-    # Extracting just the wallet field from each object
-    rejected_wallets_list = [operator['wallet']
-                             for operator in rejected_operators]
-    print(rejected_wallets_list, "rejected_wallets_list")
-    return rejected_wallets_list
+async def blacklisted_operators(request):
+    return await get_blacklisted_wallets()
 
 
 @api.get(
@@ -221,12 +211,8 @@ def blacklisted_operators(request):
     """,
     response=List[str]
 )
-def blacklisted_providers(request):
-    rejected_providers = BlacklistedProvider.objects.all().values('provider__node_id')
-    # Extracting just the provider__node_id field from each object
-    rejected_node_ids_list = [provider['provider__node_id']
-                              for provider in rejected_providers]
-    return rejected_node_ids_list
+async def blacklisted_providers(request):
+    return await get_blacklisted_provider_ids()
 
 
 @api.post("/task/start",  auth=AuthBearer(), include_in_schema=False,)
@@ -234,7 +220,6 @@ def start_task(request, payload: TaskCreateSchema):
     task = Task.objects.create(name=payload.name, started_at=timezone.now())
     return {"id": task.id, "name": task.name, "started_at": task.started_at}
 
-from stats.tasks import cache_provider_success_ratio
 @api.post("/task/end/{task_id}",  auth=AuthBearer(), include_in_schema=False,)
 def end_task(request, task_id: int, cost: float):
     try:
@@ -244,7 +229,7 @@ def end_task(request, task_id: int, cost: float):
     task.finished_at = timezone.now()
     task.cost = cost
     task.save()
-    cache_provider_success_ratio.delay()
+    app.send_task('stats.tasks.cache_provider_success_ratio')
 
     return {"id": task.id, "finished_at": task.finished_at}
 
@@ -291,10 +276,6 @@ def bulk_update_task_costs(request, payload: BulkTaskCostUpdateSchema):
         return JsonResponse({"status": "error", "message": "An error occurred"}, status=500)
 
 
-# Update with your Redis configuration
-redis_client = redis.Redis(host='redis', port=6379, db=0)
-
-
 @api.post("/task/offer/{task_id}", auth=AuthBearer(), include_in_schema=False,)
 def store_offer(request, task_id: int):
     try:
@@ -352,8 +333,13 @@ def gnv_whitelist(
         3, description="The maximum number of days ago to consider for the benchmark scores.")
 ):
     if paymentNetwork == 'polygon' or paymentNetwork == 'mainnet':
+        cache_key = WHITELIST_CACHE_KEY.format(maxCheckedDaysAgo, topPercent)
+        cached = r.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
         response = get_top_80_percent_cpu_multithread_providers(
             maxCheckedDaysAgo=maxCheckedDaysAgo, topPercent=topPercent)
+        r.set(cache_key, json.dumps(response), ex=300)
     elif paymentNetwork == 'goerli' or paymentNetwork == 'mumbai' or paymentNetwork == 'holesky':
         response = []
     else:
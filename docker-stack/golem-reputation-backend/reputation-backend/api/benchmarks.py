@@ -0,0 +1,149 @@
+import statistics
+import time
+import tracemalloc
+from django.db import connection
+from core.metrics import QueryStats
+from core.scheduling import run_unlocked
+from .models import Provider
+from .online import get_online_node_ids
+from .scoring import calculate_uptime, get_normalized_cpu_scores
+from .synthetic import clear_dataset, generate_dataset
+from . import score_updates, tasks
+from stats import tasks as stats_tasks
+
+# Scaling benchmarks for the jobs whose cost grows with the network. Each job
+# runs against a generated dataset of a given number of providers and records
+# its wall-clock time, peak Python memory and query count.
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+
+
+def uptime_of_online_providers():
+    online_node_ids = get_online_node_ids()
+    for node in Provider.objects.filter(node_id__in=online_node_ids):
+        calculate_uptime(node.node_id, node)
+
+
+def full_score_update():
+    score_updates.r.delete(score_updates.SCORES_STATE_KEY.format('mainnet'))
+    run_unlocked(tasks.update_provider_scores, network='mainnet')
+
+
+def incremental_score_update(changed=0.01):
+    online_node_ids = sorted(get_online_node_ids())
+    score_updates.mark_providers_dirty(online_node_ids[:max(1, int(len(online_node_ids) * changed))])
+    run_unlocked(tasks.update_provider_scores, network='mainnet')
+
+
+# Job name -> callable, in run order: the score snapshot reads the blacklists
+# and the daily stats read the score snapshot
+JOBS = {
+    'get_blacklisted_providers': lambda: run_unlocked(tasks.get_blacklisted_providers),
+    'get_blacklisted_operators': lambda: run_unlocked(tasks.get_blacklisted_operators),
+    'update_provider_scores': full_score_update,
+    # 1% of the online providers changed since the last run
+    'update_provider_scores_incremental': incremental_score_update,
+    'get_normalized_cpu_scores': get_normalized_cpu_scores,
+    'calculate_uptime': uptime_of_online_providers,
+    'populate_daily_provider_stats': lambda: run_unlocked(stats_tasks.populate_daily_provider_stats),
+}
+
+# Compared metric -> ratio above which a job counts as regressed
+REGRESSION_THRESHOLDS = {'seconds': 1.2, 'queries': 1.0, 'peak_memory_mb': 1.2}
+# Run times below this are mostly noise and never count as regressed
+MIN_SECONDS = 0.05
+
+
+def measure(job, repeat=3):
+    """
+    Runs a job once under tracemalloc for its peak memory, then `repeat`
+    times for its run time, which tracemalloc would distort.
+
+    :return: Dictionary with the median and fastest run time, the query count of a timed run and the peak memory.
+    """
+    tracemalloc.start()
+    try:
+        job()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    durations = []
+    queries = None
+    for _ in range(repeat):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            job()
+        durations.append(time.perf_counter() - started)
+        queries = stats.count
+
+    return {
+        'seconds': statistics.median(durations),
+        'min_seconds': min(durations),
+        'queries': queries,
+        'peak_memory_mb': peak / 2 ** 20,
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, jobs=None, repeat=3, dataset=None, log=print):
+    """
+    Seeds a dataset of each size in turn and measures every job against it.
+    Replaces all providers in the current database and the Redis snapshots.
+
+    :param jobs: Names of the jobs to measure, all of JOBS by default.
+    :param dataset: Extra generate_dataset arguments.
+    :return: List of results, one per size and job.
+    """
+    jobs = jobs or list(JOBS)
+    results = []
+    for size in sizes:
+        clear_dataset()
+        started = time.perf_counter()
+        counts = generate_dataset(providers=size, **(dataset or {}))
+        log(f"Seeded {size} providers ({sum(counts.values())} rows) in {time.perf_counter() - started:.1f}s")
+        # The score and percentile jobs normalize against the stored extrema
+        run_unlocked(tasks.refresh_benchmark_extrema)
+
+        for name in jobs:
+            result = {'job': name, 'providers': size, **measure(JOBS[name], repeat)}
+            log(f"  {name}: {result['seconds']:.3f}s, {result['queries']} queries, "
+                f"{result['peak_memory_mb']:.1f} MiB peak")
+            results.append(result)
+    return results
+
+
+def compare_results(base, head):
+    """
+    Pairs up the results of two runs by job and size.
+
+    :return: List of (job, providers, {metric: (base value, head value, ratio, regressed)}).
+    """
+    base_results = {(result['job'], result['providers']): result for result in base}
+    rows = []
+    for result in head:
+        key = (result['job'], result['providers'])
+        if key not in base_results:
+            continue
+        metrics = {}
+        for metric, threshold in REGRESSION_THRESHOLDS.items():
+            before, after = base_results[key][metric], result[metric]
+            ratio = after / before if before else (1.0 if after == before else float('inf'))
+            regressed = ratio > threshold and not (metric == 'seconds' and after < MIN_SECONDS)
+            metrics[metric] = (before, after, ratio, regressed)
+        rows.append((*key, metrics))
+    return rows
+
+
+def format_comparison(rows):
+    """
+    Renders compared results as a table, marking regressions with '!'.
+    """
+    lines = [f"{'job':<32}{'providers':>10}" + "".join(f"{metric:>30}" for metric in REGRESSION_THRESHOLDS)]
+    for job, providers, metrics in rows:
+        line = f"{job:<32}{providers:>10}"
+        for metric in REGRESSION_THRESHOLDS:
+            before, after, ratio, regressed = metrics[metric]
+            line += f"{before:.3g} -> {after:.3g} ({ratio:.2f}x){'!' if regressed else ' '}".rjust(30)
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,153 @@
+from asgiref.sync import sync_to_async
+from core.redis_clients import redis_client, async_redis
+from django.db import transaction
+from .models import Provider, BlacklistedProvider, BlacklistedOperator
+
+# Redis mirrors of the blacklist tables, published by the blacklist tasks
+BLACKLISTED_PROVIDERS_KEY = 'blacklisted_providers'  # SET of node_ids
+BLACKLISTED_WALLETS_KEY = 'blacklisted_wallets'  # SET of wallet addresses
+PROVIDER_WALLETS_KEY = 'provider_wallets'  # HASH node_id -> mainnet wallet address
+# Set once both blacklist sets have been published, so an empty set can be told apart from a cold cache
+BLACKLIST_PUBLISHED_KEY = 'blacklist_published'
+
+r = redis_client
+
+
+def _replace_set(pipe, key, members):
+    pipe.delete(f"{key}:tmp")
+    if members:
+        pipe.sadd(f"{key}:tmp", *members)
+        pipe.rename(f"{key}:tmp", key)
+    else:
+        pipe.delete(key)
+
+
+def publish_blacklisted_providers(provider_ids):
+    """
+    Replaces the blacklisted provider set once the surrounding transaction commits.
+    """
+    def publish():
+        pipe = r.pipeline()
+        _replace_set(pipe, BLACKLISTED_PROVIDERS_KEY, provider_ids)
+        pipe.sadd(BLACKLIST_PUBLISHED_KEY, 'providers')
+        pipe.execute()
+
+    transaction.on_commit(publish)
+
+
+def publish_blacklisted_wallets(wallets):
+    """
+    Replaces the blacklisted wallet set and refreshes the node-to-wallet map
+    once the surrounding transaction commits.
+    """
+    provider_wallets = dict(Provider.objects.filter(
+        wallet_address__isnull=False).values_list('node_id', 'wallet_address'))
+
+    def publish():
+        pipe = r.pipeline()
+        _replace_set(pipe, BLACKLISTED_WALLETS_KEY, wallets)
+        pipe.delete(f"{PROVIDER_WALLETS_KEY}:tmp")
+        if provider_wallets:
+            pipe.hset(f"{PROVIDER_WALLETS_KEY}:tmp", mapping=provider_wallets)
+            pipe.rename(f"{PROVIDER_WALLETS_KEY}:tmp", PROVIDER_WALLETS_KEY)
+        else:
+            pipe.delete(PROVIDER_WALLETS_KEY)
+        pipe.sadd(BLACKLIST_PUBLISHED_KEY, 'wallets')
+        pipe.execute()
+
+    transaction.on_commit(publish)
+
+
+def publish_provider_wallets(provider_wallets):
+    """
+    Updates the node-to-wallet map for providers whose wallet may have changed.
+
+    :param provider_wallets: Mapping of node_id to wallet address (or None).
+    """
+    if not provider_wallets:
+        return
+
+    def publish():
+        pipe = r.pipeline()
+        removed = [node_id for node_id, wallet in provider_wallets.items() if not wallet]
+        updated = {node_id: wallet for node_id, wallet in provider_wallets.items() if wallet}
+        if removed:
+            pipe.hdel(PROVIDER_WALLETS_KEY, *removed)
+        if updated:
+            pipe.hset(PROVIDER_WALLETS_KEY, mapping=updated)
+        pipe.execute()
+
+    transaction.on_commit(publish)
+
+
+def check_blacklist(node_ids):
+    """
+    Checks a list of node IDs against the blacklists.
+
+    Answers from the Redis mirrors in two round trips, falling back to three
+    database queries before the blacklist tasks have published them.
+
+    :return: List of {"node_id", "is_blacklisted_provider", "is_blacklisted_wallet"}, in input order.
+    """
+    if not node_ids:
+        return []
+
+    pipe = r.pipeline()
+    pipe.scard(BLACKLIST_PUBLISHED_KEY)
+    pipe.smismember(BLACKLISTED_PROVIDERS_KEY, node_ids)
+    pipe.hmget(PROVIDER_WALLETS_KEY, node_ids)
+    published, provider_flags, wallets = pipe.execute()
+
+    if published == 2:
+        wallets = [wallet.decode('utf-8') if wallet is not None else None for wallet in wallets]
+        known_wallets = [wallet for wallet in wallets if wallet]
+        wallet_flags = dict(zip(known_wallets, r.smismember(
+            BLACKLISTED_WALLETS_KEY, known_wallets))) if known_wallets else {}
+        provider_flags = [bool(flag) for flag in provider_flags]
+    else:
+        blacklisted_providers = set(BlacklistedProvider.objects.filter(
+            provider_id__in=node_ids).values_list('provider_id', flat=True))
+        provider_wallets = dict(Provider.objects.filter(
+            node_id__in=node_ids).values_list('node_id', 'wallet_address'))
+        wallets = [provider_wallets.get(node_id) for node_id in node_ids]
+        wallet_flags = {wallet: True for wallet in BlacklistedOperator.objects.filter(
+            wallet__in=[wallet for wallet in wallets if wallet]).values_list('wallet', flat=True)}
+        provider_flags = [node_id in blacklisted_providers for node_id in node_ids]
+
+    return [
+        {
+            "node_id": node_id,
+            "is_blacklisted_provider": is_blacklisted_provider,
+            "is_blacklisted_wallet": bool(wallet and wallet_flags.get(wallet)),
+        }
+        for node_id, is_blacklisted_provider, wallet in zip(node_ids, provider_flags, wallets)
+    ]
+
+
+async def _get_published_members(key, kind, query):
+    """
+    Reads a blacklist set from its Redis mirror, or runs `query` against the
+    database before the blacklist task has published it.
+    """
+    async with async_redis() as client:
+        pipe = client.pipeline()
+        pipe.sismember(BLACKLIST_PUBLISHED_KEY, kind)
+        pipe.smembers(key)
+        published, members = await pipe.execute()
+    if published:
+        members = [member.decode('utf-8') for member in members]
+    else:
+        members = await sync_to_async(lambda: list(query()), thread_sensitive=True)()
+    return sorted(members)
+
+
+async def get_blacklisted_provider_ids():
+    return await _get_published_members(
+        BLACKLISTED_PROVIDERS_KEY, 'providers',
+        lambda: BlacklistedProvider.objects.values_list('provider_id', flat=True))
+
+
+async def get_blacklisted_wallets():
+    return await _get_published_members(
+        BLACKLISTED_WALLETS_KEY, 'wallets',
+        lambda: BlacklistedOperator.objects.values_list('wallet', flat=True))
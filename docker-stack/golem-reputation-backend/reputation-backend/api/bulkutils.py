@@ -1,5 +1,12 @@
 from decimal import Decimal
-from .models import Provider, DiskBenchmark, CpuBenchmark, MemoryBenchmark, NetworkBenchmark, GPUTask
+from .models import Provider, DiskBenchmark, CpuBenchmark, MemoryBenchmark, NetworkBenchmark, GPUTask, Task, TaskCompletion
+from django.db import connection, transaction
+from django.utils import timezone
+import io
+from core.metrics import record_ingest
+import json
+from .extrema import record_benchmark_extrema
+from .score_updates import mark_providers_dirty
 
 
 def process_disk_benchmark(data_list):
@@ -211,4 +218,249 @@ def process_gpu_task(data_list):
     # Now, bulk create all GPUTask objects
     GPUTask.objects.bulk_create(gpu_task_objects)
 
-    return {"status": "success", "created_count": len(gpu_task_objects)}
\ No newline at end of file
+    return {"status": "success", "created_count": len(gpu_task_objects)}
+
+
+# COPY fast path for /benchmark/bulk. Each benchmark type is validated and
+# converted column by column into COPY text format, then written with a
+# single COPY FROM STDIN per table.
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _text_column(values):
+    return [_escape(str(value)) for value in values]
+
+
+def _float_column(values):
+    return [repr(float(value)) for value in values]
+
+
+def _nullable_float_column(values):
+    return ['\\N' if value is None else repr(float(value)) for value in values]
+
+
+def _int_column(values):
+    return [str(int(value)) for value in values]
+
+
+def _seconds_column(values):
+    # total_time_sec is reported as e.g. "10.0012s"
+    return [repr(float(str(value).replace("s", ""))) for value in values]
+
+
+def _gpu_info_column(values):
+    return [_escape(json.dumps({'gpus': value})) for value in values]
+
+
+# (table column, payload key, converter) per benchmark type
+BENCHMARK_COPY_COLUMNS = {
+    "disk": (DiskBenchmark, [
+        ("provider_id", "node_id", _text_column),
+        ("benchmark_name", "benchmark_name", _text_column),
+        ("reads_per_second", "reads_per_second", _float_column),
+        ("writes_per_second", "writes_per_second", _float_column),
+        ("fsyncs_per_second", "fsyncs_per_second", _float_column),
+        ("read_throughput_mb_ps", "read_throughput_mb_ps", _float_column),
+        ("write_throughput_mb_ps", "write_throughput_mb_ps", _float_column),
+        ("total_time_sec", "total_time_sec", _float_column),
+        ("total_io_events", "total_io_events", _int_column),
+        ("min_latency_ms", "min_latency_ms", _float_column),
+        ("avg_latency_ms", "avg_latency_ms", _float_column),
+        ("max_latency_ms", "max_latency_ms", _float_column),
+        ("latency_95th_percentile_ms", "latency_95th_percentile_ms", _float_column),
+        ("disk_size_gb", "disk_size_gb", _nullable_float_column),
+    ]),
+    "cpu": (CpuBenchmark, [
+        ("provider_id", "node_id", _text_column),
+        ("benchmark_name", "benchmark_name", _text_column),
+        ("threads", "threads", _int_column),
+        ("total_time_sec", "total_time_sec", _seconds_column),
+        ("total_events", "total_events", _int_column),
+        ("events_per_second", "events_per_second", _float_column),
+        ("min_latency_ms", "min_latency_ms", _float_column),
+        ("avg_latency_ms", "avg_latency_ms", _float_column),
+        ("max_latency_ms", "max_latency_ms", _float_column),
+        ("latency_95th_percentile_ms", "latency_95th_percentile_ms", _float_column),
+        ("sum_latency_ms", "sum_latency_ms", _float_column),
+    ]),
+    "memory": (MemoryBenchmark, [
+        ("provider_id", "node_id", _text_column),
+        ("benchmark_name", "benchmark_name", _text_column),
+        ("total_operations", "total_operations", _int_column),
+        ("operations_per_second", "operations_per_second", _float_column),
+        ("total_data_transferred_mi_b", "total_data_transferred_mi_b", _float_column),
+        ("throughput_mi_b_sec", "throughput_mi_b_sec", _float_column),
+        ("total_time_sec", "total_time_sec", _float_column),
+        ("total_events", "total_events", _int_column),
+        ("min_latency_ms", "min_latency_ms", _float_column),
+        ("avg_latency_ms", "avg_latency_ms", _float_column),
+        ("max_latency_ms", "max_latency_ms", _float_column),
+        ("latency_95th_percentile_ms", "latency_95th_percentile_ms", _float_column),
+        ("sum_latency_ms", "sum_latency_ms", _float_column),
+        ("events", "events", _float_column),
+        ("execution_time_sec", "execution_time_sec", _float_column),
+        ("memory_size_gb", "memory_size_gb", _nullable_float_column),
+    ]),
+    "network": (NetworkBenchmark, [
+        ("provider_id", "node_id", _text_column),
+        ("mbit_per_second", "speed", _float_column),
+    ]),
+    "gpu": (GPUTask, [
+        ("provider_id", "node_id", _text_column),
+        ("gpu_info", "gpus", _gpu_info_column),
+        ("gpu_burn_gflops", "gpu_burn_gflops", _float_column),
+    ]),
+}
+
+
+INSERT_MISSING_PROVIDERS_SQL = """
+INSERT INTO api_provider (node_id, payment_addresses, network, created_at)
+SELECT node_id, '{}'::jsonb, 'mainnet', %(now)s
+FROM unnest(%(node_ids)s::varchar[]) AS node_id
+ON CONFLICT (node_id) DO NOTHING
+"""
+
+
+def convert_benchmark_columns(benchmark_type, data_list, created_at):
+    """
+    Validates and converts a list of benchmark dicts of one type into COPY text columns.
+
+    :raises KeyError, TypeError, ValueError: If a row is missing a field or has an unparseable value.
+    :return: Tuple of (table column names, list of converted columns).
+    """
+    model, spec = BENCHMARK_COPY_COLUMNS[benchmark_type]
+    columns = [column for column, _, _ in spec]
+    values = []
+    for _, key, converter in spec:
+        if converter is _nullable_float_column:
+            raw = [data.get(key) for data in data_list]
+        else:
+            raw = [data[key] for data in data_list]
+        values.append(converter(raw))
+    columns.append("created_at")
+    values.append([str(created_at)] * len(data_list))
+    return columns, values
+
+
+def copy_rows(cursor, table, columns, values):
+    buffer = io.StringIO()
+    buffer.writelines('\t'.join(row) + '\n' for row in zip(*values))
+    buffer.seek(0)
+    quoted_columns = ", ".join(connection.ops.quote_name(column) for column in columns)
+    cursor.copy_expert(f"COPY {table} ({quoted_columns}) FROM STDIN", buffer)
+
+
+def copy_bulk_benchmarks(organized_data):
+    """
+    Writes a bulk benchmark upload with COPY, returning the same response as the
+    per-type process_* functions. Every row is converted before anything is
+    written, so a bad payload raises without leaving partial data behind.
+    Network benchmarks for unknown providers are skipped, as in process_network_benchmark.
+    """
+    created_at = timezone.now()
+    converted = {
+        benchmark_type: convert_benchmark_columns(benchmark_type, data_list, created_at)
+        for benchmark_type, data_list in organized_data.items() if data_list
+    }
+
+    new_node_ids = list({
+        data['node_id']
+        for benchmark_type, data_list in organized_data.items() if benchmark_type != "network"
+        for data in data_list
+    })
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if new_node_ids:
+            cursor.execute(INSERT_MISSING_PROVIDERS_SQL, {'now': created_at, 'node_ids': new_node_ids})
+
+        if "network" in converted:
+            columns, values = converted["network"]
+            known = set(Provider.objects.filter(
+                node_id__in={data['node_id'] for data in organized_data["network"]}
+            ).values_list('node_id', flat=True))
+            keep = [data['node_id'] in known for data in organized_data["network"]]
+            converted["network"] = (columns, [
+                [value for value, kept in zip(column, keep) if kept] for column in values])
+
+        for benchmark_type, (columns, values) in converted.items():
+            if values[0]:
+                copy_rows(cursor, BENCHMARK_COPY_COLUMNS[benchmark_type][0]._meta.db_table, columns, values)
+
+    counts = {benchmark_type: len(converted[benchmark_type][1][0]) if benchmark_type in converted else 0
+              for benchmark_type in organized_data}
+    return {
+        "disk": {"status": "success", "created_count": counts["disk"]},
+        "cpu": {"status": "success", "created_count": counts["cpu"]},
+        "memory": {"status": "success", "created_count": counts["memory"]},
+        "network": counts["network"],
+        "gpu": {"status": "success", "created_count": counts["gpu"]},
+    }
+
+
+def process_bulk_benchmarks(organized_data):
+    """
+    Writes a bulk benchmark upload grouped by type, using COPY on Postgres.
+
+    :param organized_data: Dictionary mapping benchmark type to a list of benchmark data dicts.
+    :raises KeyError, TypeError, ValueError: On Postgres, if the payload is malformed.
+    :return: Dictionary with the result per benchmark type.
+    """
+    if connection.vendor == 'postgresql':
+        result = copy_bulk_benchmarks(organized_data)
+    else:
+        result = {
+            "disk": process_disk_benchmark(organized_data["disk"]),
+            "cpu": process_cpu_benchmark(organized_data["cpu"]),
+            "memory": process_memory_benchmark(organized_data["memory"]),
+            "network": process_network_benchmark(organized_data["network"]),
+            "gpu": process_gpu_task(organized_data["gpu"])
+        }
+
+    record_benchmark_extrema(organized_data)
+    # Only the CPU benchmarks feed into the published scores
+    mark_providers_dirty(data['node_id'] for data in organized_data['cpu'])
+    for benchmark_type, data_list in organized_data.items():
+        record_ingest(f"{benchmark_type}_benchmark", len(data_list))
+    return result
+
+
+def process_task_completions(data_list):
+    """
+    Processes a list of task completion data in bulk.
+
+    :param data_list: A list of dictionaries, each containing task completion data.
+    :return: Dictionary with operation results.
+    """
+    task_completion_data = []
+    errors = []
+
+    for item in data_list:
+        try:
+            provider = Provider.objects.filter(node_id=item['node_id']).first()
+            task = Task.objects.filter(id=item['task_id']).first()
+
+            if not provider or not task:
+                errors.append(f"Provider or Task not found for item with node_id {item['node_id']} and task_id {item['task_id']}")
+                continue
+
+            task_completion_data.append(TaskCompletion(
+                provider=provider,
+                task=task,
+                task_name=item['task_name'],
+                is_successful=item['is_successful'],
+                error_message=item['error_message'],
+                type=item['type'],
+            ))
+        except Exception as e:
+            errors.append(f"Error processing item with node_id {item['node_id']}: {str(e)}")
+
+    TaskCompletion.objects.bulk_create(task_completion_data)
+    record_ingest('task_completion', len(task_completion_data))
+    mark_providers_dirty(completion.provider_id for completion in task_completion_data)
+
+    if errors:
+        return {"status": "error", "message": "Errors occurred during processing", "errors": errors}
+    else:
+        return {"status": "success", "message": f"Bulk task completion data saved successfully, processed {len(task_completion_data)} items."}
@@ -0,0 +1,117 @@
+from core.redis_clients import redis_client
+from django.db import connection, transaction
+
+# Per benchmark name and value field min/max, kept in Redis sorted sets whose
+# members are "<benchmark_name>:<field>" and whose scores are the extrema.
+# The "all" scope covers every stored run, the "recent" scope the latest
+# RECENT_N runs of each provider in the table (what normalize_scores compares
+# against, see get_recent_benchmarks).
+# Ingest can only widen them (ZADD GT/LT); rebuild_benchmark_extrema recomputes
+# both exactly from the tables.
+EXTREMA_KEYS = {
+    'all': ('benchmark_extrema:all:min', 'benchmark_extrema:all:max'),
+    'recent': ('benchmark_extrema:recent:min', 'benchmark_extrema:recent:max'),
+}
+RECENT_N = 3
+
+# Benchmark type: (table, value fields)
+TRACKED_FIELDS = {
+    'cpu': ('api_cpubenchmark', ['events_per_second']),
+    'memory': ('api_memorybenchmark', ['throughput_mi_b_sec', 'latency_95th_percentile_ms']),
+    'disk': ('api_diskbenchmark', ['reads_per_second', 'writes_per_second', 'read_throughput_mb_ps', 'write_throughput_mb_ps']),
+}
+
+EXTREMA_SQL = {
+    'all': """
+        SELECT benchmark_name, {aggregates}
+        FROM {table}
+        GROUP BY benchmark_name
+    """,
+    'recent': """
+        SELECT benchmark_name, {aggregates}
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY provider_id ORDER BY created_at DESC, id DESC) AS rn
+            FROM {table}
+        ) runs
+        WHERE rn <= %(recent_n)s
+        GROUP BY benchmark_name
+    """,
+}
+
+r = redis_client
+
+
+def _member(benchmark_name, field):
+    return f"{benchmark_name}:{field}"
+
+
+def record_benchmark_extrema(organized_data):
+    """
+    Widens the stored extrema with a batch of ingested benchmarks, once the
+    surrounding transaction commits.
+
+    :param organized_data: Dictionary mapping benchmark type to a list of benchmark data dicts.
+    """
+    batch_min = {}
+    batch_max = {}
+    for benchmark_type, (_, fields) in TRACKED_FIELDS.items():
+        for data in organized_data.get(benchmark_type, []):
+            for field in fields:
+                member = _member(data['benchmark_name'], field)
+                value = float(data[field])
+                batch_min[member] = min(value, batch_min.get(member, value))
+                batch_max[member] = max(value, batch_max.get(member, value))
+
+    if not batch_min:
+        return
+
+    def publish():
+        pipe = r.pipeline()
+        for min_key, max_key in EXTREMA_KEYS.values():
+            pipe.zadd(min_key, batch_min, lt=True)
+            pipe.zadd(max_key, batch_max, gt=True)
+        pipe.execute()
+
+    transaction.on_commit(publish)
+
+
+def rebuild_benchmark_extrema():
+    """
+    Recomputes both scopes from the benchmark tables and replaces the stored sets.
+    """
+    extrema = {scope: ({}, {}) for scope in EXTREMA_KEYS}
+    with connection.cursor() as cursor:
+        for table, fields in TRACKED_FIELDS.values():
+            aggregates = ", ".join(f"MIN({field}), MAX({field})" for field in fields)
+            for scope in EXTREMA_KEYS:
+                cursor.execute(EXTREMA_SQL[scope].format(aggregates=aggregates, table=table),
+                               {'recent_n': RECENT_N})
+                for benchmark_name, *values in cursor.fetchall():
+                    for i, field in enumerate(fields):
+                        extrema[scope][0][_member(benchmark_name, field)] = values[2 * i]
+                        extrema[scope][1][_member(benchmark_name, field)] = values[2 * i + 1]
+
+    pipe = r.pipeline()
+    for scope, keys in EXTREMA_KEYS.items():
+        for key, values in zip(keys, extrema[scope]):
+            if values:
+                pipe.delete(f"{key}:tmp")
+                pipe.zadd(f"{key}:tmp", values)
+                pipe.rename(f"{key}:tmp", key)
+            else:
+                pipe.delete(key)
+    pipe.execute()
+
+
+def get_benchmark_extrema(benchmark_name, field, scope='recent'):
+    """
+    Returns the cached (min, max) of a benchmark value field, or (None, None)
+    if it has not been recorded yet.
+    """
+    min_key, max_key = EXTREMA_KEYS[scope]
+    member = _member(benchmark_name, field)
+    pipe = r.pipeline()
+    pipe.zscore(min_key, member)
+    pipe.zscore(max_key, member)
+    min_val, max_val = pipe.execute()
+    return min_val, max_val
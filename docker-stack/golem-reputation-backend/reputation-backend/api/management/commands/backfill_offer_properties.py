@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from api.models import OfferProperties
+
+
+class Command(BaseCommand):
+    help = 'Fills the typed offer property columns from the stored properties JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        columns = list(OfferProperties.TYPED_PROPERTIES)
+        batch = []
+        updated = 0
+
+        for offer_properties in OfferProperties.objects.only('hash', 'properties', *columns).iterator(chunk_size=batch_size):
+            values = OfferProperties.typed_values(offer_properties.properties)
+            if all(getattr(offer_properties, column) == value for column, value in values.items()):
+                continue
+            for column, value in values.items():
+                setattr(offer_properties, column, value)
+            batch.append(offer_properties)
+
+            if len(batch) >= batch_size:
+                OfferProperties.objects.bulk_update(batch, columns)
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            OfferProperties.objects.bulk_update(batch, columns)
+            updated += len(batch)
+
+        self.stdout.write(f'Updated {updated} offer property sets')
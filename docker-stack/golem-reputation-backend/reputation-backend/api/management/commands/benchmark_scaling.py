@@ -0,0 +1,66 @@
+import json
+import subprocess
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from api.benchmarks import DEFAULT_SIZES, JOBS, compare_results, format_comparison, run_benchmarks
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Measures how the scoring, uptime, blacklist and daily stats jobs scale with the number of providers, '
+            'or compares two saved runs. Seeds a separate test database, but overwrites the Redis snapshots, '
+            'so only run it against a development stack.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Provider counts to seed')
+        parser.add_argument('--jobs', nargs='+', choices=list(JOBS), help='Jobs to measure, all by default')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per job, the median is reported')
+        parser.add_argument('--tasks', type=int, default=10, help='Tasks in each seeded dataset')
+        parser.add_argument('--output', help='File to save the results to, as JSON')
+        parser.add_argument('--label', help='Name of the run, the current git commit by default')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database between runs')
+        parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'),
+                            help='Compare two saved runs instead of measuring')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            base, head = (self.load(path) for path in options['compare'])
+            self.stdout.write(f"{base['label']} -> {head['label']}")
+            self.stdout.write(format_comparison(compare_results(base['results'], head['results'])))
+            return
+
+        if connection.vendor != 'postgresql':
+            raise CommandError('The benchmarks measure Postgres queries, configure a Postgres database')
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                                      keepdb=options['keepdb'])
+        try:
+            results = run_benchmarks(options['sizes'], options['jobs'], options['repeat'],
+                                     dataset={'tasks': options['tasks']}, log=self.stdout.write)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        run = {
+            'label': options['label'] or current_commit() or 'unknown',
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(run, f, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}")
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read results from {path}: {e}')
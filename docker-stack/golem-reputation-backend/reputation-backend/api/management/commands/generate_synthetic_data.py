@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Provider
+from api.synthetic import clear_dataset, generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic dataset of providers, status history, benchmarks, pings, tasks and offers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--providers', type=int, default=1000)
+        parser.add_argument('--status-transitions', type=int, default=6, help='Online/offline transitions per provider')
+        parser.add_argument('--benchmarks', type=int, default=3, help='Runs of each benchmark type per provider')
+        parser.add_argument('--pings', type=int, default=5, help='Pings per region per provider')
+        parser.add_argument('--tasks', type=int, default=20)
+        parser.add_argument('--offer-ratio', type=float, default=0.5, help='Share of providers making an offer for each task')
+        parser.add_argument('--days', type=int, default=30, help='How far back the generated history reaches')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true', help='Delete all existing providers and their data first')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_dataset()
+        elif Provider.objects.exists():
+            raise CommandError('The database already contains providers, pass --clear to replace them')
+
+        counts = generate_dataset(
+            providers=options['providers'],
+            status_transitions=options['status_transitions'],
+            benchmarks=options['benchmarks'],
+            pings=options['pings'],
+            tasks=options['tasks'],
+            offer_ratio=options['offer_ratio'],
+            days=options['days'],
+            seed=options['seed'],
+        )
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
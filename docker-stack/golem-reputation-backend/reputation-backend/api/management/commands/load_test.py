@@ -0,0 +1,150 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+import aiohttp
+from django.core.management.base import BaseCommand, CommandError
+from api2.api import PRESETS
+
+# Requestor-like traffic against the public read API: mostly full score
+# snapshots and preset lookups, followed by per-provider drill-downs and the
+# stats pages. Weight, label (used for the report) and a function returning
+# the path to request, given the known node IDs.
+FILTERS = [
+    {'minCpuMultiThreadScore': 10000},
+    {'minCpuSingleThreadScore': 1000, 'minSuccessRate': 90},
+    {'minMemoryRandRead': 10000, 'minNetworkDownloadSpeed': 100},
+    {'minProviderAge': 7, 'minUptime': 90},
+    {'maxPing': 100, 'pingRegion': 'europe'},
+]
+
+SCENARIO = [
+    (20, '/v2/providers/scores', lambda ids: '/v2/providers/scores?network=polygon'),
+    (10, '/v1/providers/scores', lambda ids: '/v1/providers/scores'),
+    (10, '/v2/filter', lambda ids: f"/v2/filter?{urlencode(random.choice(FILTERS))}"),
+    (10, '/v2/providers/preset/{preset_name}', lambda ids: f"/v2/providers/preset/{random.choice(list(PRESETS))}"),
+    (10, '/v2/providers/{node_id}/scores', lambda ids: f"/v2/providers/{random.choice(ids)}/scores"),
+    (5, '/v2/providers/check_blacklist', lambda ids: f"/v2/providers/check_blacklist?node_id={random.choice(ids)}"),
+    (5, '/stats/provider/{node_id}/details', lambda ids: f"/stats/provider/{random.choice(ids)}/details"),
+    (5, '/stats/benchmark/cpu/{node_id}', lambda ids: f"/stats/benchmark/cpu/{random.choice(ids)}"),
+    (5, '/stats/providers/online', lambda ids: '/stats/providers/online'),
+    (5, '/stats/network/uptime', lambda ids: '/stats/network/uptime'),
+    (5, '/stats/network/success-rate', lambda ids: '/stats/network/success-rate'),
+    (5, '/stats/cpu/performance-ranking', lambda ids: '/stats/cpu/performance-ranking'),
+    (5, '/stats/network/average-latency', lambda ids: '/stats/network/average-latency'),
+]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Command(BaseCommand):
+    help = ('Replays a mix of requestor traffic against the public API and reports throughput and '
+            'p50/p95/p99 latency per endpoint. Seed the stack with generate_synthetic_data first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://django:8002', help='Base URL of the API')
+        parser.add_argument('--users', type=int, default=50, help='Concurrent simulated clients')
+        parser.add_argument('--duration', type=int, default=60, help='Seconds to run for')
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help='Mean seconds a client waits between requests, 0 for back-to-back requests')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Seconds before a request counts as failed')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help='File to save the report to, as JSON')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        report = asyncio.run(self.run(options))
+        self.stdout.write(self.format_report(report))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Saved report to {options['output']}")
+
+    async def run(self, options):
+        base_url = options['url'].rstrip('/')
+        timeout = aiohttp.ClientTimeout(total=options['timeout'])
+        connector = aiohttp.TCPConnector(limit=options['users'])
+        async with aiohttp.ClientSession(base_url, timeout=timeout, connector=connector) as session:
+            node_ids = await self.fetch_node_ids(session)
+            self.stdout.write(f"Loaded {len(node_ids)} node IDs, running {options['users']} clients "
+                              f"for {options['duration']}s against {base_url}")
+
+            samples = defaultdict(list)
+            errors = defaultdict(int)
+            deadline = time.monotonic() + options['duration']
+            started = time.monotonic()
+            await asyncio.gather(*(
+                self.client(session, node_ids, deadline, options['think_time'], samples, errors)
+                for _ in range(options['users'])
+            ))
+            elapsed = time.monotonic() - started
+
+        return {
+            'url': base_url,
+            'users': options['users'],
+            'seconds': elapsed,
+            'endpoints': {
+                label: self.summarize(samples[label], errors[label], elapsed)
+                for _, label, _ in SCENARIO if samples[label] or errors[label]
+            },
+            'total': self.summarize([d for durations in samples.values() for d in durations],
+                                    sum(errors.values()), elapsed),
+        }
+
+    async def fetch_node_ids(self, session):
+        async with session.get('/v2/providers/scores?network=polygon') as response:
+            if response.status != 200:
+                raise CommandError(f'GET /v2/providers/scores returned {response.status}, '
+                                   'seed the stack and let the scores snapshot build first')
+            data = await response.json()
+        node_ids = [entry['provider']['id'] for entry in data['testedProviders'] + data['untestedProviders']]
+        if not node_ids:
+            raise CommandError('No providers are online, seed the stack with generate_synthetic_data first')
+        return node_ids
+
+    async def client(self, session, node_ids, deadline, think_time, samples, errors):
+        weights = [weight for weight, _, _ in SCENARIO]
+        while time.monotonic() < deadline:
+            _, label, path = random.choices(SCENARIO, weights)[0]
+            started = time.perf_counter()
+            try:
+                async with session.get(path(node_ids)) as response:
+                    await response.read()
+                    failed = response.status >= 400
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                failed = True
+            if failed:
+                errors[label] += 1
+            else:
+                samples[label].append(time.perf_counter() - started)
+            if think_time:
+                await asyncio.sleep(random.expovariate(1 / think_time))
+
+    def summarize(self, durations, errors, elapsed):
+        durations = sorted(durations)
+        summary = {'requests': len(durations), 'errors': errors, 'rps': len(durations) / elapsed}
+        if durations:
+            summary.update({
+                'p50_ms': percentile(durations, 0.50) * 1000,
+                'p95_ms': percentile(durations, 0.95) * 1000,
+                'p99_ms': percentile(durations, 0.99) * 1000,
+                'mean_ms': statistics.mean(durations) * 1000,
+                'max_ms': durations[-1] * 1000,
+            })
+        return summary
+
+    def format_report(self, report):
+        columns = ['requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+        lines = [f"{'endpoint':<40}" + "".join(f"{column:>10}" for column in columns)]
+        for label, summary in [*report['endpoints'].items(), ('total', report['total'])]:
+            line = f"{label:<40}"
+            for column in columns:
+                value = summary.get(column)
+                line += f"{'-':>10}" if value is None else f"{value:>10.1f}" if isinstance(value, float) else f"{value:>10}"
+            lines.append(line)
+        return "\n".join(lines)
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0053_rename_node_status_history_idx_api_nodesta_node_id_acbc40_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provider',
+            name='wallet_address',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE api_provider
+                SET wallet_address = payment_addresses ->> 'golem.com.payment.platform.erc20-mainnet-glm.address'
+                WHERE payment_addresses ? 'golem.com.payment.platform.erc20-mainnet-glm.address'
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(fields=['wallet_address'], name='api_provide_wallet__7fb7d7_idx'),
+        ),
+    ]
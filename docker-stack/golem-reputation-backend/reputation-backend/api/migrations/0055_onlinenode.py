@@ -0,0 +1,32 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0054_provider_wallet_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OnlineNode',
+            fields=[
+                ('node_id', models.CharField(max_length=42, primary_key=True, serialize=False)),
+                ('since', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO api_onlinenode (node_id, since)
+                SELECT node_id, "timestamp" FROM (
+                    SELECT DISTINCT ON (node_id) node_id, is_online, "timestamp"
+                    FROM api_nodestatushistory
+                    ORDER BY node_id, "timestamp" DESC
+                ) latest
+                WHERE is_online
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0055_onlinenode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provider',
+            name='props_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
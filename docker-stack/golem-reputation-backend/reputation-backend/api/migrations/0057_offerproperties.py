@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-19 17:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0056_provider_props_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfferProperties',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('properties', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='offer',
+            name='properties',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='api.offerproperties'),
+        ),
+    ]
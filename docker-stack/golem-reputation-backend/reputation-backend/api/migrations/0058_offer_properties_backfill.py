@@ -0,0 +1,54 @@
+# Generated by Django 4.1.7 on 2026-10-19 17:02
+
+import hashlib
+import json
+
+from django.db import migrations
+
+
+def hash_properties(properties):
+    canonical = json.dumps(properties, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def move_offer_json(apps, schema_editor):
+    Offer = apps.get_model('api', 'Offer')
+    OfferProperties = apps.get_model('api', 'OfferProperties')
+
+    batch = []
+
+    def flush():
+        hashes = {}
+        for offer in batch:
+            offer.properties_id = hash_properties(offer.offer)
+            hashes[offer.properties_id] = offer.offer
+        OfferProperties.objects.bulk_create(
+            [OfferProperties(hash=h, properties=p) for h, p in hashes.items()],
+            ignore_conflicts=True)
+        Offer.objects.bulk_update(batch, ['properties'])
+        batch.clear()
+
+    for offer in Offer.objects.filter(properties__isnull=True).only('id', 'offer').iterator(chunk_size=5000):
+        batch.append(offer)
+        if len(batch) >= 5000:
+            flush()
+    if batch:
+        flush()
+
+
+def restore_offer_json(apps, schema_editor):
+    Offer = apps.get_model('api', 'Offer')
+    for offer in Offer.objects.filter(properties__isnull=False).select_related('properties').iterator(chunk_size=5000):
+        offer.offer = offer.properties.properties
+        offer.save(update_fields=['offer'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0057_offerproperties'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_offer_json, restore_offer_json),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-19 17:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0058_offer_properties_backfill'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='offer',
+            name='offer',
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.1.7 on 2026-10-19 17:04
+
+from django.db import migrations, models
+
+# column: (offer property, type), as OfferProperties.TYPED_PROPERTIES was when added
+TYPED_PROPERTIES = {
+    'cpu_brand': ('golem.inf.cpu.brand', str),
+    'cpu_threads': ('golem.inf.cpu.threads', int),
+    'memory_gib': ('golem.inf.mem.gib', float),
+    'storage_gib': ('golem.inf.storage.gib', float),
+    'runtime': ('golem.runtime.name', str),
+    'gpu_model': ('golem.!exp.gap-35.v1.inf.gpu.model', str),
+}
+
+
+def typed_values(properties):
+    values = {}
+    for column, (key, cast) in TYPED_PROPERTIES.items():
+        try:
+            values[column] = cast(properties[key]) if properties.get(key) is not None else None
+        except (TypeError, ValueError):
+            values[column] = None
+    return values
+
+
+def fill_typed_columns(apps, schema_editor):
+    OfferProperties = apps.get_model('api', 'OfferProperties')
+    columns = list(TYPED_PROPERTIES)
+
+    batch = []
+
+    def flush():
+        OfferProperties.objects.bulk_update(batch, columns)
+        batch.clear()
+
+    for offer_properties in OfferProperties.objects.only('hash', 'properties').iterator(chunk_size=5000):
+        for column, value in typed_values(offer_properties.properties).items():
+            setattr(offer_properties, column, value)
+        batch.append(offer_properties)
+        if len(batch) >= 5000:
+            flush()
+    if batch:
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0059_remove_offer_offer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offerproperties',
+            name='cpu_brand',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='offerproperties',
+            name='cpu_threads',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='offerproperties',
+            name='gpu_model',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='offerproperties',
+            name='memory_gib',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='offerproperties',
+            name='runtime',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='offerproperties',
+            name='storage_gib',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        # Before the indexes, so they are built once over the filled columns
+        migrations.RunPython(fill_typed_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['provider', 'accepted', 'created_at'], name='api_offer_provide_6f1d01_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offerproperties',
+            index=models.Index(fields=['cpu_brand'], name='api_offerpr_cpu_bra_feeb2a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offerproperties',
+            index=models.Index(fields=['cpu_threads'], name='api_offerpr_cpu_thr_26a1c6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offerproperties',
+            index=models.Index(fields=['runtime'], name='api_offerpr_runtime_19cb4d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offerproperties',
+            index=models.Index(fields=['gpu_model'], name='api_offerpr_gpu_mod_32fe49_idx'),
+        ),
+    ]
@@ -0,0 +1,151 @@
+# Generated by Django 4.1.7 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+# Append-only tables and the column they are range partitioned on, by month
+PARTITIONED_TABLES = {
+    'api_cpubenchmark': 'created_at',
+    'api_memorybenchmark': 'created_at',
+    'api_diskbenchmark': 'created_at',
+    'api_networkbenchmark': 'created_at',
+    'api_gputask': 'created_at',
+    'api_offer': 'created_at',
+    'api_taskcompletion': 'timestamp',
+}
+
+# Months kept in their own partition when converting, older rows go to <table>_history
+INITIAL_MONTHS = 12
+
+PARTITION_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent text, month date) RETURNS void AS $$
+DECLARE
+    start_date date := date_trunc('month', month)::date;
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        parent || '_p' || to_char(start_date, 'YYYYMM'),
+        parent,
+        start_date::timestamp AT TIME ZONE 'UTC',
+        (start_date + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION partition_table_by_month(parent text, col text, initial_months integer) RETURNS void AS $$
+DECLARE
+    old_table text := parent || '_unpartitioned';
+    first_month date := (date_trunc('month', now() AT TIME ZONE 'UTC') - make_interval(months => initial_months))::date;
+    month date;
+    rec record;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = parent::regclass) THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', parent, old_table);
+    EXECUTE format('ALTER TABLE %I RENAME CONSTRAINT %I TO %I', old_table, parent || '_pkey', old_table || '_pkey');
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) PARTITION BY RANGE (%I)',
+        parent, old_table, col);
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I PRIMARY KEY (id, %I)', parent, parent || '_pkey', col);
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (MINVALUE) TO (%L)',
+        parent || '_history', parent, first_month::timestamp AT TIME ZONE 'UTC');
+    month := first_month;
+    WHILE month <= (now() AT TIME ZONE 'UTC' + INTERVAL '2 months')::date LOOP
+        PERFORM create_monthly_partition(parent, month);
+        month := (month + INTERVAL '1 month')::date;
+    END LOOP;
+
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', parent, old_table);
+    EXECUTE format(
+        'SELECT setval(pg_get_serial_sequence(%L, ''id''), COALESCE((SELECT max(id) FROM %I), 0) + 1, false)',
+        parent, parent);
+
+    -- Move indexes and foreign keys over under their original names, so later
+    -- migrations that reference them by name keep working
+    FOR rec IN
+        SELECT c.relname AS name, pg_get_indexdef(i.indexrelid) AS def
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = old_table::regclass AND NOT i.indisprimary
+    LOOP
+        EXECUTE format('DROP INDEX %I', rec.name);
+        EXECUTE regexp_replace(rec.def, ' ON (\\S+\\.)?' || old_table || ' ', ' ON ' || quote_ident(parent) || ' ');
+    END LOOP;
+
+    FOR rec IN
+        SELECT conname, pg_get_constraintdef(oid) AS def
+        FROM pg_constraint
+        WHERE conrelid = old_table::regclass AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', old_table, rec.conname);
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I %s', parent, rec.conname, rec.def);
+    END LOOP;
+
+    EXECUTE format('DROP TABLE %I', old_table);
+    EXECUTE format('ALTER SEQUENCE %s RENAME TO %I', pg_get_serial_sequence(parent, 'id'), parent || '_id_seq');
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(PARTITION_FUNCTIONS_SQL)
+        for table, column in PARTITIONED_TABLES.items():
+            cursor.execute('SELECT partition_table_by_month(%s, %s, %s)', [table, column, INITIAL_MONTHS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0060_offerproperties_typed_columns'),
+    ]
+
+    operations = [
+        # The partition key has to be part of the primary key, so it can't be NULL.
+        # Rows without a creation time sort as the oldest rather than the newest.
+        migrations.RunSQL(
+            sql=[
+                f"UPDATE {table} SET {column} = '1970-01-01' WHERE {column} IS NULL"
+                for table, column in PARTITIONED_TABLES.items()
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='cpubenchmark',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='diskbenchmark',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='gputask',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='memorybenchmark',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='networkbenchmark',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='offer',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        # Converted tables stay partitioned when migrating backwards; the
+        # function returns early for tables that are already partitioned.
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
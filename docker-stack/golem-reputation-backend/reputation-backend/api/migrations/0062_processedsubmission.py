@@ -0,0 +1,20 @@
+# Generated by Django 4.1.7 on 2026-10-19 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0061_partition_time_series_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedSubmission',
+            fields=[
+                ('submission_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+# Adds a DEFAULT partition to every monthly partitioned table, so rows outside
+# the months created so far are kept instead of failing the insert. Creating a
+# month now moves its rows out of the DEFAULT partition first, as Postgres
+# refuses to create a partition whose rows are in the DEFAULT one.
+DEFAULT_PARTITION_SQL = """
+CREATE OR REPLACE FUNCTION create_default_partition(parent text) RETURNS void AS $$
+BEGIN
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT', parent || '_default', parent);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent text, month date) RETURNS void AS $$
+DECLARE
+    start_date date := date_trunc('month', month)::date;
+    partition text := parent || '_p' || to_char(start_date, 'YYYYMM');
+    default_partition text := parent || '_default';
+    lower_bound timestamptz := start_date::timestamp AT TIME ZONE 'UTC';
+    upper_bound timestamptz := (start_date + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC';
+    col text;
+    stray boolean := false;
+BEGIN
+    IF to_regclass(quote_ident(partition)) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    SELECT a.attname INTO col
+    FROM pg_partitioned_table p
+    JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+    WHERE p.partrelid = parent::regclass;
+
+    IF to_regclass(quote_ident(default_partition)) IS NOT NULL THEN
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= %L AND %I < %L)',
+                       default_partition, col, lower_bound, col, upper_bound) INTO stray;
+    END IF;
+
+    IF NOT stray THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                       partition, parent, lower_bound, upper_bound);
+        RETURN;
+    END IF;
+
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, default_partition);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                   partition, parent, lower_bound, upper_bound);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+        default_partition, col, lower_bound, col, upper_bound, parent);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', parent, default_partition);
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def add_default_partitions(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DEFAULT_PARTITION_SQL)
+        cursor.execute(
+            "SELECT create_default_partition(partrelid::regclass::text) FROM pg_partitioned_table")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0062_processedsubmission'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_default_partitions, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.db.models.fields import BigIntegerField, CharField
 from django.utils import timezone
 import os
+import json
+import hashlib
 
 
 class Provider(models.Model):
@@ -18,6 +20,10 @@ class Provider(models.Model):
     storage = models.FloatField(blank=True, null=True)
     # JSON object with payment addresses
     payment_addresses = models.JSONField(default=dict, blank=True, null=True)
+    # Mainnet GLM payment address, extracted from payment_addresses for indexed lookups
+    wallet_address = models.CharField(max_length=255, blank=True, null=True)
+    # Hash of the offer-derived fields, used to skip writes when nothing changed
+    props_hash = models.CharField(max_length=64, blank=True, null=True)
     # 'mainnet' or 'testnet'
     network = models.CharField(max_length=50, default='mainnet')
     created_at = models.DateTimeField(auto_now_add=True, null=True)
@@ -26,6 +32,7 @@ class Provider(models.Model):
         indexes = [
             models.Index(fields=['network']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['wallet_address']),
         ]
 
 
@@ -34,8 +41,10 @@ class Offer(models.Model):
         'Provider', on_delete=models.CASCADE)  # Link to a Provider
     task = models.ForeignKey(
         'Task', on_delete=models.CASCADE)  # Link to a Task
-    offer = models.JSONField(default=dict)  # JSON object with offer data
-    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    # Offer properties, shared by every offer with identical properties
+    properties = models.ForeignKey(
+        'OfferProperties', on_delete=models.PROTECT, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
     accepted = models.BooleanField(default=False)
     reason = models.CharField(
         max_length=255, blank=True, null=True)  # Reason for rejection
@@ -45,8 +54,66 @@ class Offer(models.Model):
             models.Index(fields=['provider']),
             models.Index(fields=['task']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['provider', 'accepted', 'created_at']),
+        ]
+
+
+class OfferProperties(models.Model):
+    # SHA-256 of the canonicalized properties JSON, see OfferProperties.hash_properties
+    hash = models.CharField(max_length=64, primary_key=True)
+    properties = models.JSONField(default=dict)  # JSON object with offer data
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+
+    # Typed copies of the properties used in rankings and grouping, see TYPED_PROPERTIES
+    cpu_brand = models.CharField(max_length=255, blank=True, null=True)
+    cpu_threads = models.IntegerField(blank=True, null=True)
+    memory_gib = models.FloatField(blank=True, null=True)
+    storage_gib = models.FloatField(blank=True, null=True)
+    runtime = models.CharField(max_length=255, blank=True, null=True)
+    gpu_model = models.CharField(max_length=255, blank=True, null=True)
+
+    # column: (offer property, type)
+    TYPED_PROPERTIES = {
+        'cpu_brand': ('golem.inf.cpu.brand', str),
+        'cpu_threads': ('golem.inf.cpu.threads', int),
+        'memory_gib': ('golem.inf.mem.gib', float),
+        'storage_gib': ('golem.inf.storage.gib', float),
+        'runtime': ('golem.runtime.name', str),
+        'gpu_model': ('golem.!exp.gap-35.v1.inf.gpu.model', str),
+    }
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cpu_brand']),
+            models.Index(fields=['cpu_threads']),
+            models.Index(fields=['runtime']),
+            models.Index(fields=['gpu_model']),
         ]
 
+    @staticmethod
+    def hash_properties(properties):
+        canonical = json.dumps(properties, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def typed_values(cls, properties):
+        """
+        Extracts the TYPED_PROPERTIES columns from an offer's properties.
+        Missing or unparseable values become None.
+        """
+        values = {}
+        for column, (key, cast) in cls.TYPED_PROPERTIES.items():
+            try:
+                values[column] = cast(properties[key]) if properties.get(key) is not None else None
+            except (TypeError, ValueError):
+                values[column] = None
+        return values
+
+    @classmethod
+    def from_properties(cls, properties):
+        return cls(hash=cls.hash_properties(properties), properties=properties,
+                   **cls.typed_values(properties))
+
 
 class BlacklistedOperator(models.Model):
     wallet = models.CharField(max_length=255, unique=True)  # Payment address
@@ -93,7 +160,7 @@ class DiskBenchmark(models.Model):
     max_latency_ms = models.FloatField()
     latency_95th_percentile_ms = models.FloatField()
     disk_size_gb = models.FloatField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         indexes = [
@@ -131,7 +198,7 @@ class MemoryBenchmark(models.Model):
     events = models.FloatField()
     execution_time_sec = models.FloatField()
     memory_size_gb = models.FloatField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         indexes = [
@@ -159,7 +226,7 @@ class CpuBenchmark(models.Model):
     max_latency_ms = models.FloatField()
     latency_95th_percentile_ms = models.FloatField()
     sum_latency_ms = models.FloatField()
-    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         indexes = [
@@ -178,7 +245,7 @@ class GPUTask(models.Model):
     provider = models.ForeignKey('Provider', on_delete=models.CASCADE)
     gpu_info = models.JSONField()  # This will store the entire GPU information structure
     gpu_burn_gflops = models.FloatField()  # Total GFLOPS for all GPUs combined
-    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         indexes = [
@@ -190,7 +257,7 @@ class GPUTask(models.Model):
 class NetworkBenchmark(models.Model):
     provider = models.ForeignKey('Provider', on_delete=models.CASCADE)
     mbit_per_second = models.FloatField()
-    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
 
 class Task(models.Model):
@@ -274,3 +341,16 @@ class NodeStatusHistory(models.Model):
         indexes = [
             models.Index(fields=["node_id", "timestamp"]),
         ]
+
+
+class OnlineNode(models.Model):
+    # Nodes whose latest status is online, kept in sync on each status transition
+    node_id = models.CharField(max_length=42, primary_key=True)
+    since = models.DateTimeField(auto_now_add=True)
+
+
+class ProcessedSubmission(models.Model):
+    # Bulk submissions whose rows are written, inserted in the same transaction
+    # as the rows so a submission is applied at most once
+    submission_id = models.CharField(max_length=255, primary_key=True)
+    processed_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,93 @@
+from asgiref.sync import sync_to_async
+from core.redis_clients import redis_client, async_redis
+from django.db import transaction
+from .models import OnlineNode
+
+# Redis SET mirroring the OnlineNode table
+ONLINE_NODES_KEY = 'online_nodes'
+# Built by rebuild_online_nodes, then renamed over ONLINE_NODES_KEY
+ONLINE_NODES_REBUILD_KEY = 'online_nodes:rebuild'
+
+r = redis_client
+
+
+def get_online_node_ids():
+    """
+    Returns the set of node IDs that are currently online.
+
+    Reads the Redis SET maintained by `update_online_nodes`, falling back to
+    the OnlineNode table (and re-seeding Redis from it) when the set is missing.
+    """
+    node_ids = {node_id.decode('utf-8') for node_id in r.smembers(ONLINE_NODES_KEY)}
+    if not node_ids:
+        node_ids = set(OnlineNode.objects.values_list('node_id', flat=True))
+        if node_ids:
+            r.sadd(ONLINE_NODES_KEY, *node_ids)
+    return node_ids
+
+
+async def aget_online_node_ids():
+    """
+    Async version of `get_online_node_ids` for code running in an event loop,
+    reading the set without blocking the loop.
+    """
+    async with async_redis() as client:
+        members = await client.smembers(ONLINE_NODES_KEY)
+    if not members:
+        return await sync_to_async(get_online_node_ids, thread_sensitive=True)()
+    return {node_id.decode('utf-8') for node_id in members}
+
+
+def update_online_nodes(statuses):
+    """
+    Applies status transitions to the online set.
+
+    :param statuses: Mapping of node_id to its new is_online state.
+    """
+    online = [node_id for node_id, is_online in statuses.items() if is_online]
+    offline = [node_id for node_id, is_online in statuses.items() if not is_online]
+
+    with transaction.atomic():
+        OnlineNode.objects.bulk_create(
+            [OnlineNode(node_id=node_id) for node_id in online], ignore_conflicts=True)
+        OnlineNode.objects.filter(node_id__in=offline).delete()
+
+        def publish():
+            pipe = r.pipeline()
+            if online:
+                pipe.sadd(ONLINE_NODES_KEY, *online)
+            if offline:
+                pipe.srem(ONLINE_NODES_KEY, *offline)
+            pipe.execute()
+
+        transaction.on_commit(publish)
+
+
+def rebuild_online_nodes():
+    """
+    Replaces the Redis SET with the node IDs in the OnlineNode table.
+
+    `update_online_nodes` publishes after each commit, so two updates of a node
+    can reach Redis in the opposite order to their commits, and a failed
+    publish is lost. Rebuilding on a schedule bounds how long the set can
+    disagree with the table.
+
+    :return: The number of online nodes.
+    """
+    node_ids = list(OnlineNode.objects.values_list('node_id', flat=True))
+    pipe = r.pipeline()
+    pipe.delete(ONLINE_NODES_REBUILD_KEY)
+    if node_ids:
+        pipe.sadd(ONLINE_NODES_REBUILD_KEY, *node_ids)
+        pipe.rename(ONLINE_NODES_REBUILD_KEY, ONLINE_NODES_KEY)
+    else:
+        pipe.delete(ONLINE_NODES_KEY)
+    pipe.execute()
+    return len(node_ids)
+
+
+def reset_online_nodes_cache():
+    """
+    Drops the Redis SET, so the next read re-seeds it from the OnlineNode table.
+    """
+    r.delete(ONLINE_NODES_KEY)
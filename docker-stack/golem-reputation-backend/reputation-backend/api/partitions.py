@@ -0,0 +1,35 @@
+from django.db import connection
+from django.utils import timezone
+
+
+def get_partitioned_tables():
+    """
+    Returns the names of the tables range partitioned by month (see migration
+    0061), as recorded by Postgres rather than a list kept in step by hand.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT partrelid::regclass::text FROM pg_partitioned_table ORDER BY 1")
+        return [table for table, in cursor.fetchall()]
+
+
+def ensure_monthly_partitions(months_ahead=2):
+    """
+    Creates the DEFAULT partition and the partitions for the current month and
+    the next `months_ahead` months of every partitioned table, if they don't
+    exist yet. Rows already in the DEFAULT partition for those months are
+    moved over, and any left there are reported.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    this_month = timezone.now().date().replace(day=1)
+    with connection.cursor() as cursor:
+        for table in get_partitioned_tables():
+            cursor.execute("SELECT create_default_partition(%s)", [table])
+            for offset in range(months_ahead + 1):
+                cursor.execute(
+                    "SELECT create_monthly_partition(%s, (%s::date + %s * INTERVAL '1 month')::date)",
+                    [table, this_month, offset])
+            cursor.execute(f'SELECT count(*) FROM "{table}_default"')
+            stray_rows = cursor.fetchone()[0]
+            if stray_rows:
+                print(f"Warning: {stray_rows} rows of {table} are in its DEFAULT partition, outside any monthly partition")
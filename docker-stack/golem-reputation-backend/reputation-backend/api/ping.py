@@ -3,25 +3,13 @@ import aiohttp  # For asynchronous HTTP requests
 import asyncio
 import json
 import subprocess
-from .models import NodeStatusHistory, PingResult
-from asgiref.sync import sync_to_async
+from .models import PingResult
+from .online import aget_online_node_ids
 
 
 async def async_fetch_node_ids():
-    # Define the synchronous part as an inner function
-    def get_node_ids():
-        # Fetch the latest status for each node_id and filter those that are online
-        latest_statuses = NodeStatusHistory.objects.filter(
-            node_id__in=NodeStatusHistory.objects.order_by(
-                'node_id', '-timestamp').distinct('node_id').values_list('node_id', flat=True)
-        ).order_by('node_id', '-timestamp').distinct('node_id')
-
-        # Return node_ids where the latest status is online
-        return [status.node_id for status in latest_statuses if status.is_online]
-
-    # Use sync_to_async to convert it and immediately invoke
-    node_ids = await sync_to_async(get_node_ids, thread_sensitive=True)()
-    return node_ids
+    node_ids = await aget_online_node_ids()
+    return list(node_ids)
 
 
 async def async_bulk_create_ping_results(chunk_data, p2p):
@@ -0,0 +1,109 @@
+import sys
+import time
+from contextlib import contextmanager
+from unittest import mock, skipUnless
+import fakeredis
+import fakeredis.aioredis
+import redis
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from core.scheduling import run_unlocked
+from .models import OnlineNode, GPUTask, Provider
+from .synthetic import generate_dataset
+from . import tasks
+from stats import tasks as stats_tasks
+
+# Modules holding a module-level Redis client, swapped for an in-memory one in tests
+REDIS_CLIENT_MODULES = ['api.api', 'api.blacklist', 'api.extrema', 'api.online', 'api.scanner', 'api.score_updates',
+                        'api.submissions', 'api.tasks', 'api2.api', 'stats.api', 'stats.tasks', 'core.metrics',
+                        'core.redis_clients', 'core.scheduling']
+
+
+# Periodic tasks and the arguments they are scheduled with, see core/celery.py
+PERIODIC_TASKS = [
+    (tasks.get_blacklisted_providers, {}),
+    (tasks.get_blacklisted_operators, {}),
+    (tasks.update_provider_scores, {'network': 'mainnet'}),
+    (tasks.update_provider_scores, {'network': 'testnet'}),
+    (tasks.cache_provider_percentiles, {}),
+    (tasks.cache_provider_whitelists, {}),
+    (tasks.refresh_benchmark_extrema, {}),
+    (tasks.process_offers_from_redis, {}),
+    (tasks.delete_old_ping_results, {}),
+    (tasks.create_time_partitions, {}),
+    (tasks.reconcile_online_nodes, {}),
+    (stats_tasks.cache_provider_uptime, {}),
+    (stats_tasks.cache_provider_success_ratio, {}),
+    (stats_tasks.cache_cpu_performance_ranking, {}),
+    (stats_tasks.cache_gpu_performance_ranking, {}),
+    (stats_tasks.populate_daily_provider_stats, {}),
+]
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query budgets are measured against Postgres, set TEST_POSTGRES=1')
+class QueryBudgetTestCase(TestCase):
+    """
+    Runs endpoints and periodic tasks against a synthetic dataset and fails
+    when one needs more queries or time than its budget.
+
+    Budgets are `queries + per_provider * providers`: code that is not
+    supposed to scale with the number of providers gets no per-provider
+    allowance, so a reintroduced per-row query pattern breaks its budget.
+    """
+
+    dataset = dict(providers=40, status_transitions=6, benchmarks=3, pings=3, tasks=5, seed=1)
+
+    @classmethod
+    def setUpClass(cls):
+        server = fakeredis.FakeServer()
+
+        def fake_client(*args, **kwargs):
+            return fakeredis.FakeRedis(server=server)
+
+        cls.redis = fake_client()
+        patchers = [mock.patch('redis.Redis', fake_client),
+                    mock.patch('core.redis_clients.get_async_redis', lambda: fakeredis.aioredis.FakeRedis(server=server))]
+        for name in REDIS_CLIENT_MODULES:
+            __import__(name)
+            module = sys.modules[name]
+            for attribute, value in vars(module).items():
+                if isinstance(value, redis.Redis):
+                    patchers.append(mock.patch.object(module, attribute, fake_client()))
+        for patcher in patchers:
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = generate_dataset(**cls.dataset)
+        cls.node_id = OnlineNode.objects.order_by('node_id').values_list('node_id', flat=True).first()
+        cls.gpu_node_id = GPUTask.objects.order_by('provider_id').values_list('provider_id', flat=True).first()
+        cls.providers = Provider.objects.count()
+
+        # Fill the Redis snapshots the read endpoints serve
+        with cls.captureOnCommitCallbacks(execute=True):
+            for task, kwargs in PERIODIC_TASKS:
+                run_unlocked(task, **kwargs)
+        cls.redis_snapshot = {key: cls.redis.dump(key) for key in cls.redis.keys()}
+
+    def setUp(self):
+        # Each test's database changes are rolled back, so put Redis back as well
+        self.redis.flushall()
+        for key, value in self.redis_snapshot.items():
+            self.redis.restore(key, 0, value)
+
+    def budget(self, queries, per_provider=0):
+        return queries + int(per_provider * self.providers)
+
+    @contextmanager
+    def assertWithinBudget(self, name, queries, seconds):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            yield context
+            elapsed = time.perf_counter() - started
+        executed = "\n".join(query['sql'] for query in context.captured_queries)
+        self.assertLessEqual(len(context), queries,
+                             f"{name} ran {len(context)} queries, budget {queries}:\n{executed}")
+        self.assertLessEqual(elapsed, seconds, f"{name} took {elapsed:.2f}s, budget {seconds}s")
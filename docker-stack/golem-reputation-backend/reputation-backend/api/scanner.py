@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
-import redis
+from core.redis_clients import redis_client
 import requests
 import asyncio
 import csv
 import json
-import pathlib
-import sys
+import hashlib
 import subprocess
 from datetime import datetime, timedelta
 from django.utils import timezone
 from .models import Provider, NodeStatusHistory
+from .blacklist import publish_provider_wallets
+from .score_updates import mark_providers_dirty
 from asgiref.sync import sync_to_async
 from yapapi import props as yp
 from yapapi.config import ApiConfig
@@ -17,10 +18,11 @@ from yapapi.log import enable_default_logger
 from yapapi.props.builder import DemandBuilder
 from yapapi.rest import Configuration, Market
 from core.celery import app
+from core.metrics import record_ingest
 from django.db.models import Q
 from django.db.models import Case, When, Value, F
 from django.db import transaction
-r = redis.Redis(host='redis', port=6379, db=0)
+r = redis_client
 
 
 @app.task(queue='default', options={'queue': 'default', 'routing_key': 'default'})
@@ -32,6 +34,7 @@ def update_providers_info(node_props):
         provider_data.append({
             "node_id": props['node_id'],
             "payment_addresses": prop_data,
+            "wallet_address": prop_data.get("golem.com.payment.platform.erc20-mainnet-glm.address"),
             "network": 'testnet' if any(key in TESTNET_KEYS for key in props.keys()) else 'mainnet',
             "cores": props.get("golem.inf.cpu.cores"),
             "memory": props.get("golem.inf.mem.gib"),
@@ -43,23 +46,23 @@ def update_providers_info(node_props):
             "name": props.get("golem.node.id.name"),
         })
 
+    if not provider_data:
+        return
+
     node_ids = [data['node_id'] for data in provider_data]
-    existing_providers = {
-        provider.node_id: provider
-        for provider in Provider.objects.filter(node_id__in=node_ids)
-    }
+    existing_hashes = dict(
+        Provider.objects.filter(node_id__in=node_ids).values_list('node_id', 'props_hash'))
 
     providers_to_create = []
     providers_to_update = []
 
     for data in provider_data:
-        if data['node_id'] in existing_providers:
-            provider = existing_providers[data['node_id']]
-            for key, value in data.items():
-                setattr(provider, key, value)
-            providers_to_update.append(provider)
-        else:
+        data['props_hash'] = hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        if data['node_id'] not in existing_hashes:
             providers_to_create.append(Provider(**data))
+        elif existing_hashes[data['node_id']] != data['props_hash']:
+            providers_to_update.append(Provider(**data))
 
     Provider.objects.bulk_create(providers_to_create, ignore_conflicts=True)
     Provider.objects.bulk_update(
@@ -67,6 +70,12 @@ def update_providers_info(node_props):
         fields=[field for field in provider_data[0].keys() if field !=
                 'node_id']
     )
+    record_ingest('provider', len(providers_to_create) + len(providers_to_update))
+    publish_provider_wallets({
+        provider.node_id: provider.wallet_address for provider in providers_to_create + providers_to_update
+    })
+    # Name, wallet and network are part of the published score documents
+    mark_providers_dirty(provider.node_id for provider in providers_to_create + providers_to_update)
 
 
 TESTNET_KEYS = [
@@ -78,10 +87,6 @@ TESTNET_KEYS = [
     "golem.com.payment.platform.erc20next-holesky-tglm.address"
 ]
 
-examples_dir = pathlib.Path(__file__).resolve().parent.parent
-sys.path.append(str(examples_dir))
-from .utils import build_parser, print_env_info, format_usage  # noqa: E402
-
 
 def check_node_status(issuer_id):
     node_id_no_prefix = issuer_id[2:] if issuer_id.startswith(
@@ -113,8 +118,75 @@ def check_node_status(issuer_id):
         return False
 
 
-async def list_offers(conf: Configuration, subnet_tag: str, current_scan_providers, node_props):
-    nodes_data = {}
+# Offers from runtimes listed here are replaced by an offer from any other runtime
+# of the same provider; otherwise the first offer seen wins.
+RUNTIME_PRIORITY = {"wasmtime": 0}
+DEFAULT_RUNTIME_PRIORITY = 1
+TOP_RUNTIME_PRIORITY = max(DEFAULT_RUNTIME_PRIORITY, *RUNTIME_PRIORITY.values())
+
+
+def runtime_priority(props):
+    return RUNTIME_PRIORITY.get(props.get("golem.runtime.name"), DEFAULT_RUNTIME_PRIORITY)
+
+
+def merge_offer(node_props, issuer, props):
+    """
+    Stores the offer props under its issuer unless a higher priority offer is already kept.
+
+    :return: True if the props were stored.
+    """
+    existing_entry = node_props.get(issuer)
+    if existing_entry is None or runtime_priority(props) > runtime_priority(existing_entry):
+        props['node_id'] = issuer
+        node_props[issuer] = props
+        return True
+    return False
+
+
+class OfferBatcher:
+    """
+    Collects deduplicated offer props during a scan and hands them to
+    update_providers_info in batches of at most `batch_size` providers.
+
+    Each provider goes out in exactly one batch per scan. Props that a higher
+    priority offer of the same provider could still replace are held until the
+    final flush: batches are written by concurrent workers, so a replacement
+    sent in a later batch could otherwise be overwritten by the props it replaced.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.seen = {}
+        self.pending = {}
+        self.held = {}
+
+    async def add(self, issuer, props):
+        if not merge_offer(self.seen, issuer, props):
+            return
+        if runtime_priority(props) < TOP_RUNTIME_PRIORITY:
+            self.held[issuer] = props
+            return
+        self.held.pop(issuer, None)
+        self.pending[issuer] = props
+        if len(self.pending) >= self.batch_size:
+            await self.flush(final=False)
+
+    async def flush(self, final=True):
+        """
+        Sends the pending props, and the held ones too when `final`, as the
+        scan won't replace them anymore.
+        """
+        if final:
+            self.pending.update(self.held)
+            self.held = {}
+        batch = list(self.pending.values())
+        self.pending = {}
+        for start in range(0, len(batch), self.batch_size):
+            # Publishing to the broker blocks, keep it off the scan's event loop
+            await asyncio.to_thread(update_providers_info.delay, batch[start:start + self.batch_size])
+
+
+async def list_offers(conf: Configuration, subnet_tag: str, on_offer):
     async with conf.market() as client:
         market_api = Market(client)
         dbuild = DemandBuilder()
@@ -124,25 +196,15 @@ async def list_offers(conf: Configuration, subnet_tag: str, current_scan_provide
 
         async with market_api.subscribe(dbuild.properties, dbuild.constraints) as subscription:
             async for event in subscription.events():
-                if event.issuer not in current_scan_providers:
-                    current_scan_providers.add(event.issuer)
-
-                    if event.issuer not in nodes_data:
-                        event.props['node_id'] = event.issuer
-                        node_props.append(event.props)
-                    else:
-                        # Check if there is an existing 'wasmtime' entry for the same issuer
-                        existing_entry = next((item for item in node_props if item['node_id'] == event.issuer and item.get(
-                            "golem.runtime.name") == "wasmtime"), None)
-                        if existing_entry and event.props.get("golem.runtime.name") == "vm":
-                            # Replace the existing 'wasmtime' entry with the 'vm' entry
-                            node_props[node_props.index(
-                                existing_entry)] = event.props
+                await on_offer(event.issuer, event.props)
 
 
 async def monitor_nodes_status(subnet_tag: str = "public"):
-    node_props = []
-    current_scan_providers = set()
+    # Offer props keyed by issuer, deduplicated during the scan
+    node_props = {}
+
+    async def on_offer(issuer, props):
+        merge_offer(node_props, issuer, props)
 
     # Call list_offers with a timeout
     try:
@@ -150,8 +212,7 @@ async def monitor_nodes_status(subnet_tag: str = "public"):
             list_offers(
                 Configuration(api_config=ApiConfig()),
                 subnet_tag=subnet_tag,
-                node_props=node_props,
-                current_scan_providers=current_scan_providers
+                on_offer=on_offer
             ),
             timeout=30  # 30-second timeout for each scan
         )
@@ -159,4 +220,37 @@ async def monitor_nodes_status(subnet_tag: str = "public"):
         print("Scan timeout reached")
 
     # Delay update_nodes_data call using Celery
-    update_providers_info.delay(node_props)
+    await asyncio.to_thread(update_providers_info.delay, list(node_props.values()))
+
+
+async def stream_nodes_status(subnet_tags=("public",), batch_size=200, flush_interval=5, timeout=30):
+    """
+    Scans the market on all `subnet_tags` concurrently and pushes provider
+    batches to update_providers_info every `batch_size` new providers or
+    `flush_interval` seconds, instead of one message at the end of the scan.
+    """
+    batcher = OfferBatcher(batch_size)
+
+    async def flush_periodically():
+        while True:
+            await asyncio.sleep(flush_interval)
+            await batcher.flush(final=False)
+
+    flusher = asyncio.create_task(flush_periodically())
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(
+                list_offers(
+                    Configuration(api_config=ApiConfig()),
+                    subnet_tag=subnet_tag,
+                    on_offer=batcher.add
+                )
+                for subnet_tag in subnet_tags
+            )),
+            timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        print("Scan timeout reached")
+    finally:
+        flusher.cancel()
+        await batcher.flush()
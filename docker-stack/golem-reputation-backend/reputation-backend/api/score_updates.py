@@ -0,0 +1,83 @@
+import json
+import time
+from core.redis_clients import redis_client
+from django.db import transaction
+
+# Providers whose score inputs changed since update_provider_scores last ran,
+# one SET per scored network. Ingest paths mark node IDs without looking up
+# their network, so a mark goes to every set and each network's run ignores
+# the nodes on the other one.
+# A run first moves its set to a processing key: marks arriving while it
+# computes stay for the next run, and the processing set of a run that failed
+# is merged into the next one.
+SCORED_NETWORKS = ('mainnet', 'testnet')
+DIRTY_PROVIDERS_KEY = 'provider_scores_dirty:{}'
+PROCESSING_KEY = 'provider_scores_dirty:{}:processing'
+# HASH rebuilt_at, cpu_maxima: when the network's scores were last recomputed in full
+SCORES_STATE_KEY = 'provider_scores_state:{}'
+
+# Uptime keeps moving for online providers and task completions leave the
+# success rate window without any ingest marking them, so everything is still
+# recomputed at this interval.
+FULL_REBUILD_INTERVAL = 3600
+
+r = redis_client
+
+
+def mark_providers_dirty(node_ids):
+    """
+    Queues providers for rescoring once the surrounding transaction commits.
+    """
+    node_ids = list(set(node_ids))
+    if not node_ids:
+        return
+
+    def publish():
+        pipe = r.pipeline()
+        for network in SCORED_NETWORKS:
+            pipe.sadd(DIRTY_PROVIDERS_KEY.format(network), *node_ids)
+        pipe.execute()
+
+    transaction.on_commit(publish)
+
+
+def take_dirty_providers(network):
+    """
+    Moves the providers marked for a network to its processing set.
+
+    :return: Set of node IDs to rescore, including those of a failed previous run.
+    """
+    processing = PROCESSING_KEY.format(network)
+    pipe = r.pipeline()
+    pipe.sunionstore(processing, [processing, DIRTY_PROVIDERS_KEY.format(network)])
+    pipe.delete(DIRTY_PROVIDERS_KEY.format(network))
+    pipe.smembers(processing)
+    return {node_id.decode('utf-8') for node_id in pipe.execute()[-1]}
+
+
+def finish_dirty_providers(network):
+    """
+    Drops the processing set once its providers are published.
+    """
+    r.delete(PROCESSING_KEY.format(network))
+
+
+def needs_full_rebuild(network, cpu_maxima):
+    """
+    Tells whether the stored scores of a network have to be recomputed in full:
+    they are missing or older than FULL_REBUILD_INTERVAL, or the CPU maxima
+    every score is normalized against have moved since.
+    """
+    state = r.hgetall(SCORES_STATE_KEY.format(network))
+    if b'rebuilt_at' not in state:
+        return True
+    if time.time() - float(state[b'rebuilt_at']) > FULL_REBUILD_INTERVAL:
+        return True
+    return json.loads(state[b'cpu_maxima']) != list(cpu_maxima)
+
+
+def record_full_rebuild(network, cpu_maxima):
+    r.hset(SCORES_STATE_KEY.format(network), mapping={
+        'rebuilt_at': time.time(),
+        'cpu_maxima': json.dumps(list(cpu_maxima)),
+    })
@@ -1,13 +1,13 @@
 from django.db.models import Max, Avg
 from .models import CpuBenchmark
-from django.db.models.functions.window import PercentRank
-from django.db.models.expressions import Window
 from django.db.models.functions import Now
 from django.db.models import Sum, F
 from django.db.models import Max, Min, Subquery, OuterRef
 from .models import CpuBenchmark, MemoryBenchmark, DiskBenchmark, NetworkBenchmark, Provider, NodeStatusHistory
 from datetime import timedelta
 from django.utils import timezone
+from django.db import connection
+from .extrema import get_benchmark_extrema
 
 # Function to determine penalty weight based on deviation
 
@@ -52,11 +52,9 @@ def calculate_uptime(node_id, node=None):
 
 
 def get_network_benchmark_scores(provider, recent_n=3):
-    benchmarks = get_recent_benchmarks(
-        NetworkBenchmark.objects.filter(provider=provider), n=recent_n)
-    if benchmarks.exists():
-        network_speeds = benchmarks.order_by(
-            '-created_at').values_list('mbit_per_second', flat=True)[:recent_n]
+    network_speeds = list(NetworkBenchmark.objects.filter(provider=provider).order_by(
+        '-created_at').values_list('mbit_per_second', flat=True)[:recent_n])
+    if network_speeds:
         avg_network_speed = sum(network_speeds) / len(network_speeds)
         network_score = {"Download Speed (mbit/s)": avg_network_speed}
     else:
@@ -82,13 +80,15 @@ def normalize_scores(provider, benchmark_set, benchmark_names, value_field_mappi
         benchmarks = benchmark_set.filter(
             provider=provider, benchmark_name=benchmark_name)
         if benchmarks.exists():
-            field_max = Max(actual_value_field) if not is_minimal_best else Min(
-                actual_value_field)
-            field_min = Min(actual_value_field)
-            benchmark_aggregates = benchmark_set.filter(
-                benchmark_name=benchmark_name).aggregate(min_val=field_min, max_val=field_max)
-            min_val = benchmark_aggregates['min_val']
-            max_val = benchmark_aggregates['max_val']
+            # Extrema over every provider's recent runs, maintained on ingest
+            min_val, max_val = get_benchmark_extrema(benchmark_name, actual_value_field)
+            if min_val is None or max_val is None:
+                benchmark_aggregates = benchmark_set.filter(
+                    benchmark_name=benchmark_name).aggregate(min_val=Min(actual_value_field), max_val=Max(actual_value_field))
+                min_val = benchmark_aggregates['min_val']
+                max_val = benchmark_aggregates['max_val']
+            if is_minimal_best:
+                max_val = min_val
 
             if max_val > min_val:
                 for benchmark in benchmarks:
@@ -140,14 +140,30 @@ def get_provider_benchmark_scores(provider, recent_n=3):
     return scores
 
 
-def get_normalized_cpu_scores():
-    # Get the maximum events_per_second for single and multi-thread benchmarks
-    max_single_thread_eps = CpuBenchmark.objects.filter(
-        benchmark_name="CPU Single-thread Benchmark").aggregate(Max('events_per_second'))['events_per_second__max']
-    max_multi_thread_eps = CpuBenchmark.objects.filter(
-        benchmark_name="CPU Multi-thread Benchmark").aggregate(Max('events_per_second'))['events_per_second__max']
+def get_cpu_score_maxima():
+    """
+    Returns the maximum events_per_second of the single and multi-thread
+    benchmarks, which every CPU score is normalized against.
+    """
+    _, max_single_thread_eps = get_benchmark_extrema(
+        "CPU Single-thread Benchmark", 'events_per_second', scope='all')
+    if max_single_thread_eps is None:
+        max_single_thread_eps = CpuBenchmark.objects.filter(
+            benchmark_name="CPU Single-thread Benchmark").aggregate(Max('events_per_second'))['events_per_second__max']
+    _, max_multi_thread_eps = get_benchmark_extrema(
+        "CPU Multi-thread Benchmark", 'events_per_second', scope='all')
+    if max_multi_thread_eps is None:
+        max_multi_thread_eps = CpuBenchmark.objects.filter(
+            benchmark_name="CPU Multi-thread Benchmark").aggregate(Max('events_per_second'))['events_per_second__max']
+    return max_single_thread_eps, max_multi_thread_eps
+
+
+def get_normalized_cpu_scores(node_ids=None):
+    """
+    :param node_ids: Only score these providers, all of them by default.
+    """
+    max_single_thread_eps, max_multi_thread_eps = get_cpu_score_maxima()
 
-    # Get all providers
     providers = Provider.objects.all()
 
     # Get the latest 5 benchmarks for each provider and benchmark type
@@ -155,6 +171,9 @@ def get_normalized_cpu_scores():
         benchmark_name__in=["CPU Single-thread Benchmark",
                             "CPU Multi-thread Benchmark"]
     ).order_by('provider', 'benchmark_name', '-id')
+    if node_ids is not None:
+        providers = providers.filter(node_id__in=node_ids)
+        latest_benchmarks = latest_benchmarks.filter(provider_id__in=node_ids)
 
     # Create a dictionary to store the latest 5 benchmarks for each provider and benchmark type
     latest_benchmarks_dict = {}
@@ -213,32 +232,184 @@ def get_normalized_cpu_scores():
     return cpu_scores
 
 
+# Percentile ranks
+
+# (metric, table, benchmark_name, value column, higher is better)
+BENCHMARK_PERCENTILE_METRICS = [
+    ("cpuSingleThread", "api_cpubenchmark", "CPU Single-thread Benchmark", "events_per_second", True),
+    ("cpuMultiThread", "api_cpubenchmark", "CPU Multi-thread Benchmark", "events_per_second", True),
+    ("memorySequentialWriteSingleThread", "api_memorybenchmark", "Sequential_Write_Performance__Single_Thread_", "throughput_mi_b_sec", True),
+    ("memorySequentialReadSingleThread", "api_memorybenchmark", "Sequential_Read_Performance__Single_Thread_", "throughput_mi_b_sec", True),
+    ("memoryRandomWriteMultiThread", "api_memorybenchmark", "Random_Write_Performance__Multi_threaded_", "throughput_mi_b_sec", True),
+    ("memoryRandomReadMultiThread", "api_memorybenchmark", "Random_Read_Performance__Multi_threaded_", "throughput_mi_b_sec", True),
+    ("memoryLatencyRandomReadSingleThread", "api_memorybenchmark", "Latency_Test__Random_Read__Single_Thread_", "latency_95th_percentile_ms", False),
+    ("diskRandomRead", "api_diskbenchmark", "FileIO_rndrd", "reads_per_second", True),
+    ("diskRandomWrite", "api_diskbenchmark", "FileIO_rndwr", "writes_per_second", True),
+    ("diskSequentialRead", "api_diskbenchmark", "FileIO_seqrd", "read_throughput_mb_ps", True),
+    ("diskSequentialWrite", "api_diskbenchmark", "FileIO_seqwr", "write_throughput_mb_ps", True),
+    ("networkThroughput", "api_networkbenchmark", None, "mbit_per_second", True),
+]
+
+# Average of the latest runs of one benchmark, per provider
+RECENT_BENCHMARK_METRIC_SQL = """
+    SELECT provider_id, %(metric_{i})s AS metric, AVG(value) AS value, {higher_is_better} AS higher_is_better
+    FROM (
+        SELECT provider_id, {column} AS value,
+               ROW_NUMBER() OVER (PARTITION BY provider_id ORDER BY created_at DESC, id DESC) AS rn
+        FROM {table}
+        WHERE provider_id = ANY(%(node_ids)s){benchmark_filter}
+    ) recent
+    WHERE rn <= %(recent_n)s
+    GROUP BY provider_id
+"""
+
+SUCCESS_RATE_METRIC_SQL = """
+    SELECT provider_id, 'successRate', AVG(is_successful::int)::float, true
+    FROM api_taskcompletion
+    WHERE provider_id = ANY(%(node_ids)s) AND "timestamp" >= %(success_since)s
+    GROUP BY provider_id
+"""
+
+PING_METRIC_SQL = """
+    SELECT provider_id, 'ping', AVG(ping_tcp)::float, false
+    FROM api_pingresult
+    WHERE provider_id = ANY(%(node_ids)s) AND created_at >= %(ping_since)s
+    GROUP BY provider_id
+"""
+
+# Same rules as calculate_uptime: an online status counts until the next offline
+# status (or now), and is reset by a later online status. Uptime as a fraction.
+UPTIME_SQL = """
+    SELECT node_id,
+           EXTRACT(EPOCH FROM SUM(
+               CASE WHEN is_online AND next_is_online IS NOT TRUE
+                    THEN COALESCE(next_timestamp, %(now)s) - "timestamp"
+                    ELSE INTERVAL '0' END))
+           / NULLIF(EXTRACT(EPOCH FROM %(now)s - MIN("timestamp")), 0)::float AS uptime
+    FROM (
+        SELECT node_id, is_online, "timestamp",
+               LEAD(is_online) OVER w AS next_is_online,
+               LEAD("timestamp") OVER w AS next_timestamp
+        FROM api_nodestatushistory
+        WHERE node_id = ANY(%(node_ids)s)
+        WINDOW w AS (PARTITION BY node_id ORDER BY "timestamp")
+    ) statuses
+    GROUP BY node_id
+"""
+
+UPTIME_METRIC_SQL = f"""
+    SELECT node_id, 'uptime', uptime, true
+    FROM ({UPTIME_SQL}) uptimes
+"""
+
+
+def calculate_uptimes(node_ids):
+    """
+    Uptime percentage of each of the given nodes, by the rules of
+    calculate_uptime, in a single query.
+
+    :return: Dictionary mapping node_id to its uptime percentage, 0 for nodes without statuses.
+    """
+    node_ids = list(node_ids)
+    uptimes = dict.fromkeys(node_ids, 0)
+    if not node_ids:
+        return uptimes
+    with connection.cursor() as cursor:
+        cursor.execute(UPTIME_SQL, {'node_ids': node_ids, 'now': timezone.now()})
+        for node_id, uptime in cursor.fetchall():
+            uptimes[node_id] = (uptime or 0) * 100
+    return uptimes
+
+
+def get_provider_percentiles(node_ids, recent_n=3, success_days=10, ping_days=1):
+    """
+    Ranks the given providers against each other on every benchmark metric,
+    success rate, uptime and ping in a single windowed query.
+
+    :return: Dictionary mapping node_id to {metric: percentile}, where the
+        percentile is in [0, 1] and 1 is the best value in the population.
+    """
+    node_ids = list(node_ids)
+    if not node_ids:
+        return {}
+
+    now = timezone.now()
+    params = {
+        'node_ids': node_ids,
+        'recent_n': recent_n,
+        'now': now,
+        'success_since': now - timedelta(days=success_days),
+        'ping_since': now - timedelta(days=ping_days),
+    }
+    metric_queries = []
+    for i, (metric, table, benchmark_name, column, higher_is_better) in enumerate(BENCHMARK_PERCENTILE_METRICS):
+        params[f'metric_{i}'] = metric
+        benchmark_filter = ''
+        if benchmark_name is not None:
+            params[f'benchmark_name_{i}'] = benchmark_name
+            benchmark_filter = f' AND benchmark_name = %(benchmark_name_{i})s'
+        metric_queries.append(RECENT_BENCHMARK_METRIC_SQL.format(
+            i=i, table=table, column=column, benchmark_filter=benchmark_filter,
+            higher_is_better='true' if higher_is_better else 'false'))
+    metric_queries += [SUCCESS_RATE_METRIC_SQL, PING_METRIC_SQL, UPTIME_METRIC_SQL]
+
+    query = f"""
+        WITH metrics (provider_id, metric, value, higher_is_better) AS (
+            {" UNION ALL ".join(metric_queries)}
+        )
+        SELECT provider_id, metric,
+               PERCENT_RANK() OVER (
+                   PARTITION BY metric
+                   ORDER BY CASE WHEN higher_is_better THEN value ELSE -value END
+               )
+        FROM metrics
+        WHERE value IS NOT NULL
+    """
+
+    percentiles = {}
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        for provider_id, metric, percentile in cursor.fetchall():
+            percentiles.setdefault(provider_id, {})[metric] = round(percentile, 4)
+    return percentiles
+
+
 # GNV replacement
 
-def get_top_80_percent_cpu_multithread_providers(maxCheckedDaysAgo=3, topPercent=80):
-    # Filter benchmarks based on the last N days and by multi-thread benchmark
-    recent_benchmarks = CpuBenchmark.objects.filter(
-        created_at__gte=Now() - timedelta(days=maxCheckedDaysAgo),
-        benchmark_name__icontains='multi-thread'  # Adjust based on your actual naming
-    ).values('provider_id').annotate(
-        total_score=Sum('events_per_second')
-    ).order_by('-total_score')
-
-    # Calculate the index for the 80th percentile cutoff
-    count = len(recent_benchmarks)
-    cutoff_index = int(count * (topPercent / 100)) - \
-        1  # Adjust the cutoff to get the top 80%
-
-    # Get the total scores as a list and find the cutoff score
-    total_scores = list(
-        recent_benchmarks.values_list('total_score', flat=True))
-    if total_scores:  # Ensure the list is not empty
-        cutoff_score = total_scores[cutoff_index]
-
-        # Filter providers by score, comparing against the cutoff score
-        top_providers = [benchmark['provider_id']
-                         for benchmark in recent_benchmarks if benchmark['total_score'] >= cutoff_score]
-    else:
-        top_providers = []
+# Median multi-thread score per provider over the window, then the providers
+# at or above the (100 - topPercent)th percentile of those medians
+CPU_MULTITHREAD_WHITELIST_SQL = """
+WITH provider_scores AS (
+    SELECT provider_id,
+           PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY events_per_second) AS score
+    FROM api_cpubenchmark
+    WHERE created_at >= NOW() - make_interval(days => %(days)s)
+      AND benchmark_name ILIKE '%%multi-thread%%'
+    GROUP BY provider_id
+),
+cutoff AS (
+    SELECT PERCENTILE_DISC(%(cutoff_fraction)s) WITHIN GROUP (ORDER BY score) AS score
+    FROM provider_scores
+)
+SELECT provider_scores.provider_id
+FROM provider_scores, cutoff
+WHERE provider_scores.score >= cutoff.score
+ORDER BY provider_scores.score DESC
+"""
+
+# (maxCheckedDaysAgo, topPercent) pairs kept precomputed in Redis by cache_provider_whitelists
+WHITELIST_CACHED_PARAMS = [(3, 80), (1, 80), (7, 80), (3, 50), (3, 90)]
+WHITELIST_CACHE_KEY = 'provider_whitelist:{}:{}'
+
+# HASH node_id -> v2 score document, per network, written by update_provider_scores
+PROVIDER_SCORES_HASH_KEY = 'provider_scores_v2_{}:by_provider'
 
-    return top_providers
+
+def get_top_80_percent_cpu_multithread_providers(maxCheckedDaysAgo=3, topPercent=80):
+    top_percent = min(max(topPercent, 0), 100)
+    with connection.cursor() as cursor:
+        cursor.execute(CPU_MULTITHREAD_WHITELIST_SQL, {
+            'days': maxCheckedDaysAgo,
+            'cutoff_fraction': 1 - top_percent / 100,
+        })
+        return [provider_id for provider_id, in cursor.fetchall()]
@@ -0,0 +1,100 @@
+from core.redis_clients import redis_client
+import json
+import time
+from django.utils import timezone
+
+# Bulk uploads accepted under a client-supplied submission ID are staged in
+# Redis and written to the database by the process_bulk_submission task.
+SUBMISSION_KEY = 'bulk_submission:{}'
+SUBMISSION_PAYLOAD_KEY = 'bulk_submission:{}:payload'
+# Submissions (and so the idempotency window for retries) are kept for a week
+SUBMISSION_TTL = 7 * 24 * 3600
+# A submission left processing for longer than this is taken to belong to a
+# worker that died, and can be claimed again
+SUBMISSION_STALE_AFTER = 30 * 60
+
+r = redis_client
+
+
+def stage_submission(submission_id, kind, payload):
+    """
+    Stores a bulk upload once under its submission ID. Resubmitting an ID
+    whose processing failed or went stale queues it again.
+
+    :param kind: 'benchmark' or 'task_status'.
+    :return: True if the submission has to be queued, False if it already is, or is being or was processed.
+    """
+    key = SUBMISSION_KEY.format(submission_id)
+    payload_key = SUBMISSION_PAYLOAD_KEY.format(submission_id)
+    # One MULTI guarded by the status field: a concurrent retry sees either
+    # the whole submission or none of it, and never overwrites it
+    pipe = r.pipeline()
+    pipe.hsetnx(key, 'status', 'queued')
+    pipe.hsetnx(key, 'kind', kind)
+    pipe.hsetnx(key, 'received_at', timezone.now().isoformat())
+    pipe.set(payload_key, json.dumps(payload), nx=True)
+    pipe.expire(key, SUBMISSION_TTL)
+    pipe.expire(payload_key, SUBMISSION_TTL)
+    if pipe.execute()[0]:
+        return True
+    return _compare_and_set_status(submission_id, 'queued', lambda status, stale: status == 'failed' or stale)
+
+
+def claim_submission(submission_id):
+    """
+    Moves a queued submission, or one whose processing went stale, to processing.
+
+    :return: True if the caller got the submission, False if another delivery has it or it is not queued.
+    """
+    return _compare_and_set_status(submission_id, 'processing', lambda status, stale: status == 'queued' or stale)
+
+
+def _compare_and_set_status(submission_id, new_status, allowed):
+    """
+    Sets the status of a submission if `allowed(status, stale)` holds, under
+    WATCH so two callers never both succeed.
+    """
+    key = SUBMISSION_KEY.format(submission_id)
+
+    def update(pipe):
+        status, claimed_at = pipe.hmget(key, 'status', 'claimed_at')
+        if status is None:
+            return False
+        status = status.decode('utf-8')
+        stale = status == 'processing' and time.time() - float(claimed_at or 0) > SUBMISSION_STALE_AFTER
+        if not allowed(status, stale):
+            return False
+        pipe.multi()
+        mapping = {'status': new_status, 'updated_at': timezone.now().isoformat()}
+        if new_status == 'processing':
+            mapping['claimed_at'] = time.time()
+        pipe.hset(key, mapping=mapping)
+        return True
+
+    return r.transaction(update, key, value_from_callable=True)
+
+
+def get_submission_payload(submission_id):
+    payload = r.get(SUBMISSION_PAYLOAD_KEY.format(submission_id))
+    return json.loads(payload) if payload is not None else None
+
+
+def get_submission(submission_id):
+    """
+    Returns the status of a submission, or None if the ID is unknown.
+    """
+    submission = {key.decode('utf-8'): value.decode('utf-8')
+                  for key, value in r.hgetall(SUBMISSION_KEY.format(submission_id)).items()}
+    if not submission:
+        return None
+    if 'result' in submission:
+        submission['result'] = json.loads(submission['result'])
+    submission['submission_id'] = submission_id
+    return submission
+
+
+def update_submission(submission_id, status, result=None):
+    mapping = {'status': status, 'updated_at': timezone.now().isoformat()}
+    if result is not None:
+        mapping['result'] = json.dumps(result)
+    r.hset(SUBMISSION_KEY.format(submission_id), mapping=mapping)
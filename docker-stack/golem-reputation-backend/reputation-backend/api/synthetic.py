@@ -0,0 +1,230 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .models import (Provider, NodeStatusHistory, OnlineNode, CpuBenchmark, MemoryBenchmark, DiskBenchmark,
+                     NetworkBenchmark, GPUTask, PingResult, Task, TaskCompletion, Offer, OfferProperties,
+                     BlacklistedProvider, BlacklistedOperator)
+from .online import reset_online_nodes_cache
+
+# Synthetic but realistically shaped data for load and query-budget testing:
+# operators running several nodes from one wallet, a testnet minority, a few
+# hardware profiles with per-node performance spread, GPU nodes, flapping
+# status histories and some providers that fail most of their tasks.
+
+MAINNET_ADDRESS_KEY = 'golem.com.payment.platform.erc20-mainnet-glm.address'
+POLYGON_ADDRESS_KEY = 'golem.com.payment.platform.erc20-polygon-glm.address'
+TESTNET_ADDRESS_KEY = 'golem.com.payment.platform.erc20-holesky-tglm.address'
+
+# cpu brand, threads, memory GiB, storage GiB, CPU multi-thread events/s
+HARDWARE_PROFILES = [
+    ('Intel(R) Core(TM) i7-9700K CPU @ 3.60GHz', 8, 16.0, 200.0, 9000.0),
+    ('Intel(R) Xeon(R) CPU E5-2680 v4 @ 2.40GHz', 28, 64.0, 500.0, 22000.0),
+    ('AMD Ryzen 9 5950X 16-Core Processor', 32, 64.0, 1000.0, 45000.0),
+    ('AMD EPYC 7502P 32-Core Processor', 64, 128.0, 2000.0, 70000.0),
+    ('Intel(R) Core(TM) i5-8250U CPU @ 1.60GHz', 4, 8.0, 100.0, 3500.0),
+]
+GPU_MODELS = [('NVIDIA GeForce RTX 3090', 35000.0), ('NVIDIA GeForce RTX 4090', 80000.0), ('NVIDIA A100', 19000.0)]
+
+MEMORY_BENCHMARKS = [
+    'Sequential_Write_Performance__Single_Thread_',
+    'Sequential_Read_Performance__Single_Thread_',
+    'Random_Write_Performance__Multi_threaded_',
+    'Random_Read_Performance__Multi_threaded_',
+    'Latency_Test__Random_Read__Single_Thread_',
+]
+DISK_BENCHMARKS = ['FileIO_rndrd', 'FileIO_rndwr', 'FileIO_seqrd', 'FileIO_seqwr']
+PING_REGIONS = ['europe', 'asia', 'us']
+
+GENERATED_MODELS = [Offer, OfferProperties, TaskCompletion, Task, CpuBenchmark, MemoryBenchmark, DiskBenchmark,
+                    NetworkBenchmark, GPUTask, PingResult, NodeStatusHistory, OnlineNode, BlacklistedProvider,
+                    BlacklistedOperator, Provider]
+
+BATCH_SIZE = 5000
+
+
+@contextmanager
+def explicit_timestamps():
+    """
+    Lets bulk_create store the generated creation times instead of now().
+    """
+    fields = [field for model in GENERATED_MODELS for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def clear_dataset():
+    for model in GENERATED_MODELS:
+        model.objects.all().delete()
+    reset_online_nodes_cache()
+
+
+def generate_dataset(providers=100, status_transitions=6, benchmarks=3, pings=5, tasks=10,
+                     offer_ratio=0.5, days=30, seed=0):
+    """
+    Generates a synthetic dataset.
+
+    :param providers: Number of providers.
+    :param status_transitions: Online/offline transitions per provider.
+    :param benchmarks: Runs of each benchmark type per provider.
+    :param pings: Pings per region per provider.
+    :param tasks: Number of tasks; a provider takes part in each with probability offer_ratio.
+    :param days: How far back the generated history reaches.
+    :param seed: Random seed, the same arguments and seed give the same dataset.
+    :return: Dictionary with the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    start = now - timedelta(days=days)
+
+    def moment():
+        return start + timedelta(seconds=rng.uniform(0, days * 86400))
+
+    wallets = [f"0x{rng.getrandbits(160):040x}" for _ in range(max(1, providers // 4))]
+    provider_objects = []
+    profiles = {}
+    for i in range(providers):
+        node_id = f"0x{rng.getrandbits(160):040x}"
+        profile = rng.choice(HARDWARE_PROFILES)
+        wallet = rng.choice(wallets)
+        testnet = rng.random() < 0.15
+        payment_addresses = {TESTNET_ADDRESS_KEY: wallet} if testnet else {MAINNET_ADDRESS_KEY: wallet, POLYGON_ADDRESS_KEY: wallet}
+        provider_objects.append(Provider(
+            node_id=node_id, name=f"synthetic-{i}", network='testnet' if testnet else 'mainnet',
+            cores=profile[1] / 2, threads=profile[1], memory=profile[2], storage=profile[3], cpu=profile[0],
+            runtime='vm', runtime_version='0.3.0', payment_addresses=payment_addresses,
+            wallet_address=payment_addresses.get(MAINNET_ADDRESS_KEY), created_at=start,
+        ))
+        # Per-node speed factor around its hardware profile, and GPU if any
+        profiles[node_id] = (profile, rng.uniform(0.7, 1.2),
+                             rng.choice(GPU_MODELS) if rng.random() < 0.1 else None,
+                             rng.uniform(0.2, 1.0) if rng.random() < 0.1 else rng.uniform(0.85, 1.0))
+
+    statuses = []
+    online = []
+    for provider in provider_objects:
+        is_online = rng.random() < 0.5
+        times = sorted(moment() for _ in range(status_transitions))
+        for timestamp in times:
+            statuses.append(NodeStatusHistory(node_id=provider.node_id, is_online=is_online, timestamp=timestamp))
+            is_online = not is_online
+        if times and not is_online:
+            online.append(OnlineNode(node_id=provider.node_id, since=times[-1]))
+
+    cpu, memory, disk, network, gpu = [], [], [], [], []
+    for provider in provider_objects:
+        profile, speed, gpu_model, _ = profiles[provider.node_id]
+        for _ in range(benchmarks):
+            created_at = moment()
+            jitter = rng.uniform(0.9, 1.1)
+            for name, events in (('CPU Multi-thread Benchmark', profile[4]), ('CPU Single-thread Benchmark', profile[4] / profile[1])):
+                cpu.append(CpuBenchmark(
+                    provider=provider, benchmark_name=name, threads=profile[1], total_time_sec=10,
+                    total_events=int(events * speed * jitter * 10), events_per_second=events * speed * jitter,
+                    min_latency_ms=0.5, avg_latency_ms=1.0, max_latency_ms=5.0, latency_95th_percentile_ms=1.5,
+                    sum_latency_ms=1000, created_at=created_at))
+            for name in MEMORY_BENCHMARKS:
+                throughput = rng.uniform(5000, 30000) * speed
+                memory.append(MemoryBenchmark(
+                    provider=provider, benchmark_name=name, total_operations=1000000,
+                    operations_per_second=throughput * 100, total_data_transferred_mi_b=throughput * 10,
+                    throughput_mi_b_sec=throughput, total_time_sec=10, total_events=1000000, min_latency_ms=0.01,
+                    avg_latency_ms=0.05, max_latency_ms=2.0, latency_95th_percentile_ms=rng.uniform(0.05, 1.0) / speed,
+                    sum_latency_ms=50000, events=1000000, execution_time_sec=10, memory_size_gb=profile[2],
+                    created_at=created_at))
+            for name in DISK_BENCHMARKS:
+                disk.append(DiskBenchmark(
+                    provider=provider, benchmark_name=name, reads_per_second=rng.uniform(100, 5000) * speed,
+                    writes_per_second=rng.uniform(100, 5000) * speed, fsyncs_per_second=rng.uniform(10, 500),
+                    read_throughput_mb_ps=rng.uniform(50, 2000) * speed, write_throughput_mb_ps=rng.uniform(50, 1500) * speed,
+                    total_time_sec=10, total_io_events=100000, min_latency_ms=0.05, avg_latency_ms=0.5,
+                    max_latency_ms=20.0, latency_95th_percentile_ms=2.0, disk_size_gb=profile[3], created_at=created_at))
+            network.append(NetworkBenchmark(provider=provider, mbit_per_second=rng.uniform(20, 1000), created_at=created_at))
+            if gpu_model:
+                gpu.append(GPUTask(
+                    provider=provider, gpu_info={'gpus': [{'name': gpu_model[0], 'quantity': 1}]},
+                    gpu_burn_gflops=gpu_model[1] * rng.uniform(0.9, 1.05), created_at=created_at))
+
+    ping_results = []
+    for provider in provider_objects:
+        base = rng.uniform(10, 250)
+        for region in PING_REGIONS:
+            for _ in range(pings):
+                ping = base * rng.uniform(0.8, 1.5)
+                ping_results.append(PingResult(
+                    provider=provider, region=region, is_p2p=rng.random() < 0.3, ping_tcp=int(ping),
+                    ping_udp=int(ping * 0.9), from_non_p2p_pinger=rng.random() < 0.5, created_at=moment()))
+
+    task_objects = []
+    for i in range(tasks):
+        started_at = moment()
+        task_objects.append(Task(name=f"synthetic-task-{i}", started_at=started_at,
+                                 finished_at=started_at + timedelta(minutes=30), cost=rng.uniform(0.1, 5)))
+
+    with transaction.atomic(), explicit_timestamps():
+        Provider.objects.bulk_create(provider_objects, batch_size=BATCH_SIZE)
+        NodeStatusHistory.objects.bulk_create(statuses, batch_size=BATCH_SIZE)
+        OnlineNode.objects.bulk_create(online, batch_size=BATCH_SIZE)
+        for model, rows in ((CpuBenchmark, cpu), (MemoryBenchmark, memory), (DiskBenchmark, disk),
+                            (NetworkBenchmark, network), (GPUTask, gpu), (PingResult, ping_results)):
+            model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        Task.objects.bulk_create(task_objects, batch_size=BATCH_SIZE)
+
+        properties_by_hash = {}
+        offers = []
+        completions = []
+        for task in task_objects:
+            for provider in provider_objects:
+                if rng.random() >= offer_ratio:
+                    continue
+                profile, _, gpu_model, success_rate = profiles[provider.node_id]
+                properties = {
+                    'golem.inf.cpu.brand': profile[0],
+                    'golem.inf.cpu.threads': profile[1],
+                    'golem.inf.mem.gib': profile[2],
+                    'golem.inf.storage.gib': profile[3],
+                    'golem.runtime.name': 'vm',
+                }
+                if gpu_model:
+                    properties['golem.!exp.gap-35.v1.inf.gpu.model'] = gpu_model[0]
+                properties_hash = OfferProperties.hash_properties(properties)
+                properties_by_hash[properties_hash] = properties
+                accepted = rng.random() < 0.9
+                offers.append(Offer(provider=provider, task=task, properties_id=properties_hash, accepted=accepted,
+                                    reason='' if accepted else 'Price too high', created_at=task.started_at))
+                if accepted:
+                    successful = rng.random() < success_rate
+                    completions.append(TaskCompletion(
+                        provider=provider, task=task, task_name=task.name, is_successful=successful,
+                        error_message=None if successful else 'Task timed out', timestamp=task.started_at,
+                        cost=rng.uniform(0.01, 0.5), type='GPU' if gpu_model else 'CPU'))
+
+        OfferProperties.objects.bulk_create(
+            [OfferProperties.from_properties(properties) for properties in properties_by_hash.values()],
+            batch_size=BATCH_SIZE, ignore_conflicts=True)
+        Offer.objects.bulk_create(offers, batch_size=BATCH_SIZE)
+        TaskCompletion.objects.bulk_create(completions, batch_size=BATCH_SIZE)
+
+    reset_online_nodes_cache()
+
+    return {
+        'providers': len(provider_objects),
+        'status_transitions': len(statuses),
+        'online_nodes': len(online),
+        'cpu_benchmarks': len(cpu),
+        'memory_benchmarks': len(memory),
+        'disk_benchmarks': len(disk),
+        'network_benchmarks': len(network),
+        'gpu_tasks': len(gpu),
+        'pings': len(ping_results),
+        'tasks': len(task_objects),
+        'offers': len(offers),
+        'task_completions': len(completions),
+    }
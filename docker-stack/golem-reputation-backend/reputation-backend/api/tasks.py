@@ -6,131 +6,209 @@ from django.db.models import Subquery, OuterRef
 from django.db.models.functions import Cast
 from django.db.models import Count, Avg, StdDev, FloatField, Q, Subquery, OuterRef, F, Max
 from .models import Provider, TaskCompletion, BlacklistedOperator, BlacklistedProvider
-from .scoring import calculate_uptime, get_normalized_cpu_scores
+from .scoring import calculate_uptime, get_cpu_score_maxima, get_normalized_cpu_scores, get_provider_percentiles, get_top_80_percent_cpu_multithread_providers, WHITELIST_CACHED_PARAMS, WHITELIST_CACHE_KEY, PROVIDER_SCORES_HASH_KEY
 from django.utils import timezone
 from datetime import timedelta
 from django.db.models import Count, Q
-from .scanner import monitor_nodes_status  # Import the task
 import asyncio
+import time
 from core.celery import app
-from .ping import ping_providers
-import redis
+from core.scheduling import singleton_task
+from core.metrics import record_ingest
+from .online import get_online_node_ids, rebuild_online_nodes, update_online_nodes
+from .submissions import claim_submission, get_submission, get_submission_payload, update_submission
+from .bulkutils import process_bulk_benchmarks, process_task_completions
+from .partitions import ensure_monthly_partitions
+from .extrema import rebuild_benchmark_extrema
+from .blacklist import publish_blacklisted_providers, publish_blacklisted_wallets
+from .score_updates import take_dirty_providers, finish_dirty_providers, needs_full_rebuild, record_full_rebuild, mark_providers_dirty
+from core.redis_clients import redis_client
 import json
-from .models import Task, Provider, Offer, NodeStatusHistory, BlacklistedOperator, BlacklistedProvider
+from .models import Task, Provider, Offer, OfferProperties, NodeStatusHistory, BlacklistedOperator, BlacklistedProvider, ProcessedSubmission
 from django.db.models import OuterRef, Subquery
-# Update with your Redis configuration
-redis_client = redis.Redis(host='redis', port=6379, db=0)
+from django.db import connection, transaction
 
 
+# The scanner and pinger are imported by the tasks running them, so only the
+# workers consuming those queues load yapapi and aiohttp
 @app.task
 def monitor_nodes_task(subnet_tag='public'):
+    from .scanner import monitor_nodes_status
+
     # Run the asyncio function using asyncio.run()
     asyncio.run(monitor_nodes_status(subnet_tag))
 
 
+@app.task
+@singleton_task()
+def stream_nodes_task(subnet_tags=('public',), batch_size=200, flush_interval=5):
+    from .scanner import stream_nodes_status
+
+    asyncio.run(stream_nodes_status(
+        subnet_tags, batch_size=batch_size, flush_interval=flush_interval))
+
+
 @app.task
 def ping_providers_task(p2p):
+    from .ping import ping_providers
+
     asyncio.run(ping_providers(p2p))
 
 
 @app.task
+@singleton_task()
 def process_offers_from_redis():
     # Fetch all Redis keys that match the pattern
     offer_keys = redis_client.keys('offer:*')
+    if not offer_keys:
+        return
     offers_to_create = []
+    # Distinct offer properties in this batch, keyed by hash
+    properties_to_create = {}
+    processed_keys = []
 
-    for key in offer_keys:
+    # One round trip for all the values instead of a GET per offer
+    for key, value in zip(offer_keys, redis_client.mget(offer_keys)):
+        if value is None:
+            continue
         # Load the extended offer data, which now includes reason and accepted
-        offer_data = json.loads(redis_client.get(key))
+        offer_data = json.loads(value)
         _, task_id, node_id = key.decode('utf-8').split(':')
 
         try:
             task = Task.objects.get(id=task_id)
             provider = Provider.objects.get(node_id=node_id)
+            properties = offer_data.get('offer', {})
+            properties_hash = OfferProperties.hash_properties(properties)
+            properties_to_create[properties_hash] = properties
             offer_instance = Offer(
                 task=task,
                 provider=provider,
-                offer=offer_data.get('offer', {}),
+                properties_id=properties_hash,
                 reason=offer_data.get('reason', ''),
                 accepted=offer_data.get('accepted', False)
             )
             offers_to_create.append(offer_instance)
-
-            # Optionally, delete the key from Redis after processing
-            redis_client.delete(key)
+            processed_keys.append(key)
         except (Task.DoesNotExist, Provider.DoesNotExist):
             continue
 
-    # Bulk create offers
+    # Store each distinct property set once, then the offers referencing it
+    OfferProperties.objects.bulk_create(
+        [OfferProperties.from_properties(properties)
+         for properties in properties_to_create.values()],
+        ignore_conflicts=True
+    )
     Offer.objects.bulk_create(offers_to_create)
+    # Only dropped once stored, a failed run leaves them for the next one
+    if processed_keys:
+        redis_client.delete(*processed_keys)
+    record_ingest('offer', len(offers_to_create))
 
 
-@app.task(queue='default', options={'queue': 'default', 'routing_key': 'default'})
-def update_provider_scores(network):
-    r = redis.Redis(host='redis', port=6379, db=0)
+def get_provider_score_entries(network, online_provider_ids, node_ids=None):
+    """
+    Computes the v2 score documents of the online providers on a network.
+
+    :param node_ids: Only score these providers, for an incremental update.
+    :return: Dictionary of node_id -> score document. Providers whose task
+             completions are all older than the success rate window are in
+             neither the tested nor the untested list and left out.
+    """
     ten_days_ago = timezone.now() - timedelta(days=10)
-    recent_online_providers = NodeStatusHistory.objects.filter(
-        is_online=True).order_by('node_id', '-timestamp').distinct('node_id')
-    online_provider_ids = [status.node_id for status in recent_online_providers]
-    providers = Provider.objects.filter(node_id__in=online_provider_ids, network=network).annotate(
+    selected_ids = online_provider_ids if node_ids is None else online_provider_ids & set(node_ids)
+    entries = {}
+    if not selected_ids:
+        return entries
+
+    providers = Provider.objects.filter(node_id__in=selected_ids, network=network).annotate(
         success_count=Count('taskcompletion', filter=Q(
             taskcompletion__is_successful=True, taskcompletion__timestamp__gte=ten_days_ago)),
         total_count=Count('taskcompletion', filter=Q(
             taskcompletion__timestamp__gte=ten_days_ago)),
     ).all()
-    response_v1 = {"providers": [], "untestedProviders": []}
-    response_v2 = {"testedProviders": [], "untestedProviders": []}
-    cpu_scores = get_normalized_cpu_scores()
+    cpu_scores = get_normalized_cpu_scores(None if node_ids is None else selected_ids)
     for provider in providers:
         if provider.total_count > 0:
             success_ratio = provider.success_count / provider.total_count
-            uptime_percentage = calculate_uptime(provider.node_id)
-
-            provider_info_v1 = {
-                "providerId": provider.node_id,
+            uptime_percentage = calculate_uptime(provider.node_id, provider)
+            entries[provider.node_id] = {
+                "provider": {'id': provider.node_id, 'name': provider.name, 'walletAddress': provider.wallet_address},
                 "scores": {
                     "successRate": success_ratio,
                     "uptime": uptime_percentage / 100,
-                }
-            }
-
-            provider_info_v2 = {
-                "provider": {'id': provider.node_id, 'name': provider.name, 'walletAddress': provider.payment_addresses.get('golem.com.payment.platform.erc20-mainnet-glm.address')},
-                "scores": {
-                    **provider_info_v1["scores"],
                     "cpuSingleThreadScore": cpu_scores[provider.node_id]["single_thread_score"],
                     "cpuMultiThreadScore": cpu_scores[provider.node_id]["multi_thread_score"]
                 }
             }
 
-            response_v1["providers"].append(provider_info_v1)
-            response_v2["testedProviders"].append(provider_info_v2)
-
     providers_with_no_tasks = Provider.objects.filter(
-        node_id__in=online_provider_ids, taskcompletion__isnull=True, network=network)
+        node_id__in=selected_ids, taskcompletion__isnull=True, network=network)
     for provider in providers_with_no_tasks:
-        uptime_percentage = calculate_uptime(provider.node_id)
-        untested_info = {
-            "providerId": provider.node_id,
+        uptime_percentage = calculate_uptime(provider.node_id, provider)
+        entries[provider.node_id] = {
+            "provider": {'id': provider.node_id, 'name': provider.name, 'walletAddress': provider.wallet_address},
             "scores": {
                 "uptime": uptime_percentage / 100,
             }
         }
-        untested_info_v2 = {
-            "provider": {'id': provider.node_id, 'name': provider.name, 'walletAddress': provider.payment_addresses.get('golem.com.payment.platform.erc20-mainnet-glm.address')},
-            "scores": {
-                "uptime": uptime_percentage / 100,
-            }
-        }
-        response_v1["untestedProviders"].append(untested_info)
-        response_v2["untestedProviders"].append(untested_info_v2)
+    return entries
+
+
+@app.task(queue='default', options={'queue': 'default', 'routing_key': 'default'})
+@singleton_task()
+def update_provider_scores(network):
+    """
+    Publishes the provider score snapshots of a network. Only the providers
+    marked dirty since the last run are rescored and patched into the stored
+    per-provider documents, unless a full rebuild is due (see needs_full_rebuild).
+    """
+    online_provider_ids = get_online_node_ids()
+    dirty_provider_ids = take_dirty_providers(network)
+    cpu_maxima = get_cpu_score_maxima()
+    key = PROVIDER_SCORES_HASH_KEY.format(network)
+
+    if needs_full_rebuild(network, cpu_maxima):
+        entries = get_provider_score_entries(network, online_provider_ids)
+        # Replaced as a whole so providers that went offline drop out
+        pipe = redis_client.pipeline()
+        pipe.delete(f"{key}:tmp")
+        if entries:
+            pipe.hset(f"{key}:tmp", mapping={node_id: json.dumps(info) for node_id, info in entries.items()})
+            pipe.rename(f"{key}:tmp", key)
+        else:
+            pipe.delete(key)
+        pipe.execute()
+        record_full_rebuild(network, cpu_maxima)
+        print(f"Rescored all {len(entries)} {network} providers")
+    else:
+        updated = get_provider_score_entries(network, online_provider_ids, dirty_provider_ids)
+        # Offline, moved to another network or no longer scored
+        removed = dirty_provider_ids - set(updated)
+        pipe = redis_client.pipeline()
+        if updated:
+            pipe.hset(key, mapping={node_id: json.dumps(info) for node_id, info in updated.items()})
+        if removed:
+            pipe.hdel(key, *removed)
+        pipe.hgetall(key)
+        entries = {node_id.decode('utf-8'): json.loads(info) for node_id, info in pipe.execute()[-1].items()}
+        print(f"Rescored {len(updated)} of {len(dirty_provider_ids)} changed {network} providers")
+
+    response_v1 = {"providers": [], "untestedProviders": []}
+    response_v2 = {"testedProviders": [], "untestedProviders": []}
+    for node_id, info in entries.items():
+        tested = "successRate" in info["scores"]
+        response_v1["providers" if tested else "untestedProviders"].append({
+            "providerId": node_id,
+            "scores": {name: info["scores"][name] for name in ("successRate", "uptime") if name in info["scores"]},
+        })
+        response_v2["testedProviders" if tested else "untestedProviders"].append(info)
 
     rejected_providers_v2 = BlacklistedProvider.objects.select_related('provider').annotate(
         providerId=F('provider_id'),
         # Adjust these field lookups based on your actual model relationships
         name=F('provider__name'),
-        walletAddress=F(
-            'provider__payment_addresses__golem.com.payment.platform.erc20-mainnet-glm.address')
+        walletAddress=F('provider__wallet_address')
     ).values('providerId', 'name', 'walletAddress', 'reason')
 
     rejected_providers_list = [
@@ -161,13 +239,9 @@ def update_provider_scores(network):
         providerId=F('provider_id')).values('providerId', 'reason')
     rejected_operators_v1 = BlacklistedOperator.objects.all().values('wallet', 'reason')
 
-    blacklisted_operators_wallets = list(
-        BlacklistedOperator.objects.values_list('wallet', flat=True))
-    total_blacklist_count = 0
-    for wallet in blacklisted_operators_wallets:
-        key = f"golem.com.payment.platform.erc20-mainnet-glm.address"
-        total_blacklist_count += Provider.objects.filter(payment_addresses__has_key=key, payment_addresses__contains={
-                                                         key: wallet}, node_id__in=online_provider_ids).count()
+    total_blacklist_count = Provider.objects.filter(
+        wallet_address__in=BlacklistedOperator.objects.values('wallet'),
+        node_id__in=online_provider_ids).count()
 
     for provider in rejected_providers_v2:
         total_blacklist_count += 1
@@ -187,212 +261,212 @@ def update_provider_scores(network):
     response_v1["totalOnlineProvidersTestnet"] = testnet_online_provider_count
     response_v2["totalOnlineProvidersMainnet"] = mainnet_online_provider_count
     response_v2["totalOnlineProvidersTestnet"] = testnet_online_provider_count
-    r.set(f'provider_scores_v1_{network}', json.dumps(response_v1))
-    r.set(f'provider_scores_v2_{network}', json.dumps(response_v2))
+    pipe = redis_client.pipeline()
+    pipe.set(f'provider_scores_v1_{network}', json.dumps(response_v1))
+    pipe.set(f'provider_scores_v2_{network}', json.dumps(response_v2))
+    pipe.execute()
+    finish_dirty_providers(network)
+
+
+# Per-wallet task success ratio over the lookback window, standardised against
+# the mean/stddev of all wallets (a zero stddev falls back to 1).
+OPERATOR_SUCCESS_ZSCORE_SQL = """
+    WITH wallet_tasks AS (
+        SELECT
+            p.wallet_address AS wallet,
+            COUNT(*) AS total_tasks,
+            COUNT(*) FILTER (WHERE t.is_successful)::float / COUNT(*) AS success_ratio
+        FROM api_taskcompletion t
+        JOIN api_provider p ON p.node_id = t.provider_id
+        WHERE t."timestamp" >= %(since)s
+          AND p.wallet_address IS NOT NULL
+        GROUP BY 1
+    ), stats AS (
+        SELECT
+            AVG(success_ratio) AS avg_ratio,
+            COALESCE(NULLIF(STDDEV_POP(success_ratio), 0), 1) AS stddev_ratio
+        FROM wallet_tasks
+    )
+    SELECT wallet, (success_ratio - avg_ratio) / stddev_ratio AS z_score
+    FROM wallet_tasks, stats
+    WHERE total_tasks >= %(min_tasks)s
+      AND (success_ratio - avg_ratio) / stddev_ratio <= %(z_threshold)s
+"""
+
+# Wallets running at least `min_online` online nodes, reported once per wallet
+# with the worst relative CPU benchmark stddev among their providers.
+OPERATOR_CPU_DEVIATION_SQL = """
+    WITH eligible_wallets AS (
+        SELECT p.wallet_address AS wallet
+        FROM api_provider p
+        JOIN api_onlinenode o ON o.node_id = p.node_id
+        WHERE p.wallet_address IS NOT NULL
+        GROUP BY 1
+        HAVING COUNT(*) >= %(min_online)s
+    ), provider_deviation AS (
+        SELECT
+            p.wallet_address AS wallet,
+            COALESCE(
+                STDDEV_POP(b.events_per_second) FILTER (WHERE b.benchmark_name = %(multi)s)
+                / NULLIF(AVG(b.events_per_second) FILTER (WHERE b.benchmark_name = %(multi)s), 0),
+                0
+            ) AS multi_deviation,
+            COALESCE(
+                STDDEV_POP(b.events_per_second) FILTER (WHERE b.benchmark_name = %(single)s)
+                / NULLIF(AVG(b.events_per_second) FILTER (WHERE b.benchmark_name = %(single)s), 0),
+                0
+            ) AS single_deviation
+        FROM api_cpubenchmark b
+        JOIN api_provider p ON p.node_id = b.provider_id
+        JOIN eligible_wallets w ON w.wallet = p.wallet_address
+        WHERE b.created_at >= %(since)s
+        GROUP BY 1, b.provider_id
+    )
+    SELECT DISTINCT ON (wallet) wallet, multi_deviation, single_deviation
+    FROM provider_deviation
+    WHERE multi_deviation > %(threshold)s OR single_deviation > %(threshold)s
+    ORDER BY wallet, GREATEST(multi_deviation, single_deviation) DESC
+"""
 
 
 @app.task
+@singleton_task()
 def get_blacklisted_operators():
-    blacklist = []
-
+    started = time.perf_counter()
     now = timezone.now()
-    recent_tasks = TaskCompletion.objects.filter(
-        timestamp__gte=now - timedelta(days=3)
-    ).annotate(
-        payment_address=F(
-            'provider__payment_addresses__golem_com_payment_platform_erc20_mainnet_glm_address')
-    ).values('payment_address').annotate(
-        successful_tasks=Count('pk', filter=Q(is_successful=True)),
-        total_tasks=Count('pk'),
-        success_ratio=Cast('successful_tasks', FloatField()) /
-        Cast('total_tasks', FloatField())
-    ).exclude(total_tasks=0)
-
-    success_stats = recent_tasks.aggregate(
-        average_success_ratio=Avg('success_ratio'),
-        stddev_success_ratio=StdDev('success_ratio')
-    )
-
-    avg_success_ratio = success_stats.get('average_success_ratio', 0) or 0
-    stddev_success_ratio = success_stats.get('stddev_success_ratio', 0) or 1
-
-    recent_tasks_with_z_score = recent_tasks.annotate(
-        z_score=(F('success_ratio') - avg_success_ratio) / stddev_success_ratio
-    )
-
     z_score_threshold = -1
-    blacklisted_addr_success = list(recent_tasks_with_z_score.filter(
-        z_score__lte=z_score_threshold,
-        total_tasks__gte=5
-    ).values_list(
-        'payment_address', flat=True
-    ).distinct())
-
-    for payment_address in blacklisted_addr_success:
-        # Blacklist the Operator
-        blacklist.append({
-            "wallet": payment_address,
-            "reason": f"Task success ratio deviation: z-score={z_score_threshold}. Operator has significantly lower success ratio than the average."
+    deviation_threshold = 0.20
 
+    # Keyed by wallet; a CPU deviation reason takes precedence over a success ratio one
+    blacklist = {}
+    with connection.cursor() as cursor:
+        cursor.execute(OPERATOR_SUCCESS_ZSCORE_SQL, {
+            "since": now - timedelta(days=3),
+            "min_tasks": 5,
+            "z_threshold": z_score_threshold,
         })
+        for payment_address, _ in cursor.fetchall():
+            blacklist[payment_address] = f"Task success ratio deviation: z-score={z_score_threshold}. Operator has significantly lower success ratio than the average."
+
+        cursor.execute(OPERATOR_CPU_DEVIATION_SQL, {
+            "since": now - timedelta(days=3),
+            "min_online": 3,
+            "multi": "CPU Multi-thread Benchmark",
+            "single": "CPU Single-thread Benchmark",
+            "threshold": deviation_threshold,
+        })
+        for payment_address, multi_deviation, single_deviation in cursor.fetchall():
+            blacklist[payment_address] = f"CPU benchmark deviation: multi={multi_deviation:.2f}, single={single_deviation:.2f} over threshold {deviation_threshold}. Possibly overprovisioned."
 
-    latest_online_statuses = NodeStatusHistory.objects.annotate(
-        latest=Max('timestamp', filter=Q(is_online=True))
-    ).filter(
-        timestamp=F('latest'), is_online=True
-    ).values_list('node_id', flat=True)
-
-    providers = Provider.objects.filter(
-        node_id__in=latest_online_statuses
-    )
-
-    eligible_payment_addresses = providers.annotate(
-        payment_address=KeyTextTransform(
-            'golem.com.payment.platform.erc20-mainnet-glm.address', 'payment_addresses')
-    ).values('payment_address').annotate(
-        online_count=Count('node_id')
-    ).filter(
-        online_count__gte=3
-    ).values_list('payment_address', flat=True)
-
-    # Assuming eligible_payment_addresses are now extracted accurately
-    # Cast the JSON field key access to text for PostgreSQL comparison
-    # Make sure it's a list for __in lookup
-    eligible_payment_addresses = list(eligible_payment_addresses)
-
-    providers_performance = Provider.objects.filter(
-        payment_addresses__has_key='golem.com.payment.platform.erc20-mainnet-glm.address'
-    ).annotate(
-        payment_addr=KeyTextTransform(
-            'golem.com.payment.platform.erc20-mainnet-glm.address', 'payment_addresses')
-    )
-
-    # Prepare a set or list from eligible_payment_addresses for efficient lookups
-    eligible_payment_addresses_set = set(eligible_payment_addresses)
-
-    # Manually filter providers based on the payment address
-    eligible_providers = [
-        provider.node_id for provider in providers_performance
-        if provider.payment_addr in eligible_payment_addresses_set
-    ]
-
-    # Re-fetch providers with performance annotations
-    providers_with_recent_benchmarks = Provider.objects.filter(
-        # Use the list of node IDs that passed initial eligibility
-        node_id__in=eligible_providers
-    ).annotate(
-        recent_benchmark_count=Count(
-            'cpubenchmark',
-            filter=Q(cpubenchmark__created_at__gte=now - timedelta(days=3))
-        )
-    ).filter(
-        recent_benchmark_count__gt=0  # Ensure there's at least one recent benchmark
-    )
-
-    # Calculate deviation for these providers
-    providers_with_deviation = providers_with_recent_benchmarks.annotate(
-        avg_eps_multi=Avg(
-            'cpubenchmark__events_per_second',
-            filter=Q(cpubenchmark__benchmark_name="CPU Multi-thread Benchmark",
-                     cpubenchmark__created_at__gte=now - timedelta(days=3))
-        ),
-        stddev_eps_multi=StdDev(
-            'cpubenchmark__events_per_second',
-            filter=Q(cpubenchmark__benchmark_name="CPU Multi-thread Benchmark",
-                     cpubenchmark__created_at__gte=now - timedelta(days=3))
-        ),
-        avg_eps_single=Avg(
-            'cpubenchmark__events_per_second',
-            filter=Q(cpubenchmark__benchmark_name="CPU Single-thread Benchmark",
-                     cpubenchmark__created_at__gte=now - timedelta(days=3))
-        ),
-        stddev_eps_single=StdDev(
-            'cpubenchmark__events_per_second',
-            filter=Q(cpubenchmark__benchmark_name="CPU Single-thread Benchmark",
-                     cpubenchmark__created_at__gte=now - timedelta(days=3))
+    with transaction.atomic():
+        BlacklistedOperator.objects.bulk_create(
+            [BlacklistedOperator(wallet=wallet, reason=reason)
+             for wallet, reason in blacklist.items()],
+            update_conflicts=True,
+            unique_fields=['wallet'],
+            update_fields=['reason'],
         )
+        BlacklistedOperator.objects.exclude(wallet__in=list(blacklist)).delete()
+        publish_blacklisted_wallets(list(blacklist))
+
+    runtime = time.perf_counter() - started
+    print(f"get_blacklisted_operators: {len(blacklist)} operators blacklisted in {runtime:.3f}s")
+    return runtime
+
+
+# Exponential backoff after a failed task: 10h doubling per failure in the
+# last 3 days, capped at 6 failures so it stays within 14 days
+BACKOFF_HOURS = 10
+MAX_BACKOFF_FAILURES = 6
+FAILURE_LOOKBACK = timedelta(days=3)
+MAX_BACKOFF = timedelta(hours=BACKOFF_HOURS * 2 ** (MAX_BACKOFF_FAILURES - 1))
+
+# Latest task per provider plus its failure count over the lookback window,
+# with the backoff applied in SQL. A provider whose latest task is older than
+# the longest backoff can't be blacklisted, so only that window is scanned,
+# which also lets Postgres skip the older task completion partitions.
+BLACKLISTED_PROVIDERS_SQL = """
+    WITH ranked AS (
+        SELECT
+            provider_id,
+            is_successful,
+            "timestamp",
+            ROW_NUMBER() OVER w_latest AS rn,
+            COUNT(*) FILTER (
+                WHERE NOT is_successful AND "timestamp" >= %(since)s
+            ) OVER w_all AS recent_failures
+        FROM api_taskcompletion
+        WHERE "timestamp" >= %(window_start)s
+        WINDOW
+            w_latest AS (PARTITION BY provider_id ORDER BY "timestamp" DESC, id DESC),
+            w_all AS (PARTITION BY provider_id)
+    ), latest_failed AS (
+        SELECT
+            provider_id,
+            recent_failures,
+            "timestamp" + INTERVAL '1 hour' * (
+                %(backoff_hours)s * POWER(2, LEAST(recent_failures, %(max_failures)s) - 1)
+            ) AS next_eligible_date
+        FROM ranked
+        WHERE rn = 1 AND NOT is_successful
     )
-
-    blacklisted_addr = set()
-    deviation_threshold = 0.20
-    for provider in providers_with_deviation:
-        multi_deviation = provider.stddev_eps_multi / \
-            provider.avg_eps_multi if provider.avg_eps_multi else 0
-        single_deviation = provider.stddev_eps_single / \
-            provider.avg_eps_single if provider.avg_eps_single else 0
-
-        if multi_deviation > deviation_threshold or single_deviation > deviation_threshold:
-            payment_address = provider.payment_addresses.get(
-                'golem.com.payment.platform.erc20-mainnet-glm.address')
-            if payment_address not in blacklisted_addr:
-                blacklisted_addr.add(payment_address)
-                blacklist.append({
-                    "wallet": payment_address,
-                    "reason": f"CPU benchmark deviation: multi={multi_deviation:.2f}, single={single_deviation:.2f} over threshold {deviation_threshold}. Possibly overprovisioned."
-                })
-
-    new_wallets = {operator['wallet'] for operator in blacklist}
-
-    # Update existing entries and add new ones
-    for operator in blacklist:
-        obj, created = BlacklistedOperator.objects.update_or_create(
-            wallet=operator['wallet'],
-            defaults={'reason': operator['reason']},
-        )
-
-    # Find and delete any blacklisted operators not in the new list
-    BlacklistedOperator.objects.exclude(wallet__in=new_wallets).delete()
+    SELECT provider_id, recent_failures, next_eligible_date
+    FROM latest_failed
+    WHERE next_eligible_date > %(now)s
+"""
 
 
 @app.task
+@singleton_task()
 def get_blacklisted_providers():
-    # Clear the existing blacklisted providers
-    BlacklistedProvider.objects.all().delete()
     now = timezone.now()
 
-    # Subquery to get the most recent tasks for each provider
-    recent_tasks = TaskCompletion.objects.filter(
-        provider=OuterRef('node_id')
-    ).order_by('-timestamp')
-
-    # Annotate each provider with its most recent tasks
-    providers_with_tasks = Provider.objects.annotate(
-        recent_task=Subquery(recent_tasks.values('is_successful')[:1])
-    )
+    with connection.cursor() as cursor:
+        cursor.execute(BLACKLISTED_PROVIDERS_SQL, {
+            "window_start": now - MAX_BACKOFF,
+            "since": now - FAILURE_LOOKBACK,
+            "backoff_hours": BACKOFF_HOURS,
+            "max_failures": MAX_BACKOFF_FAILURES,
+            "now": now,
+        })
+        rows = cursor.fetchall()
 
-    # Filter providers whose most recent task was a failure
-    failed_providers = providers_with_tasks.filter(recent_task=False)
-
-    blacklisted_providers = []
-    for provider in failed_providers:
-        consecutive_failures = TaskCompletion.objects.filter(
-            provider=provider.node_id,
-            is_successful=False,
-            # Assuming we look at the last 3 days
-            timestamp__gte=now - timedelta(days=3)
-        ).count()
-
-        # Apply a cap to the consecutive_failures
-        max_consecutive_failures = 6  # Maximum failures to keep backoff within 14 days
-        effective_failures = min(consecutive_failures,
-                                 max_consecutive_failures)
-
-        # Exponential backoff formula
-        backoff_hours = 10 * (2 ** (effective_failures - 1))
-        next_eligible_date = provider.taskcompletion_set.latest(
-            'timestamp').timestamp + timedelta(hours=backoff_hours)
-
-        if now < next_eligible_date:
-            blacklisted_providers.append(provider.node_id)
-            BlacklistedProvider.objects.create(
-                provider=provider,
-                reason=f"Consecutive failures: {consecutive_failures}. Next eligible date: {next_eligible_date}"
-            )
+    blacklist = {
+        provider_id: f"Consecutive failures: {consecutive_failures}. Next eligible date: {next_eligible_date}"
+        for provider_id, consecutive_failures, next_eligible_date in rows
+    }
 
-    return blacklisted_providers
+    # Apply only the difference so the table is never empty mid-refresh
+    with transaction.atomic():
+        to_update = []
+        to_delete = []
+        seen = set()
+        for entry in BlacklistedProvider.objects.select_for_update().only('id', 'provider_id', 'reason'):
+            reason = blacklist.get(entry.provider_id)
+            if reason is None or entry.provider_id in seen:
+                to_delete.append(entry.id)
+                continue
+            seen.add(entry.provider_id)
+            if entry.reason != reason:
+                entry.reason = reason
+                to_update.append(entry)
+
+        if to_delete:
+            BlacklistedProvider.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            BlacklistedProvider.objects.bulk_update(to_update, ['reason'])
+        BlacklistedProvider.objects.bulk_create([
+            BlacklistedProvider(provider_id=provider_id, reason=reason)
+            for provider_id, reason in blacklist.items()
+            if provider_id not in seen
+        ])
+        publish_blacklisted_providers(list(blacklist))
+
+    return list(blacklist)
 
 
 @app.task
+@singleton_task()
 def delete_old_ping_results():
     # Calculate the date 30 days ago from today
     thirty_days_ago = timezone.now() - timedelta(days=30)
@@ -408,9 +482,7 @@ def delete_old_ping_results():
         f"Deleted {count_ping_results} PingResult records older than 30 days.")
     
 import requests 
-from .utils import check_node_status
 from django.db import transaction
-r = redis.Redis(host='redis', port=6379, db=0)
 
 @app.task
 def bulk_update_node_statuses(nodes_data):
@@ -425,6 +497,11 @@ def bulk_update_node_statuses(nodes_data):
 
         # Bulk create status history
         NodeStatusHistory.objects.bulk_create(status_history_to_create)
+        record_ingest('node_status', len(status_history_to_create))
+
+        # Later entries for the same node win, matching the history order
+        update_online_nodes(dict(nodes_data))
+        mark_providers_dirty(node_id for node_id, _ in nodes_data)
 
         #Clean up duplicate consecutive statuses !IMPORTANT KEEP HERE FOR NOW
         subquery = NodeStatusHistory.objects.filter(
@@ -436,3 +513,97 @@ def bulk_update_node_statuses(nodes_data):
             prev_status=Subquery(subquery.values('is_online')[:1])
         ).filter(is_online=F('prev_status'))
         duplicate_records.delete()
+
+
+@app.task
+@singleton_task()
+def reconcile_online_nodes():
+    online = rebuild_online_nodes()
+    print(f"Rebuilt the online set with {online} nodes")
+
+
+@app.task
+def process_bulk_submission(submission_id):
+    """
+    Writes a bulk upload staged by the /benchmark/bulk or /submit/task/status/bulk
+    endpoints. Only the delivery that claims the submission processes it, and the
+    ProcessedSubmission row written with the upload keeps a redelivered or
+    reclaimed submission from inserting the rows twice.
+    """
+    submission = get_submission(submission_id)
+    payload = get_submission_payload(submission_id)
+    if submission is None or payload is None:
+        print(f"Submission {submission_id} not found or expired")
+        return
+    if not claim_submission(submission_id):
+        print(f"Submission {submission_id} is not queued, skipping")
+        return
+
+    try:
+        with transaction.atomic():
+            # Waits for a concurrent delivery's transaction, then finds its row
+            _, created = ProcessedSubmission.objects.get_or_create(submission_id=submission_id)
+            if not created:
+                # Written by a delivery that died before recording the outcome
+                print(f"Submission {submission_id} was already written, skipping")
+                result = None
+            elif submission['kind'] == 'benchmark':
+                organized_data = {"disk": [], "cpu": [],
+                                  "memory": [], "network": [], "gpu": []}
+                for benchmark in payload['benchmarks']:
+                    organized_data[benchmark['type']].append(benchmark['data'])
+                result = process_bulk_benchmarks(organized_data)
+            else:
+                result = process_task_completions(payload)
+    except Exception as e:
+        print(f"Submission {submission_id} failed: {e!r}")
+        update_submission(submission_id, 'failed', {"status": "error", "message": repr(e)})
+        return
+
+    update_submission(submission_id, 'done', result)
+
+
+@app.task
+@singleton_task()
+def create_time_partitions():
+    ensure_monthly_partitions()
+
+
+@app.task
+@singleton_task()
+def cache_provider_percentiles():
+    """
+    Stores each online provider's percentile ranks in the `provider_percentiles`
+    Redis hash (node_id -> JSON), replacing the previous snapshot atomically.
+    """
+    percentiles = get_provider_percentiles(get_online_node_ids())
+
+    pipe = redis_client.pipeline()
+    if percentiles:
+        pipe.delete('provider_percentiles_tmp')
+        pipe.hset('provider_percentiles_tmp', mapping={
+            node_id: json.dumps(provider_percentiles) for node_id, provider_percentiles in percentiles.items()
+        })
+        pipe.rename('provider_percentiles_tmp', 'provider_percentiles')
+    else:
+        pipe.delete('provider_percentiles')
+    pipe.set('provider_percentiles_updated_at', timezone.now().isoformat())
+    pipe.execute()
+
+
+@app.task
+@singleton_task()
+def cache_provider_whitelists():
+    pipe = redis_client.pipeline()
+    for max_checked_days_ago, top_percent in WHITELIST_CACHED_PARAMS:
+        whitelist = get_top_80_percent_cpu_multithread_providers(
+            maxCheckedDaysAgo=max_checked_days_ago, topPercent=top_percent)
+        pipe.set(WHITELIST_CACHE_KEY.format(max_checked_days_ago, top_percent),
+                 json.dumps(whitelist), ex=900)
+    pipe.execute()
+
+
+@app.task
+@singleton_task()
+def refresh_benchmark_extrema():
+    rebuild_benchmark_extrema()
@@ -0,0 +1,855 @@
+import asyncio
+import json
+import fakeredis
+import os
+import subprocess
+import sys
+import time
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock, skipUnless
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from core import redis_clients
+from celery import current_task
+from celery.worker.request import Request
+from core.celery import app
+from core import scheduling
+from core.scheduling import ENQUEUED_AT_HEADER, LAST_STARTED_KEY, LOCK_KEY, RUNTIMES_KEY, adaptive_schedule, run_unlocked, singleton_task
+from api.benchmarks import JOBS, compare_results, run_benchmarks
+from api.blacklist import (BLACKLIST_PUBLISHED_KEY, BLACKLISTED_PROVIDERS_KEY, BLACKLISTED_WALLETS_KEY, PROVIDER_WALLETS_KEY,
+                           check_blacklist, publish_blacklisted_providers, publish_blacklisted_wallets)
+from api.bulkutils import process_task_completions
+from api.models import BlacklistedOperator, BlacklistedProvider, CpuBenchmark, NodeStatusHistory, OnlineNode, PingResult, Provider, Task, TaskCompletion
+from api.online import ONLINE_NODES_KEY, get_online_node_ids
+from api.scanner import OfferBatcher
+from api.partitions import ensure_monthly_partitions, get_partitioned_tables
+from api.query_budgets import QueryBudgetTestCase, PERIODIC_TASKS
+from api.scoring import PROVIDER_SCORES_HASH_KEY, calculate_uptimes, get_provider_percentiles, get_top_80_percent_cpu_multithread_providers
+from api.score_updates import SCORES_STATE_KEY
+from api.submissions import SUBMISSION_KEY, SUBMISSION_STALE_AFTER, claim_submission, get_submission, stage_submission
+from api.tasks import bulk_update_node_statuses, process_bulk_submission, update_provider_scores
+from api import score_updates, tasks
+
+
+class PeriodicTaskQueryBudgetTests(QueryBudgetTestCase):
+    # Task name and scheduled kwargs: (queries, per provider, seconds)
+    budgets = {
+        ('get_blacklisted_providers', ()): (4, 0, 5),
+        ('get_blacklisted_operators', ()): (6, 0, 5),
+        # Incremental runs with nothing marked dirty, see IncrementalScoreTests
+        ('update_provider_scores', (('network', 'mainnet'),)): (12, 0, 5),
+        ('update_provider_scores', (('network', 'testnet'),)): (12, 0, 5),
+        ('cache_provider_percentiles', ()): (2, 0, 5),
+        ('cache_provider_whitelists', ()): (6, 0, 5),
+        ('refresh_benchmark_extrema', ()): (8, 0, 5),
+        ('process_offers_from_redis', ()): (2, 0, 5),
+        ('delete_old_ping_results', ()): (3, 0, 5),
+        # Five statements per partitioned table, which don't depend on the data
+        ('create_time_partitions', ()): (40, 0, 5),
+        ('reconcile_online_nodes', ()): (1, 0, 5),
+        # calculate_uptime runs three queries per online provider, and about
+        # half of the generated providers are online
+        ('cache_provider_uptime', ()): (5, 2, 10),
+        ('cache_provider_success_ratio', ()): (2, 0, 5),
+        ('cache_cpu_performance_ranking', ()): (2, 0, 5),
+        ('cache_gpu_performance_ranking', ()): (2, 0, 5),
+        ('populate_daily_provider_stats', ()): (2, 0, 5),
+    }
+
+    def test_periodic_tasks_stay_within_budget(self):
+        for task, kwargs in PERIODIC_TASKS:
+            name = task.name.rsplit('.', 1)[-1]
+            queries, per_provider, seconds = self.budgets[(name, tuple(sorted(kwargs.items())))]
+            with self.subTest(task=name, **kwargs):
+                with self.assertWithinBudget(name, self.budget(queries, per_provider), seconds):
+                    run_unlocked(task, **kwargs)
+
+
+class IncrementalScoreTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.provider = Provider.objects.get(node_id=self.node_id)
+        self.network = self.provider.network
+
+    def update_scores(self):
+        run_unlocked(update_provider_scores, network=self.network)
+        snapshot = json.loads(tasks.redis_client.get(f'provider_scores_v2_{self.network}'))
+        documents = {info['provider']['id']: info for info in snapshot['testedProviders'] + snapshot['untestedProviders']}
+        stored = tasks.redis_client.hget(PROVIDER_SCORES_HASH_KEY.format(self.network), self.node_id)
+        return documents.get(self.node_id), stored and json.loads(stored)
+
+    def test_task_completion_rescores_only_its_provider(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            process_task_completions([
+                {'node_id': self.node_id, 'task_id': Task.objects.first().id, 'task_name': 'failed',
+                 'is_successful': False, 'error_message': 'Timed out', 'type': 'CPU'}
+                for _ in range(20)
+            ])
+
+        with self.assertWithinBudget('incremental update_provider_scores', 20, 5):
+            document, stored = self.update_scores()
+        self.assertLess(document['scores']['successRate'], 0.5)
+        self.assertEqual(document, stored)
+
+    def test_provider_going_offline_is_removed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_update_node_statuses([(self.node_id, False)])
+
+        document, stored = self.update_scores()
+        self.assertIsNone(document)
+        self.assertIsNone(stored)
+
+    def test_full_rebuild_when_due(self):
+        score_updates.r.delete(SCORES_STATE_KEY.format(self.network))
+        # calculate_uptime runs once per online provider
+        with self.assertWithinBudget('full update_provider_scores', self.budget(15, 2), 10):
+            document, stored = self.update_scores()
+        self.assertEqual(document, stored)
+        self.assertTrue(score_updates.r.exists(SCORES_STATE_KEY.format(self.network)))
+
+
+def legacy_blacklisted_providers(now):
+    """
+    The per-provider loop get_blacklisted_providers replaced, returning the
+    reasons instead of writing them.
+    """
+    blacklist = {}
+    latest_results = Provider.objects.annotate(recent_task=Subquery(
+        TaskCompletion.objects.filter(provider=OuterRef('node_id')).order_by('-timestamp').values('is_successful')[:1]))
+    for provider in latest_results.filter(recent_task=False):
+        consecutive_failures = TaskCompletion.objects.filter(
+            provider=provider.node_id, is_successful=False, timestamp__gte=now - timedelta(days=3)).count()
+        backoff_hours = 10 * (2 ** (min(consecutive_failures, 6) - 1))
+        next_eligible_date = provider.taskcompletion_set.latest('timestamp').timestamp + timedelta(hours=backoff_hours)
+        if now < next_eligible_date:
+            blacklist[provider.node_id] = f"Consecutive failures: {consecutive_failures}. Next eligible date: {next_eligible_date}"
+    return blacklist
+
+
+class BlacklistedProvidersTests(QueryBudgetTestCase):
+    def add_provider(self, node_id, results):
+        """
+        :param results: (hours ago, is_successful) of each task the provider ran.
+        """
+        provider = Provider.objects.create(node_id=node_id)
+        now = timezone.now()
+        for hours_ago, is_successful in results:
+            completion = TaskCompletion.objects.create(provider=provider, task_name='blacklist', is_successful=is_successful)
+            TaskCompletion.objects.filter(id=completion.id).update(timestamp=now - timedelta(hours=hours_ago))
+        return node_id
+
+    def blacklist(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            blacklisted = run_unlocked(tasks.get_blacklisted_providers)
+        reasons = dict(BlacklistedProvider.objects.values_list('provider_id', 'reason'))
+        self.assertEqual(sorted(blacklisted), sorted(reasons))
+        self.assertEqual(set(reasons), {member.decode() for member in self.redis.smembers(BLACKLISTED_PROVIDERS_KEY)})
+        return reasons
+
+    def test_matches_the_per_provider_loop(self):
+        capped = self.add_provider('capped', [(hours, False) for hours in range(1, 9)])
+        self.add_provider('recovered', [(30, False), (20, False), (2, True)])
+        self.add_provider('quiet', [(100, False), (90, False)])
+        one_failure = self.add_provider('one_failure', [(48, True), (2, False)])
+        self.add_provider('backed_off', [(48, True), (12, False)])
+        self.add_provider('long_ago', [(24 * 20, False)])
+        reasons = self.blacklist()
+        expected = legacy_blacklisted_providers(timezone.now())
+
+        # The loop added wall-clock hours to the local time, the query adds elapsed
+        # hours, so the next eligible dates differ by an hour across a DST change
+        self.assertEqual({node_id: reason.split('.')[0] for node_id, reason in reasons.items()},
+                         {node_id: reason.split('.')[0] for node_id, reason in expected.items()})
+        self.assertIn(capped, reasons)
+        self.assertIn(one_failure, reasons)
+        for node_id in ['recovered', 'quiet', 'backed_off', 'long_ago']:
+            self.assertNotIn(node_id, reasons)
+
+    def test_backoff_is_capped(self):
+        capped = self.add_provider('capped', [(hours, False) for hours in range(1, 9)])
+        latest = timezone.make_aware(TaskCompletion.objects.filter(provider_id=capped).latest('timestamp').timestamp)
+        next_eligible_date = timezone.make_naive(latest.astimezone(dt_timezone.utc) + tasks.MAX_BACKOFF)
+        self.assertEqual(self.blacklist()[capped],
+                         f"Consecutive failures: 8. Next eligible date: {next_eligible_date}")
+
+    def test_latest_success_clears_the_blacklist(self):
+        node_id = self.add_provider('recovering', [(3, False), (2, False)])
+        self.assertIn(node_id, self.blacklist())
+        TaskCompletion.objects.create(provider_id=node_id, task_name='blacklist', is_successful=True)
+        self.assertNotIn(node_id, self.blacklist())
+
+
+class BlacklistedOperatorsTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        # Only the fixtures below count towards the wallet statistics
+        TaskCompletion.objects.all().delete()
+        CpuBenchmark.objects.all().delete()
+        OnlineNode.objects.all().delete()
+        self.providers_created = 0
+
+    def add_provider(self, wallet, successes=0, failures=0, online=False, multi_thread=()):
+        self.providers_created += 1
+        provider = Provider.objects.create(node_id=f'{wallet}-{self.providers_created}', wallet_address=wallet)
+        TaskCompletion.objects.bulk_create(
+            [TaskCompletion(provider=provider, task_name='operator', is_successful=True) for _ in range(successes)]
+            + [TaskCompletion(provider=provider, task_name='operator', is_successful=False) for _ in range(failures)])
+        CpuBenchmark.objects.bulk_create([
+            CpuBenchmark(provider=provider, benchmark_name='CPU Multi-thread Benchmark', threads=4, total_time_sec=10,
+                         total_events=int(events_per_second * 10), events_per_second=events_per_second,
+                         min_latency_ms=1, avg_latency_ms=1, max_latency_ms=1, latency_95th_percentile_ms=1,
+                         sum_latency_ms=1)
+            for events_per_second in multi_thread])
+        if online:
+            OnlineNode.objects.create(node_id=provider.node_id)
+
+    def blacklist(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            run_unlocked(tasks.get_blacklisted_operators)
+        wallets = dict(BlacklistedOperator.objects.values_list('wallet', 'reason'))
+        self.assertEqual(set(wallets), {member.decode() for member in self.redis.smembers(BLACKLISTED_WALLETS_KEY)})
+        return wallets
+
+    def test_wallets_below_the_success_z_score_are_blacklisted(self):
+        for wallet in ['steady-a', 'steady-b', 'steady-c', 'steady-d']:
+            self.add_provider(wallet, successes=10)
+        # Success ratio 0.2 against a mean of 0.7 and a stddev of 0.43: z = -1.17
+        self.add_provider('failing', successes=2, failures=8)
+        # Fewer tasks than the minimum, still part of the mean and stddev
+        self.add_provider('new', failures=4)
+        wallets = self.blacklist()
+        self.assertEqual(set(wallets), {'failing'})
+        self.assertTrue(wallets['failing'].startswith('Task success ratio deviation'))
+
+    def test_equal_success_ratios_blacklist_nobody(self):
+        # A zero stddev is replaced by 1, so every z-score is 0
+        for wallet in ['half-a', 'half-b', 'half-c']:
+            self.add_provider(wallet, successes=5, failures=5)
+        self.assertEqual(self.blacklist(), {})
+
+    def test_wallets_above_the_cpu_deviation_are_blacklisted(self):
+        # Relative stddev 50 / 150 = 0.33 on one of three online providers
+        self.add_provider('overprovisioned', online=True, multi_thread=[100, 200])
+        self.add_provider('overprovisioned', online=True, multi_thread=[100, 100])
+        self.add_provider('overprovisioned', online=True)
+        # 0.024, under the 0.20 threshold
+        for _ in range(3):
+            self.add_provider('consistent', online=True, multi_thread=[100, 105])
+        # Deviating, but with fewer than three online providers
+        for _ in range(2):
+            self.add_provider('small', online=True, multi_thread=[100, 300])
+        self.add_provider('small', multi_thread=[100, 300])
+        wallets = self.blacklist()
+        self.assertEqual(set(wallets), {'overprovisioned'})
+        self.assertEqual(
+            wallets['overprovisioned'],
+            'CPU benchmark deviation: multi=0.33, single=0.00 over threshold 0.2. Possibly overprovisioned.')
+
+
+class CheckBlacklistTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        BlacklistedProvider.objects.create(provider=Provider.objects.create(node_id='blacklisted-node'))
+        Provider.objects.create(node_id='blacklisted-wallet-node', wallet_address='blacklisted-wallet')
+        BlacklistedOperator.objects.create(wallet='blacklisted-wallet')
+        Provider.objects.create(node_id='clean-node', wallet_address='clean-wallet')
+        self.node_ids = ['blacklisted-node', 'blacklisted-wallet-node', 'clean-node', 'unknown-node']
+
+    def publish(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_blacklisted_providers(list(BlacklistedProvider.objects.values_list('provider_id', flat=True)))
+            publish_blacklisted_wallets(list(BlacklistedOperator.objects.values_list('wallet', flat=True)))
+
+    def test_redis_and_database_return_the_same_flags(self):
+        self.redis.delete(BLACKLIST_PUBLISHED_KEY, BLACKLISTED_PROVIDERS_KEY, BLACKLISTED_WALLETS_KEY, PROVIDER_WALLETS_KEY)
+        with self.assertNumQueries(3):
+            from_database = check_blacklist(self.node_ids)
+        self.publish()
+        with self.assertNumQueries(0):
+            from_redis = check_blacklist(self.node_ids)
+
+        self.assertEqual(from_redis, from_database)
+        self.assertEqual(
+            [(result['node_id'], result['is_blacklisted_provider'], result['is_blacklisted_wallet'])
+             for result in from_redis],
+            [
+                ('blacklisted-node', True, False),
+                ('blacklisted-wallet-node', False, True),
+                ('clean-node', False, False),
+                ('unknown-node', False, False),
+            ])
+
+    def test_a_half_published_blacklist_falls_back_to_the_database(self):
+        self.publish()
+        self.redis.srem(BLACKLIST_PUBLISHED_KEY, 'wallets')
+        self.redis.delete(BLACKLISTED_WALLETS_KEY)
+        with self.assertNumQueries(3):
+            results = check_blacklist(['blacklisted-wallet-node'])
+        self.assertTrue(results[0]['is_blacklisted_wallet'])
+
+
+class CpuMultithreadWhitelistTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        # Only the fixtures below are ranked
+        CpuBenchmark.objects.all().delete()
+
+    def add_provider(self, node_id, multi_thread):
+        provider = Provider.objects.create(node_id=node_id)
+        CpuBenchmark.objects.bulk_create([
+            CpuBenchmark(provider=provider, benchmark_name='CPU Multi-thread Benchmark', threads=4, total_time_sec=10,
+                         total_events=int(events_per_second * 10), events_per_second=events_per_second,
+                         min_latency_ms=1, avg_latency_ms=1, max_latency_ms=1, latency_95th_percentile_ms=1,
+                         sum_latency_ms=1)
+            for events_per_second in multi_thread])
+        return provider.pk
+
+    def add_providers(self):
+        # Ten runs sum to 1000, ahead of everyone when runs were added up
+        return {
+            'frequent': self.add_provider('frequent', [100] * 10),
+            'strong': self.add_provider('strong', [500]),
+            'medium': self.add_provider('medium', [250, 300, 350]),
+            'weak': self.add_provider('weak', [50, 50]),
+        }
+
+    def whitelist(self, top_percent):
+        return get_top_80_percent_cpu_multithread_providers(maxCheckedDaysAgo=3, topPercent=top_percent)
+
+    def test_frequent_benchmarks_do_not_outrank_a_stronger_provider(self):
+        ids = self.add_providers()
+        # Medians 500, 300, 100 and 50: the 75th percentile is 300
+        self.assertEqual(self.whitelist(25), [ids['strong'], ids['medium']])
+        self.assertEqual(self.whitelist(50), [ids['strong'], ids['medium'], ids['frequent']])
+
+    def test_top_100_percent_returns_everyone_best_first(self):
+        ids = self.add_providers()
+        expected = [ids['strong'], ids['medium'], ids['frequent'], ids['weak']]
+        self.assertEqual(self.whitelist(100), expected)
+        self.assertEqual(self.whitelist(150), expected)
+
+    def test_top_0_percent_returns_only_the_best(self):
+        ids = self.add_providers()
+        self.assertEqual(self.whitelist(0), [ids['strong']])
+        self.assertEqual(self.whitelist(-10), [ids['strong']])
+
+    def test_runs_outside_the_window_are_ignored(self):
+        ids = self.add_providers()
+        CpuBenchmark.objects.filter(provider_id=ids['strong']).update(created_at=timezone.now() - timedelta(days=4))
+        self.assertEqual(self.whitelist(100), [ids['medium'], ids['frequent'], ids['weak']])
+
+    def test_no_benchmarks_returns_nobody(self):
+        self.assertEqual(self.whitelist(100), [])
+
+
+class ProviderPercentileTests(TestCase):
+    def add_provider(self, node_id, multi_thread=(), pings=(), successes=(), statuses=()):
+        """
+        :param multi_thread: Multi-thread scores, oldest first.
+        :param statuses: (is_online, hours ago) pairs.
+        """
+        provider = Provider.objects.create(node_id=node_id)
+        now = timezone.now()
+        for age, events_per_second in enumerate(reversed(multi_thread)):
+            benchmark = CpuBenchmark.objects.create(
+                provider=provider, benchmark_name='CPU Multi-thread Benchmark', threads=4, total_time_sec=10,
+                total_events=int(events_per_second * 10), events_per_second=events_per_second,
+                min_latency_ms=1, avg_latency_ms=1, max_latency_ms=1, latency_95th_percentile_ms=1, sum_latency_ms=1)
+            CpuBenchmark.objects.filter(pk=benchmark.pk).update(created_at=now - timedelta(hours=age))
+        PingResult.objects.bulk_create([PingResult(provider=provider, ping_tcp=ping, ping_udp=ping) for ping in pings])
+        TaskCompletion.objects.bulk_create([
+            TaskCompletion(provider=provider, task_name='percentiles', is_successful=is_successful)
+            for is_successful in successes])
+        for is_online, hours_ago in statuses:
+            status = NodeStatusHistory.objects.create(node_id=node_id, is_online=is_online)
+            NodeStatusHistory.objects.filter(pk=status.pk).update(timestamp=now - timedelta(hours=hours_ago))
+
+    def test_a_single_provider_ranks_0_on_every_metric(self):
+        self.add_provider('only', multi_thread=[100], pings=[20], successes=[True], statuses=[(True, 2)])
+        self.assertEqual(get_provider_percentiles(['only']), {
+            'only': {'cpuMultiThread': 0, 'ping': 0, 'successRate': 0, 'uptime': 0},
+        })
+
+    def test_metrics_are_ranked_best_last(self):
+        # The oldest of four runs is left out of the average of the latest three
+        self.add_provider('slow', multi_thread=[1000, 100, 100, 100], pings=[30], successes=[True, False])
+        self.add_provider('average', multi_thread=[200], pings=[20], successes=[True, True])
+        # No task completions, so no success rate
+        self.add_provider('fast', multi_thread=[300], pings=[10])
+        percentiles = get_provider_percentiles(['slow', 'average', 'fast'])
+        self.assertEqual(percentiles, {
+            'slow': {'cpuMultiThread': 0, 'ping': 0, 'successRate': 0},
+            'average': {'cpuMultiThread': 0.5, 'ping': 0.5, 'successRate': 1},
+            'fast': {'cpuMultiThread': 1, 'ping': 1},
+        })
+
+    def test_uptime_counts_from_the_last_online_status_to_the_next_offline_one(self):
+        # A repeated online status restarts the count: 5 of 10 hours
+        self.add_provider('restarted', statuses=[(True, 10), (True, 5)])
+        # 8 of 10 hours
+        self.add_provider('went_offline', statuses=[(True, 10), (False, 2)])
+        # 9 of 10 hours, still online
+        self.add_provider('came_online', statuses=[(False, 10), (True, 9)])
+        node_ids = ['restarted', 'went_offline', 'came_online', 'unknown']
+        uptimes = calculate_uptimes(node_ids)
+        self.assertAlmostEqual(uptimes['restarted'], 50, delta=0.01)
+        self.assertAlmostEqual(uptimes['went_offline'], 80, delta=0.01)
+        self.assertAlmostEqual(uptimes['came_online'], 90, delta=0.01)
+        self.assertEqual(uptimes['unknown'], 0)
+        self.assertEqual(get_provider_percentiles(node_ids), {
+            'restarted': {'uptime': 0},
+            'went_offline': {'uptime': 0.5},
+            'came_online': {'uptime': 1},
+        })
+
+    def test_no_node_ids_returns_nothing(self):
+        self.assertEqual(get_provider_percentiles([]), {})
+
+
+class OnlineNodesTests(QueryBudgetTestCase):
+    def test_reconciling_repairs_a_drifted_online_set(self):
+        online = set(OnlineNode.objects.values_list('node_id', flat=True))
+        offline_node_id = Provider.objects.exclude(node_id__in=online).values_list('node_id', flat=True).first()
+        # Publishes applied out of order, and one lost
+        self.redis.srem(ONLINE_NODES_KEY, self.node_id)
+        self.redis.sadd(ONLINE_NODES_KEY, offline_node_id)
+        self.assertEqual(get_online_node_ids(), online - {self.node_id} | {offline_node_id})
+
+        run_unlocked(tasks.reconcile_online_nodes)
+        self.assertEqual(get_online_node_ids(), online)
+        self.assertFalse(self.redis.exists('online_nodes:rebuild'))
+
+    def test_reconciling_with_no_online_nodes_empties_the_set(self):
+        OnlineNode.objects.all().delete()
+        run_unlocked(tasks.reconcile_online_nodes)
+        self.assertFalse(self.redis.exists(ONLINE_NODES_KEY))
+        self.assertEqual(get_online_node_ids(), set())
+
+
+class BulkSubmissionTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.payload = [{'node_id': self.node_id, 'task_id': Task.objects.first().id, 'task_name': 'bulk',
+                         'is_successful': True, 'error_message': None, 'type': 'CPU'}]
+
+    def test_retry_returns_the_staged_submission(self):
+        self.assertTrue(stage_submission('retried', 'task_status', self.payload))
+        self.assertFalse(stage_submission('retried', 'task_status', []))
+        self.assertEqual(get_submission('retried')['status'], 'queued')
+        self.assertEqual(get_submission('retried')['kind'], 'task_status')
+
+    def test_redelivered_submission_is_written_once(self):
+        stage_submission('redelivered', 'task_status', self.payload)
+        before = TaskCompletion.objects.count()
+        process_bulk_submission('redelivered')
+        process_bulk_submission('redelivered')
+        self.assertEqual(TaskCompletion.objects.count(), before + 1)
+        self.assertEqual(get_submission('redelivered')['status'], 'done')
+
+    def test_reclaimed_submission_is_written_once(self):
+        stage_submission('reclaimed', 'task_status', self.payload)
+        process_bulk_submission('reclaimed')
+        before = TaskCompletion.objects.count()
+        # As if the worker died after committing, before recording the outcome
+        self.redis.hset(SUBMISSION_KEY.format('reclaimed'), mapping={
+            'status': 'processing', 'claimed_at': time.time() - SUBMISSION_STALE_AFTER - 1})
+        self.assertTrue(stage_submission('reclaimed', 'task_status', self.payload))
+        process_bulk_submission('reclaimed')
+        self.assertEqual(TaskCompletion.objects.count(), before)
+        self.assertEqual(get_submission('reclaimed')['status'], 'done')
+
+    def test_failed_and_stale_submissions_are_requeued(self):
+        stage_submission('failed', 'task_status', self.payload)
+        self.redis.hset(SUBMISSION_KEY.format('failed'), 'status', 'failed')
+        self.assertTrue(stage_submission('failed', 'task_status', self.payload))
+        self.assertEqual(get_submission('failed')['status'], 'queued')
+
+        stage_submission('processing', 'task_status', self.payload)
+        self.assertTrue(claim_submission('processing'))
+        # Claimed by a live worker
+        self.assertFalse(stage_submission('processing', 'task_status', self.payload))
+        self.assertFalse(claim_submission('processing'))
+        self.redis.hset(SUBMISSION_KEY.format('processing'), 'claimed_at', time.time() - SUBMISSION_STALE_AFTER - 1)
+        self.assertTrue(claim_submission('processing'))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning needs Postgres, set TEST_POSTGRES=1')
+class PartitionTests(TestCase):
+    table = 'test_readings'
+
+    def setUp(self):
+        now = timezone.now()
+        self.created = [now, now - timedelta(days=95), now - timedelta(days=600), now - timedelta(days=2000)]
+        with connection.cursor() as cursor:
+            # Django's foreign keys are deferred, but each test runs in one transaction
+            # and Postgres won't alter a table with checks still pending
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('CREATE TABLE test_sources (id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY)')
+            cursor.execute('INSERT INTO test_sources DEFAULT VALUES')
+            cursor.execute(f"""
+                CREATE TABLE {self.table} (
+                    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    created_at timestamptz NOT NULL,
+                    source_id bigint NOT NULL
+                        CONSTRAINT {self.table}_source_id_fk REFERENCES test_sources (id) DEFERRABLE INITIALLY DEFERRED
+                )""")
+            cursor.execute(f'CREATE INDEX {self.table}_source_id_idx ON {self.table} (source_id)')
+            for created_at in self.created:
+                cursor.execute(f'INSERT INTO {self.table} (created_at, source_id) VALUES (%s, 1)', [created_at])
+            # Leave a gap, as deleted rows would
+            cursor.execute(f'DELETE FROM {self.table} WHERE id = 2')
+            cursor.execute(f'INSERT INTO {self.table} (created_at, source_id) VALUES (%s, 1)', [now])
+
+    def fetch(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+
+    def partition(self):
+        self.fetch('SELECT partition_table_by_month(%s, %s, 12)', [self.table, 'created_at'])
+
+    def test_populated_table_is_partitioned_in_place(self):
+        rows = self.fetch(f'SELECT id, created_at FROM {self.table} ORDER BY id')
+        self.partition()
+
+        self.assertIn(self.table, get_partitioned_tables())
+        self.assertEqual(self.fetch(f'SELECT id, created_at FROM {self.table} ORDER BY id'), rows)
+        self.assertEqual(self.fetch(f'SELECT count(*) FROM {self.table}_history'), [(2,)])
+        self.assertEqual(self.fetch("SELECT to_regclass(%s)", [f'{self.table}_unpartitioned']), [(None,)])
+        self.assertEqual(
+            self.fetch('SELECT indexname FROM pg_indexes WHERE tablename = %s ORDER BY 1', [self.table]),
+            [(f'{self.table}_pkey',), (f'{self.table}_source_id_idx',)])
+        self.assertEqual(
+            self.fetch("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [self.table]),
+            [(f'{self.table}_source_id_fk',)])
+        self.assertEqual(
+            self.fetch("SELECT pg_get_serial_sequence(%s, 'id')", [self.table]), [(f'public.{self.table}_id_seq',)])
+        new_id = self.fetch(
+            f'INSERT INTO {self.table} (created_at, source_id) VALUES (%s, 1) RETURNING id', [timezone.now()])
+        self.assertEqual(new_id, [(max(id for id, _ in rows) + 1,)])
+
+    def test_partitioning_twice_is_a_no_op(self):
+        self.partition()
+        partitions = self.fetch('SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass ORDER BY 1', [self.table])
+        self.partition()
+        self.assertEqual(
+            self.fetch('SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass ORDER BY 1', [self.table]),
+            partitions)
+        self.assertEqual(self.fetch(f'SELECT count(*) FROM {self.table}'), [(len(self.created),)])
+
+    def test_rows_past_the_last_month_are_kept_and_moved(self):
+        self.partition()
+        ensure_monthly_partitions()
+        later = timezone.now() + timedelta(days=150)
+        self.fetch(f'INSERT INTO {self.table} (created_at, source_id) VALUES (%s, 1)', [later])
+        self.assertEqual(self.fetch(f'SELECT count(*) FROM {self.table}_default'), [(1,)])
+
+        ensure_monthly_partitions(months_ahead=6)
+        self.assertEqual(self.fetch(f'SELECT count(*) FROM {self.table}_default'), [(0,)])
+        self.assertEqual(
+            self.fetch(f"SELECT count(*) FROM {self.table}_p{later.strftime('%Y%m')}"), [(1,)])
+
+
+class ApiV1QueryBudgetTests(QueryBudgetTestCase):
+    # Path: (queries, per provider, seconds)
+    budgets = {
+        '/v1/providers/scores': (0, 0, 2),
+        '/v1/blacklisted-operators': (0, 0, 2),
+        '/v1/blacklisted-providers': (0, 0, 2),
+        '/v1/provider-whitelist': (2, 0, 2),
+    }
+
+    def test_endpoints_stay_within_budget(self):
+        for path, (queries, per_provider, seconds) in self.budgets.items():
+            with self.subTest(path=path):
+                with self.assertWithinBudget(path, self.budget(queries, per_provider), seconds):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+
+    def test_blacklists_fall_back_to_the_database(self):
+        published = {path: self.client.get(path).json()
+                     for path in ['/v1/blacklisted-operators', '/v1/blacklisted-providers']}
+        self.redis.delete(BLACKLIST_PUBLISHED_KEY)
+        for path, expected in published.items():
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).json(), expected)
+
+
+class ScalingBenchmarkTests(QueryBudgetTestCase):
+    def test_every_job_is_measured(self):
+        results = run_benchmarks(sizes=[20], repeat=1, log=lambda message: None)
+        self.assertEqual([result['job'] for result in results], list(JOBS))
+        for result in results:
+            self.assertEqual(result['providers'], 20)
+            self.assertGreaterEqual(result['queries'], 0)
+            self.assertGreater(result['peak_memory_mb'], 0)
+
+
+class CompareResultsTests(SimpleTestCase):
+    def result(self, job, seconds, queries, peak_memory_mb=10.0):
+        return {'job': job, 'providers': 1000, 'seconds': seconds, 'queries': queries, 'peak_memory_mb': peak_memory_mb}
+
+    def test_flags_regressions(self):
+        base = [self.result('scores', 2.0, 100), self.result('uptime', 0.01, 5), self.result('removed', 1.0, 1)]
+        head = [self.result('scores', 3.0, 100), self.result('uptime', 0.03, 6), self.result('added', 1.0, 1)]
+        rows = {job: metrics for job, providers, metrics in compare_results(base, head)}
+
+        self.assertEqual(set(rows), {'scores', 'uptime'})
+        self.assertTrue(rows['scores']['seconds'][3])
+        self.assertFalse(rows['scores']['queries'][3])
+        # Below the noise floor a slower run is not a regression, an extra query is
+        self.assertFalse(rows['uptime']['seconds'][3])
+        self.assertTrue(rows['uptime']['queries'][3])
+
+
+# Enqueue times seen by singleton_probe's runs
+probe_runs = []
+
+
+@app.task(ignore_result=True)
+@singleton_task()
+def singleton_probe(value=None):
+    probe_runs.append(getattr(current_task.request, ENQUEUED_AT_HEADER, None))
+    return value
+
+
+class SingletonTaskTests(SimpleTestCase):
+    def setUp(self):
+        probe_runs.clear()
+        patcher = mock.patch.object(scheduling, 'r', fakeredis.FakeRedis())
+        self.redis = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.key = scheduling.task_key(singleton_probe.name, (), {'value': 1})
+
+    def deliver(self, count=1):
+        """
+        Publishes `count` copies of singleton_probe to an in-memory broker and
+        returns the worker requests they arrive as.
+        """
+        with app.connection_for_write('memory://') as connection:
+            for _ in range(count):
+                singleton_probe.apply_async(kwargs={'value': 1}, connection=connection, queue='singleton_probe')
+            queue = connection.SimpleQueue('singleton_probe')
+            requests = [Request(queue.get(timeout=1), app=app, task=singleton_probe) for _ in range(count)]
+            queue.close()
+        return requests
+
+    def test_run_is_skipped_while_the_lock_is_held(self):
+        lock = self.redis.lock(LOCK_KEY.format(self.key))
+        lock.acquire()
+        self.assertIsNone(singleton_probe.apply(kwargs={'value': 1}).get())
+        self.assertEqual(probe_runs, [])
+        lock.release()
+        self.assertEqual(singleton_probe.apply(kwargs={'value': 1}).get(), 1)
+        self.assertEqual(len(probe_runs), 1)
+
+    def test_enqueue_time_reaches_the_task_request(self):
+        request, = self.deliver()
+        enqueued_at = request.message.headers[ENQUEUED_AT_HEADER]
+        self.assertEqual(request.execute(), 1)
+        self.assertEqual(probe_runs, [enqueued_at])
+
+    def test_copies_queued_before_the_last_run_are_dropped(self):
+        # A backlog of copies, the first of which runs
+        first, stale = self.deliver(2)
+        self.assertEqual(first.execute(), 1)
+        late, = self.deliver()
+        self.assertLess(stale.message.headers[ENQUEUED_AT_HEADER], float(self.redis.get(LAST_STARTED_KEY.format(self.key))))
+        self.assertIsNone(stale.execute())
+        self.assertEqual(late.execute(), 1)
+        self.assertEqual(len(probe_runs), 2)
+
+
+class AdaptiveScheduleTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(scheduling, 'r', fakeredis.FakeRedis())
+        self.redis = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.schedule = adaptive_schedule(60.0, singleton_probe.s(value=1))
+
+    def record_runtimes(self, *runtimes):
+        key = RUNTIMES_KEY.format(scheduling.task_key(singleton_probe.name, (), {'value': 1}))
+        for runtime in reversed(runtimes):
+            self.redis.lpush(key, runtime)
+
+    def test_base_interval_without_runs(self):
+        self.assertEqual(self.schedule.effective_run_every(), timedelta(seconds=60))
+
+    def test_base_interval_while_runs_fit_the_headroom(self):
+        self.record_runtimes(10, 48)
+        self.assertEqual(self.schedule.effective_run_every(), timedelta(seconds=60))
+
+    def test_interval_stretches_to_the_slowest_recent_run(self):
+        # 96s / 0.8 headroom; the sixth run is outside the 5 run window
+        self.record_runtimes(20, 96, 30, 10, 10, 400)
+        self.assertEqual(self.schedule.effective_run_every(), timedelta(seconds=120))
+
+    def test_stretching_stops_at_max_stretch(self):
+        self.record_runtimes(5000)
+        self.assertEqual(self.schedule.effective_run_every(), timedelta(seconds=600))
+
+
+class OfferBatcherTests(SimpleTestCase):
+    def offer(self, runtime):
+        return {'golem.runtime.name': runtime}
+
+    def scan(self, offers, batch_size=2):
+        batcher = OfferBatcher(batch_size)
+
+        async def run():
+            for issuer, runtime in offers:
+                await batcher.add(issuer, self.offer(runtime))
+                await batcher.flush(final=False)
+            await batcher.flush()
+
+        with mock.patch('api.scanner.update_providers_info') as update_providers_info:
+            asyncio.run(run())
+        return [[(props['node_id'], props['golem.runtime.name']) for props in call.args[0]]
+                for call in update_providers_info.delay.call_args_list]
+
+    def test_replaceable_offers_wait_for_the_end_of_the_scan(self):
+        batches = self.scan([('a', 'wasmtime'), ('b', 'vm'), ('a', 'vm'), ('c', 'wasmtime')])
+        self.assertEqual(batches, [[('b', 'vm')], [('a', 'vm')], [('c', 'wasmtime')]])
+
+    def test_each_provider_is_sent_once(self):
+        batches = self.scan([('a', 'vm'), ('a', 'wasmtime'), ('a', 'vm'), ('b', 'wasmtime'), ('c', 'wasmtime'),
+                             ('d', 'wasmtime')])
+        self.assertEqual(batches, [[('a', 'vm')], [('b', 'wasmtime'), ('c', 'wasmtime')], [('d', 'wasmtime')]])
+
+
+class AsyncRedisTests(SimpleTestCase):
+    def setUp(self):
+        self.clients = []
+
+        def get_async_redis():
+            self.clients.append(mock.AsyncMock())
+            return self.clients[-1]
+
+        patcher = mock.patch('core.redis_clients.get_async_redis', get_async_redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def use_client(self):
+        async with redis_clients.async_redis() as client:
+            await client.get('key')
+            return client
+
+    def test_clients_outside_the_server_loop_are_closed(self):
+        first, second = asyncio.run(self.use_client()), asyncio.run(self.use_client())
+        self.assertIsNot(first, second)
+        for client in self.clients:
+            client.close.assert_awaited_once_with(close_connection_pool=True)
+
+    def serve(self, *handle, lifespan=True):
+        """
+        Serves `handle` as requests of the ASGI application in one event loop,
+        with or without the lifespan events uvicorn sends and daphne doesn't.
+
+        :return: The clients the requests used and the lifespan messages sent.
+        """
+        from core import asgi
+        used = []
+        sent = []
+
+        async def request(scope, receive, send):
+            used.append(await self.use_client())
+            # A loop other than the server's doesn't get the shared client
+            await asyncio.to_thread(asyncio.run, self.use_client())
+
+        async def send(message):
+            sent.append(message['type'])
+
+        async def serve():
+            messages = asyncio.Queue()
+            if lifespan:
+                server = asyncio.create_task(asgi.application({'type': 'lifespan'}, messages.get, send))
+                await messages.put({'type': 'lifespan.startup'})
+            for _ in handle:
+                await asgi.application({'type': 'http'}, None, None)
+            if lifespan:
+                self.assertFalse(used[0].close.await_count)
+                await messages.put({'type': 'lifespan.shutdown'})
+                await server
+
+        with mock.patch.object(asgi, 'django_application', request):
+            asyncio.run(serve())
+        return used, sent
+
+    def test_requests_share_one_client_until_shutdown(self):
+        used, sent = self.serve('first', 'second')
+        self.assertIs(used[0], used[1])
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        # The shared client and one per request in other loops
+        self.assertEqual(len(self.clients), 3)
+        for client in self.clients:
+            client.close.assert_awaited_once_with(close_connection_pool=True)
+
+    def test_requests_share_one_client_without_lifespan_events(self):
+        self.addCleanup(lambda: asyncio.run(redis_clients.close_server_async_redis()))
+        used, sent = self.serve('first', 'second', lifespan=False)
+        self.assertIs(used[0], used[1])
+        self.assertEqual(sent, [])
+        self.assertEqual(len(self.clients), 3)
+        self.assertFalse(used[0].close.await_count)
+
+
+class WebWorkerImportTests(SimpleTestCase):
+    """
+    Loads the ASGI application and the URLconf the way a web worker starts,
+    and the Celery app the way a Celery worker starts, each in a fresh
+    interpreter.
+    """
+
+    # Only needed by the Celery workers running the scanner, pinger and tasks
+    forbidden_modules = {'yapapi', 'api.utils', 'api.scanner', 'api.ping', 'api.tasks', 'stats.tasks'}
+    budget_seconds = 5
+
+    def run_fresh(self, script, *options):
+        """
+        :return: The completed `python` process running `script`.
+        """
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'core.settings'}
+        result = subprocess.run([sys.executable, *options, '-c', script], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent.parent, env=env)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        return result
+
+    def import_web_worker(self):
+        """
+        :return: Dictionary of imported module name -> cumulative import time in seconds.
+        """
+        script = "import core.asgi\nfrom django.urls import get_resolver\nget_resolver().url_patterns"
+        result = self.run_fresh(script, '-X', 'importtime')
+
+        modules = {}
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if line.startswith('import time:') and not line.endswith('imported package'):
+                _, cumulative, name = line.split('|')
+                modules[name.strip()] = int(cumulative) / 1e6
+        return modules
+
+    def test_web_worker_imports_stay_within_budget(self):
+        modules = self.import_web_worker()
+        loaded = self.forbidden_modules & set(modules)
+        self.assertFalse(loaded, f"Web workers import {sorted(loaded)}")
+        self.assertLessEqual(modules['core.asgi'], self.budget_seconds,
+                             f"Importing the web worker took {modules['core.asgi']:.2f}s")
+
+    def test_tasks_sent_by_name_are_registered(self):
+        # See api.api, which sends these without importing their modules. Finalized
+        # as `celery -A core worker` does, away from the tasks this module imports.
+        script = (
+            "import json\n"
+            "from celery.app.utils import find_app\n"
+            "app = find_app('core')\n"
+            "app.loader.import_default_modules()\n"
+            "app.finalize(auto=True)\n"
+            "print(json.dumps(sorted(app.tasks)))"
+        )
+        registered = json.loads(self.run_fresh(script).stdout.splitlines()[-1])
+        for name in ['api.tasks.process_bulk_submission', 'stats.tasks.cache_provider_success_ratio']:
+            self.assertIn(name, registered)
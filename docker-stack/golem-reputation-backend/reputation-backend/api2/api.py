@@ -14,9 +14,13 @@ from django.db.models import Q
 from django.db.models.functions import Cast
 from django.db.models import Count, Case, When, FloatField
 from django.db.models import Subquery, OuterRef
-from api.scoring import calculate_uptime, penalty_weight
+from api.scoring import calculate_uptime, calculate_uptimes, penalty_weight, PROVIDER_SCORES_HASH_KEY
+from api.online import get_online_node_ids
+from django.db import connection
+from api.blacklist import check_blacklist as check_blacklist_batch
+from core.metrics import record_ingest
 from api.models import Provider, CpuBenchmark, NodeStatusHistory, TaskCompletion, BlacklistedProvider, BlacklistedOperator, MemoryBenchmark, DiskBenchmark, NetworkBenchmark, PingResult, GPUTask
-import redis
+from core.redis_clients import redis_client, async_redis
 from ninja import NinjaAPI, Path
 from django.http import JsonResponse
 from ninja import Query
@@ -31,7 +35,7 @@ api = NinjaAPI(
 )
 
 
-r = redis.Redis(host='redis', port=6379, db=0)
+r = redis_client
 
 
 @api.get(
@@ -72,11 +76,13 @@ r = redis.Redis(host='redis', port=6379, db=0)
     Additionally, the response includes information about rejected providers and operators, detailing the reasons for their rejection.
     """,
 )
-def list_provider_scores(request, network: str = Query('polygon', description="The network parameter specifies the blockchain network for which provider scores are retrieved. Options include: 'polygon' or 'mainnet' for the main Ethereum network, 'goerli', 'mumbai', or 'holesky' for test networks. Any other value will result in a 404 error, indicating that the network is not supported.")):
+async def list_provider_scores(request, network: str = Query('polygon', description="The network parameter specifies the blockchain network for which provider scores are retrieved. Options include: 'polygon' or 'mainnet' for the main Ethereum network, 'goerli', 'mumbai', or 'holesky' for test networks. Any other value will result in a 404 error, indicating that the network is not supported.")):
     if network == 'polygon' or network == 'mainnet':
-        response = r.get('provider_scores_v2_mainnet')
+        async with async_redis() as client:
+            response = await client.get('provider_scores_v2_mainnet')
     elif network == 'goerli' or network == 'mumbai' or network == 'holesky':
-        response = r.get('provider_scores_v2_testnet')
+        async with async_redis() as client:
+            response = await client.get('provider_scores_v2_testnet')
     else:
         return JsonResponse({"error": "Network not found"}, status=404)
 
@@ -87,6 +93,46 @@ def list_provider_scores(request, network: str = Query('polygon', description="T
         return JsonResponse({"error": "Data not available"}, status=503)
 
 
+class ProviderScoresBatchSchema(Schema):
+    node_ids: list[str]
+
+
+@api.post(
+    "/providers/scores/batch",
+    tags=["Reputation"],
+    summary="Retrieve scores for multiple providers",
+    description="""
+    Batch variant of `/providers/scores` for a known set of providers, such as the providers behind a requestor's current offers.
+
+    Returns the score document of each requested node_id, in the same format as the entries of `testedProviders` and `untestedProviders` in `/providers/scores`, or `null` for providers that are not online on the given network or have not been scored yet. The documents are refreshed together with `/providers/scores`.
+    """,
+)
+def list_provider_scores_batch(request, payload: ProviderScoresBatchSchema, network: str = Query('polygon', description="The network parameter specifies the blockchain network for which provider scores are retrieved. Options include: 'polygon' or 'mainnet' for the main Ethereum network, 'goerli', 'mumbai', or 'holesky' for test networks. Any other value will result in a 404 error, indicating that the network is not supported.")):
+    if network == 'polygon' or network == 'mainnet':
+        scores_network = 'mainnet'
+    elif network == 'goerli' or network == 'mumbai' or network == 'holesky':
+        scores_network = 'testnet'
+    else:
+        return JsonResponse({"error": "Network not found"}, status=404)
+
+    # One round trip: the snapshot check and the lookup share a pipeline
+    pipe = r.pipeline()
+    pipe.exists(f'provider_scores_v2_{scores_network}')
+    if payload.node_ids:
+        pipe.hmget(PROVIDER_SCORES_HASH_KEY.format(scores_network), payload.node_ids)
+    results = pipe.execute()
+    if not results[0]:
+        return JsonResponse({"error": "Data not available"}, status=503)
+
+    values = results[1] if payload.node_ids else []
+    return {
+        "providers": {
+            node_id: json.loads(value) if value is not None else None
+            for node_id, value in zip(payload.node_ids, values)
+        }
+    }
+
+
 @api.get(
     "/filter",
     tags=["Reputation"],
@@ -170,29 +216,23 @@ def filter_providers(
     blacklisted_op_wallets = set(
         BlacklistedOperator.objects.values_list('wallet', flat=True))
 
-    eligible_providers = Provider.objects.exclude(
+    eligible_providers = Provider.objects.filter(
+        node_id__in=get_online_node_ids()
+    ).exclude(
         Q(node_id__in=blacklisted_providers) |
-        Q(payment_addresses__golem_com_payment_platform_erc20_mainnet_glm_address__in=blacklisted_op_wallets)
-    ).annotate(
-        latest_status=Subquery(
-            NodeStatusHistory.objects.filter(
-                node_id=OuterRef('node_id')
-            ).order_by('-timestamp').values('is_online')[:1]
-        )
-    ).filter(latest_status=True)
+        Q(wallet_address__in=blacklisted_op_wallets)
+    )
 
     if minProviderAge is not None:
         minimum_age_date = timezone.now() - timedelta(days=minProviderAge)
         eligible_providers = eligible_providers.filter(
             created_at__lte=minimum_age_date)
 
-    if minUptime is not None:
-        eligible_providers = eligible_providers.filter(node_id__in=[
-            p.node_id for p in eligible_providers if calculate_uptime(p.node_id) >= minUptime])
-
-    if maxUptime is not None:
+    if minUptime is not None or maxUptime is not None:
+        uptimes = calculate_uptimes(eligible_providers.values_list('node_id', flat=True))
         eligible_providers = eligible_providers.filter(node_id__in=[
-            p.node_id for p in eligible_providers if calculate_uptime(p.node_id) <= maxUptime])
+            node_id for node_id, uptime in uptimes.items()
+            if (minUptime is None or uptime >= minUptime) and (maxUptime is None or uptime <= maxUptime)])
 
     if minCpuMultiThreadScore is not None:
         eligible_providers = eligible_providers.annotate(latest_cpu_multi_thread_score=Subquery(
@@ -526,6 +566,7 @@ def create_pings(request, region: str, pings: list[PingSchema]):
             continue
 
     PingResult.objects.bulk_create(pings_to_create)
+    record_ingest('ping', len(pings_to_create))
     return {"message": "Pings created"}
 
 
@@ -536,27 +577,73 @@ def create_pings(request, region: str, pings: list[PingSchema]):
     description="This endpoint checks if a provider is blacklisted based on the provided node_id.",
 )
 def check_blacklist(request, node_id: str = Query(..., description="The node_id of the provider to check.")):
-    # Check if the provider is blacklisted
-    is_blacklisted_provider = BlacklistedProvider.objects.filter(
-        provider__node_id=node_id).exists()
-
-    # Extract the wallet address from the JSON field for comparison
-    wallet_address = Provider.objects.filter(node_id=node_id).annotate(
-        wallet=KeyTextTransform(
-            'golem.com.payment.platform.erc20-mainnet-glm.address', 'payment_addresses')
-    ).values_list('wallet', flat=True).first()
-
-    # Check if the provider's wallet is blacklisted
-    is_blacklisted_operator = False
-    if wallet_address:
-        is_blacklisted_operator = BlacklistedOperator.objects.filter(
-            wallet=wallet_address).exists()
+    return JsonResponse(check_blacklist_batch([node_id])[0])
 
-    return JsonResponse({
-        "node_id": node_id,
-        "is_blacklisted_provider": is_blacklisted_provider,
-        "is_blacklisted_wallet": is_blacklisted_operator
-    })
+
+class CheckBlacklistBatchSchema(Schema):
+    node_ids: list[str]
+
+
+@api.post(
+    "/providers/check_blacklist/batch",
+    tags=["Reputation"],
+    summary="Check if multiple providers are blacklisted",
+    description="""
+    Batch variant of `/providers/check_blacklist`. Accepts a list of node_ids (thousands per request are fine) and returns one result per node_id, in the order given:
+
+    - `node_id`: The provider's unique identifier.
+    - `is_blacklisted_provider`: Whether the provider itself is blacklisted.
+    - `is_blacklisted_wallet`: Whether the provider's operator wallet is blacklisted.
+    """,
+)
+def check_blacklist_batch_endpoint(request, payload: CheckBlacklistBatchSchema):
+    return {"results": check_blacklist_batch(payload.node_ids)}
+
+
+class ProviderPercentilesBatchSchema(Schema):
+    node_ids: list[str]
+
+
+@api.get(
+    "/providers/{node_id}/percentiles",
+    tags=["Reputation"],
+    summary="Retrieve a provider's percentile ranks",
+    description="""
+    This endpoint returns where an online provider ranks among all online providers for every benchmark metric, success rate, uptime and ping.
+
+    Each percentile is between 0 and 1, where 1 is the best value in the population (for latency and ping, lower values rank higher). Metrics the provider has no data for are omitted. The ranks are precomputed every 5 minutes.
+    """,
+)
+def get_provider_percentiles(request, node_id: str):
+    if not r.exists('provider_percentiles'):
+        return JsonResponse({"error": "Data not available"}, status=503)
+
+    percentiles = r.hget('provider_percentiles', node_id)
+    if percentiles is None:
+        return JsonResponse({"error": "Provider not found or not online"}, status=404)
+
+    return {"node_id": node_id, "percentiles": json.loads(percentiles)}
+
+
+@api.post(
+    "/providers/percentiles/batch",
+    tags=["Reputation"],
+    summary="Retrieve percentile ranks for multiple providers",
+    description="""
+    Batch variant of `/providers/{node_id}/percentiles`. Returns the percentile ranks for each requested node_id, or `null` for providers that are not online or have no ranks yet.
+    """,
+)
+def get_provider_percentiles_batch(request, payload: ProviderPercentilesBatchSchema):
+    if not r.exists('provider_percentiles'):
+        return JsonResponse({"error": "Data not available"}, status=503)
+
+    values = r.hmget('provider_percentiles', payload.node_ids) if payload.node_ids else []
+    return {
+        "percentiles": {
+            node_id: json.loads(value) if value is not None else None
+            for node_id, value in zip(payload.node_ids, values)
+        }
+    }
 
 
 @api.get(
@@ -775,6 +862,20 @@ def filter_providers_by_preset(request, preset_name: str):
     return request.json()
 
 
+# Average UDP ping of the latest `recent_n` pings per provider, region and p2p mode
+LATEST_PINGS_SQL = """
+    SELECT provider_id, region, is_p2p, AVG(ping_udp)::float
+    FROM (
+        SELECT provider_id, region, is_p2p, ping_udp,
+               ROW_NUMBER() OVER (PARTITION BY provider_id, region, is_p2p ORDER BY created_at DESC) AS rn
+        FROM api_pingresult
+        WHERE region = ANY(%(regions)s)
+    ) pings
+    WHERE rn <= %(recent_n)s
+    GROUP BY 1, 2, 3
+"""
+
+
 @api.get(
     "/providers/all_scores",
     tags=["Reputation"],
@@ -782,74 +883,61 @@ def filter_providers_by_preset(request, preset_name: str):
     description="This endpoint retrieves the scores of all providers without any filters applied. It provides a comprehensive view of all available provider scores."
 )
 def list_all_provider_scores(request):
-    providers = Provider.objects.all()
-    all_scores = []
+    providers = list(Provider.objects.all())
+    node_ids = [provider.node_id for provider in providers]
+    uptimes = calculate_uptimes(node_ids)
+
+    def latest(model, column, **filters):
+        # Latest value per provider and benchmark name
+        rows = model.objects.filter(**filters).order_by('provider_id', 'benchmark_name', '-created_at').distinct(
+            'provider_id', 'benchmark_name').values_list('provider_id', 'benchmark_name', column)
+        return {(provider_id, benchmark_name): value for provider_id, benchmark_name, value in rows}
+
+    cpu_scores = latest(CpuBenchmark, 'events_per_second', benchmark_name__in=[
+        "CPU Multi-thread Benchmark", "CPU Single-thread Benchmark"])
+    memory_scores = latest(MemoryBenchmark, 'throughput_mi_b_sec', benchmark_name__in=[
+        "Sequential_Read_Performance__Single_Thread_", "Sequential_Write_Performance__Single_Thread_",
+        "Random_Read_Performance__Multi_threaded_", "Random_Write_Performance__Multi_threaded_"])
+    disk_read_scores = latest(DiskBenchmark, 'read_throughput_mb_ps', benchmark_name__in=["FileIO_rndrd", "FileIO_seqrd"])
+    disk_write_scores = latest(DiskBenchmark, 'write_throughput_mb_ps', benchmark_name__in=["FileIO_rndwr", "FileIO_seqwr"])
+    network_speeds = dict(NetworkBenchmark.objects.order_by('provider_id', '-created_at').distinct(
+        'provider_id').values_list('provider_id', 'mbit_per_second'))
+    task_counts = {
+        row['provider_id']: row for row in TaskCompletion.objects.values('provider_id').annotate(
+            total=Count('id'), successful=Count('id', filter=Q(is_successful=True)))
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(LATEST_PINGS_SQL, {'regions': ["europe", "asia", "us"], 'recent_n': 5})
+        pings = {(provider_id, region, is_p2p): avg_ping for provider_id, region, is_p2p, avg_ping in cursor.fetchall()}
 
+    all_scores = []
     for provider in providers:
+        node_id = provider.node_id
+        tasks = task_counts.get(node_id)
         scores = {
             "provider": {
-                "id": provider.node_id,
+                "id": node_id,
                 "name": provider.name,
-                "walletAddress": provider.payment_addresses.get('golem.com.payment.platform.erc20-mainnet-glm.address', None)
+                "walletAddress": provider.wallet_address
             },
             "scores": {
-                "uptime": calculate_uptime(provider.node_id),
-                "cpuMultiThreadScore": CpuBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="CPU Multi-thread Benchmark"
-                ).order_by('-created_at').values_list('events_per_second', flat=True).first(),
-                "cpuSingleThreadScore": CpuBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="CPU Single-thread Benchmark"
-                ).order_by('-created_at').values_list('events_per_second', flat=True).first(),
-                "successRate": (TaskCompletion.objects.filter(provider=provider, is_successful=True).count() / TaskCompletion.objects.filter(provider=provider).count() * 100) if TaskCompletion.objects.filter(provider=provider).count() > 0 else None,
-                "memorySeqRead": MemoryBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="Sequential_Read_Performance__Single_Thread_"
-                ).order_by('-created_at').values_list('throughput_mi_b_sec', flat=True).first(),
-                "memorySeqWrite": MemoryBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="Sequential_Write_Performance__Single_Thread_"
-                ).order_by('-created_at').values_list('throughput_mi_b_sec', flat=True).first(),
-                "memoryRandRead": MemoryBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="Random_Read_Performance__Multi_threaded_"
-                ).order_by('-created_at').values_list('throughput_mi_b_sec', flat=True).first(),
-                "memoryRandWrite": MemoryBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="Random_Write_Performance__Multi_threaded_"
-                ).order_by('-created_at').values_list('throughput_mi_b_sec', flat=True).first(),
-                "randomReadDiskThroughput": DiskBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="FileIO_rndrd"
-                ).order_by('-created_at').values_list('read_throughput_mb_ps', flat=True).first(),
-                "randomWriteDiskThroughput": DiskBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="FileIO_rndwr"
-                ).order_by('-created_at').values_list('write_throughput_mb_ps', flat=True).first(),
-                "sequentialReadDiskThroughput": DiskBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="FileIO_seqrd"
-                ).order_by('-created_at').values_list('read_throughput_mb_ps', flat=True).first(),
-                "sequentialWriteDiskThroughput": DiskBenchmark.objects.filter(
-                    provider=provider,
-                    benchmark_name="FileIO_seqwr"
-                ).order_by('-created_at').values_list('write_throughput_mb_ps', flat=True).first(),
-                "networkDownloadSpeed": NetworkBenchmark.objects.filter(
-                    provider=provider
-                ).order_by('-created_at').values_list('mbit_per_second', flat=True).first(),
+                "uptime": uptimes[node_id],
+                "cpuMultiThreadScore": cpu_scores.get((node_id, "CPU Multi-thread Benchmark")),
+                "cpuSingleThreadScore": cpu_scores.get((node_id, "CPU Single-thread Benchmark")),
+                "successRate": (tasks['successful'] / tasks['total'] * 100) if tasks else None,
+                "memorySeqRead": memory_scores.get((node_id, "Sequential_Read_Performance__Single_Thread_")),
+                "memorySeqWrite": memory_scores.get((node_id, "Sequential_Write_Performance__Single_Thread_")),
+                "memoryRandRead": memory_scores.get((node_id, "Random_Read_Performance__Multi_threaded_")),
+                "memoryRandWrite": memory_scores.get((node_id, "Random_Write_Performance__Multi_threaded_")),
+                "randomReadDiskThroughput": disk_read_scores.get((node_id, "FileIO_rndrd")),
+                "randomWriteDiskThroughput": disk_write_scores.get((node_id, "FileIO_rndwr")),
+                "sequentialReadDiskThroughput": disk_read_scores.get((node_id, "FileIO_seqrd")),
+                "sequentialWriteDiskThroughput": disk_write_scores.get((node_id, "FileIO_seqwr")),
+                "networkDownloadSpeed": network_speeds.get(node_id),
                 "ping": {
                     region: {
-                        "p2p": PingResult.objects.filter(
-                            provider=provider,
-                            region=region,
-                            is_p2p=True
-                        ).order_by('-created_at').values_list('ping_udp', flat=True)[:5].aggregate(avg_ping=Avg('ping_udp'))['avg_ping'],
-                        "non_p2p": PingResult.objects.filter(
-                            provider=provider,
-                            region=region,
-                            is_p2p=False
-                        ).order_by('-created_at').values_list('ping_udp', flat=True)[:5].aggregate(avg_ping=Avg('ping_udp'))['avg_ping']
+                        "p2p": pings.get((node_id, region, True)),
+                        "non_p2p": pings.get((node_id, region, False)),
                     } for region in ["europe", "asia", "us"]
                 }
             }
@@ -866,28 +954,25 @@ def list_all_provider_scores(request):
     description="This endpoint provides an overview of provider scores, including minimum, maximum, and average values for each metric based on the latest scores for each provider."
 )
 def get_score_overview(request):
-    # Filter providers whose latest NodeStatusHistory is_online=True
-    latest_status_subquery = NodeStatusHistory.objects.filter(
-        node_id=OuterRef('node_id')
-    ).order_by('-timestamp').values('is_online')[:1]
-
-    providers = Provider.objects.annotate(
-        latest_status=Subquery(latest_status_subquery)
-    ).filter(latest_status=True)
+    providers = list(Provider.objects.filter(node_id__in=get_online_node_ids()))
+    statuses_by_node = {}
+    for node_id, is_online, timestamp in NodeStatusHistory.objects.filter(
+            node_id__in=[provider.node_id for provider in providers]).order_by('timestamp').values_list(
+            'node_id', 'is_online', 'timestamp'):
+        statuses_by_node.setdefault(node_id, []).append((is_online, timestamp))
 
     # Calculate uptime for each provider
     def calculate_uptime(provider):
-        statuses = NodeStatusHistory.objects.filter(
-            node_id=provider.node_id).order_by('timestamp')
+        statuses = statuses_by_node.get(provider.node_id, [])
 
         online_duration = timedelta(0)
         last_online_time = None
 
-        for status in statuses:
-            if status.is_online:
-                last_online_time = status.timestamp
+        for is_online, timestamp in statuses:
+            if is_online:
+                last_online_time = timestamp
             elif last_online_time:
-                online_duration += status.timestamp - last_online_time
+                online_duration += timestamp - last_online_time
                 last_online_time = None
 
         if last_online_time is not None:
@@ -1131,7 +1216,6 @@ class GPUPerformanceResponse(BaseModel):
     identical_gpus_avg_gflops: float
     error: str = None  # Optional field for error messages
 
-from django.db.models import JSONField
 @api.get(
     "/provider/gpu/performance/comparison/{node_id}",
     tags=["Reputation"],
@@ -1152,7 +1236,9 @@ def evaluate_gpu_performance(request, node_id: str):
         return JsonResponse({"error": "No GPU tasks found for this provider"}, status=200)
 
     latest_gpu_task = provider_gpu_tasks.first()
-    gpu_info = json.loads(latest_gpu_task.gpu_info)
+    gpu_info = latest_gpu_task.gpu_info
+    if isinstance(gpu_info, str):
+        gpu_info = json.loads(gpu_info)
 
     if not gpu_info.get('gpus'):
         return JsonResponse({"error": "No GPU information available"}, status=200)
@@ -1162,9 +1248,7 @@ def evaluate_gpu_performance(request, node_id: str):
         avg_gflops=Avg('gpu_burn_gflops'))['avg_gflops']
 
     # Find providers with identical GPU setups
-    identical_setups = GPUTask.objects.filter(
-        gpu_info=Cast(json.dumps(gpu_info), JSONField())
-    ).exclude(provider=provider)
+    identical_setups = GPUTask.objects.filter(gpu_info=gpu_info).exclude(provider=provider)
 
     if not identical_setups.exists():
         return JsonResponse({"error": "No comparison data available for identical GPU setups"}, status=200)
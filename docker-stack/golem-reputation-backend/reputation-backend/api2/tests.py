@@ -1,3 +1,51 @@
-from django.test import TestCase
+import json
+from urllib.parse import urlencode
+from api.query_budgets import QueryBudgetTestCase
+from api2.api import PRESETS
 
-# Create your tests here.
+
+class ApiV2QueryBudgetTests(QueryBudgetTestCase):
+    # Path: (queries, per provider, seconds)
+    budgets = {
+        '/v2/providers/scores': (0, 0, 2),
+        '/v2/filter': (5, 0, 2),
+        '/v2/providers/check_blacklist?node_id={node_id}': (3, 0, 2),
+        '/v2/providers/{node_id}/percentiles': (1, 0, 2),
+        '/v2/providers/{node_id}/scores': (15, 0, 2),
+        '/v2/providers/all_scores': (9, 0, 5),
+        # Min, max and average are aggregated separately for each metric
+        '/v2/providers/score_overview': (47, 0, 5),
+        '/v2/provider/gpu/performance/comparison/{gpu_node_id}': (8, 0, 2),
+    }
+    preset_budget = (5, 0, 5)
+    # Path: (body, queries, seconds)
+    batch_budgets = {
+        '/v2/providers/scores/batch': ({'node_ids': ['{node_id}']}, 1, 2),
+        '/v2/providers/check_blacklist/batch': ({'node_ids': ['{node_id}']}, 3, 2),
+        '/v2/providers/percentiles/batch': ({'node_ids': ['{node_id}']}, 1, 2),
+    }
+
+    def test_endpoints_stay_within_budget(self):
+        for path, (queries, per_provider, seconds) in self.budgets.items():
+            path = path.format(node_id=self.node_id, gpu_node_id=self.gpu_node_id)
+            with self.subTest(path=path):
+                with self.assertWithinBudget(path, self.budget(queries, per_provider), seconds):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+
+    def test_filter_presets_stay_within_budget(self):
+        queries, per_provider, seconds = self.preset_budget
+        for preset_name, params in PRESETS.items():
+            path = f"/v2/filter?{urlencode(params)}"
+            with self.subTest(preset=preset_name):
+                with self.assertWithinBudget(preset_name, self.budget(queries, per_provider), seconds):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+
+    def test_batch_endpoints_stay_within_budget(self):
+        for path, (body, queries, seconds) in self.batch_budgets.items():
+            body = json.loads(json.dumps(body).replace('{node_id}', self.node_id))
+            with self.subTest(path=path):
+                with self.assertWithinBudget(path, queries, seconds):
+                    response = self.client.post(path, json.dumps(body), content_type='application/json')
+                self.assertEqual(response.status_code, 200)
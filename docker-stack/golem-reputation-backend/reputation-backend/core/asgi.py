@@ -3,4 +3,23 @@ import django
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from .redis_clients import open_server_async_redis, close_server_async_redis
+
+
+async def application(scope, receive, send):
+    # Requests share one asyncio Redis client per worker's event loop, opened on
+    # the first request as daphne sends no lifespan events. Django doesn't handle
+    # lifespan events, so the shutdown one, where sent, is answered here.
+    if scope['type'] != 'lifespan':
+        await open_server_async_redis()
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_server_async_redis()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
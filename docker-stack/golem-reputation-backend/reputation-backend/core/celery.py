@@ -5,19 +5,35 @@ import logging
 from celery.schedules import crontab
 from random import randint
 
+# Set before the imports below, which read the settings
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
-logger = logging.getLogger("Celery")
+from django.conf import settings
+from .scheduling import adaptive_schedule
+from . import metrics  # connects the task and worker signal handlers
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+logger = logging.getLogger("Celery")
 
 app = Celery("core")
 
 
 @app.on_after_finalize.connect
 def setup_periodic_tasks(sender, **kwargs):
-    from api.tasks import monitor_nodes_task, ping_providers_task, process_offers_from_redis, update_provider_scores, get_blacklisted_operators, get_blacklisted_providers, delete_old_ping_results
+    # Interval tasks run as singletons (see core.scheduling), and their interval
+    # is stretched while their recent runs take most of it
+    from api.tasks import stream_nodes_task, ping_providers_task, process_offers_from_redis, update_provider_scores, get_blacklisted_operators, get_blacklisted_providers, delete_old_ping_results, create_time_partitions, reconcile_online_nodes, cache_provider_percentiles, cache_provider_whitelists, refresh_benchmark_extrema
     from stats.tasks import populate_daily_provider_stats, cache_provider_success_ratio, cache_provider_uptime, cache_cpu_performance_ranking, cache_gpu_performance_ranking
 
+    def add_adaptive_task(interval, signature, queue="default"):
+        # The schedule and the entry share the signature the schedule times
+        sender.add_periodic_task(
+            adaptive_schedule(interval, signature),
+            signature,
+            queue=queue,
+            options={"queue": queue, "routing_key": queue},
+        )
+
     sender.add_periodic_task(
         crontab(minute=0, hour=0),  # daily at midnight
         cache_provider_success_ratio.s(),
@@ -37,70 +53,35 @@ def setup_periodic_tasks(sender, **kwargs):
         options={"queue": "default", "routing_key": "default"},
     )
     sender.add_periodic_task(
-        300.0,
-        monitor_nodes_task.s(),
-        queue="uptime",
-        options={"queue": "uptime", "routing_key": "uptime"},
-    )
-    sender.add_periodic_task(
-        300.0,
-        update_provider_scores.s(network="mainnet"),
-        queue="default",
-        options={"queue": "default", "routing_key": "default"},
-    )
-    sender.add_periodic_task(
-        3600,  # 1 hour
-        populate_daily_provider_stats.s(),
-        queue="default",
-        options={"queue": "default", "routing_key": "default"},
-    )
-    sender.add_periodic_task(
-        120.0,
-        get_blacklisted_providers.s(),
-        queue="default",
-        options={"queue": "default", "routing_key": "default"},
-    )
-    sender.add_periodic_task(
-        120.0,
-        get_blacklisted_operators.s(),
-        queue="default",
-        options={"queue": "default", "routing_key": "default"},
-    )
-    sender.add_periodic_task(
-        60.0,
-        update_provider_scores.s(network="testnet"),
+        crontab(minute=30, hour=0),  # daily, creates next months' partitions ahead of time
+        create_time_partitions.s(),
         queue="default",
         options={"queue": "default", "routing_key": "default"},
     )
+    add_adaptive_task(300.0, stream_nodes_task.s(subnet_tags=["public"]), queue="uptime")
+    add_adaptive_task(300.0, update_provider_scores.s(network="mainnet"))
+    add_adaptive_task(300.0, reconcile_online_nodes.s())
+    add_adaptive_task(300.0, cache_provider_percentiles.s())
+    add_adaptive_task(300.0, cache_provider_whitelists.s())
+    add_adaptive_task(900.0, refresh_benchmark_extrema.s())
+    add_adaptive_task(3600, populate_daily_provider_stats.s())  # 1 hour
+    add_adaptive_task(120.0, get_blacklisted_providers.s())
+    add_adaptive_task(120.0, get_blacklisted_operators.s())
+    add_adaptive_task(60.0, update_provider_scores.s(network="testnet"))
 #    sender.add_periodic_task( Not needed anymore, separate docker task now.
 #        30.0,
 #        ping_providers_task.s(p2p=False),
 #        queue="pinger",
 #        options={"queue": "pinger", "routing_key": "pinger"},
 #    )
-    sender.add_periodic_task(
-        30.0,
-        process_offers_from_redis.s(),
-        queue="default",
-        options={"queue": "default", "routing_key": "default"},
-    )
-    sender.add_periodic_task(
-        600.0,  # 10 minutes
-        cache_cpu_performance_ranking.s(),
-        queue="default",
-        options={"queue": "default", "routing_key": "default"},
-    )
-    sender.add_periodic_task(
-        600.0,  # 10 minutes
-        cache_gpu_performance_ranking.s(),
-        queue="default",
-        options={"queue": "default", "routing_key": "default"},
-    )
+    add_adaptive_task(30.0, process_offers_from_redis.s())
+    add_adaptive_task(600.0, cache_cpu_performance_ranking.s())  # 10 minutes
+    add_adaptive_task(600.0, cache_gpu_performance_ranking.s())  # 10 minutes
 
 
 app.conf.task_default_queue = "default"
-app.conf.broker_url = "redis://redis:6379/0"
-app.conf.result_backend = "redis://redis:6379/0"
+app.conf.broker_url = settings.REDIS_URL
+app.conf.result_backend = settings.REDIS_URL
 app.conf.task_routes = {
     "app.tasks.default": {"queue": "default"},
     "app.tasks.uptime": {"queue": "uptime"},
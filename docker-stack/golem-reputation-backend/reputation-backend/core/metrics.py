@@ -0,0 +1,218 @@
+import contextvars
+import os
+import shutil
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from core.redis_clients import redis_client
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from celery.signals import task_prerun, task_postrun, worker_init, worker_process_shutdown
+
+# Celery workers fork, so their metrics are shared through files in this
+# directory (set in the worker images) and merged when scraped.
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess, start_http_server)
+from prometheus_client.core import GaugeMetricFamily
+from .scheduling import TASK_LAST_SUCCESS_KEY
+
+TASK_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+TASK_DURATION = Histogram(
+    'reputation_task_duration_seconds', 'Celery task run time', ['task'], buckets=TASK_BUCKETS)
+TASK_RUNS = Counter(
+    'reputation_task_runs_total', 'Finished Celery task runs by final state', ['task', 'state'])
+HTTP_REQUEST_DURATION = Histogram(
+    'reputation_http_request_duration_seconds', 'API request latency', ['endpoint', 'method', 'status'])
+DB_QUERIES = Counter(
+    'reputation_db_queries_total', 'Database queries per Celery task or API endpoint', ['source', 'name'])
+DB_QUERY_SECONDS = Counter(
+    'reputation_db_query_seconds_total', 'Time spent in database queries per Celery task or API endpoint', ['source', 'name'])
+INGESTED_ROWS = Counter(
+    'reputation_ingested_rows_total', 'Rows written by the ingest paths', ['kind'])
+
+r = redis_client
+
+
+def record_ingest(kind, rows):
+    if rows:
+        INGESTED_ROWS.labels(kind).inc(rows)
+
+
+class QueryStats:
+    """
+    Database execute wrapper counting the queries run through it and their time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+    def record(self, source, name):
+        DB_QUERIES.labels(source, name).inc(self.count)
+        DB_QUERY_SECONDS.labels(source, name).inc(self.seconds)
+
+
+# Stats of the API request being served. Read by a wrapper installed on every
+# database connection rather than wrapping the request thread's connection,
+# as ASGI runs sync views in other threads, which the context is copied to.
+_request_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+def _count_request_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_request_query_counter(sender, connection, **kwargs):
+    # Put first, connection.execute_wrapper() pops the last wrapper on exit
+    if _count_request_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _count_request_query)
+
+
+class SnapshotAgeCollector:
+    """
+    Age of the Redis snapshots, as the time since the periodic task writing
+    each of them last completed.
+    """
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            'reputation_snapshot_age_seconds', 'Seconds since the task writing a Redis snapshot last succeeded', labels=['task'])
+        now = time.time()
+        for task, finished_at in r.hgetall(TASK_LAST_SUCCESS_KEY).items():
+            gauge.add_metric([task.decode('utf-8')], now - float(finished_at))
+        yield gauge
+
+    def describe(self):
+        # Keeps registration from collecting, which would query Redis
+        return []
+
+
+_registry = None
+
+
+def get_registry():
+    """
+    Returns the registry to expose: the merged per-process files in the
+    workers, the default registry otherwise. Both include the snapshot ages.
+    """
+    global _registry
+    if _registry is None:
+        if MULTIPROC_DIR:
+            _registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(_registry)
+        else:
+            _registry = REGISTRY
+        _registry.register(SnapshotAgeCollector())
+    return _registry
+
+
+def metrics_view(request):
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency and database queries of every API request, labelled
+    with the matched route. Async under ASGI, so async views are not handed to
+    a thread to run it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    def record(self, request, response, stats, elapsed):
+        endpoint = request.resolver_match.route if request.resolver_match else 'unmatched'
+        HTTP_REQUEST_DURATION.labels(endpoint, request.method, response.status_code).observe(elapsed)
+        stats.record('http', endpoint)
+        return response
+
+
+# Task id -> (start time, query stats) of the runs in progress in this process
+_running_tasks = {}
+
+
+@task_prerun.connect
+def task_started(task_id=None, task=None, **kwargs):
+    stats = QueryStats()
+    connection.execute_wrappers.append(stats)
+    _running_tasks[task_id] = (time.perf_counter(), stats)
+
+
+@task_postrun.connect
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    if task_id not in _running_tasks:
+        return
+    started, stats = _running_tasks.pop(task_id)
+    if stats in connection.execute_wrappers:
+        connection.execute_wrappers.remove(stats)
+
+    TASK_DURATION.labels(task.name).observe(time.perf_counter() - started)
+    TASK_RUNS.labels(task.name, state or 'UNKNOWN').inc()
+    stats.record('task', task.name)
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    if MULTIPROC_DIR:
+        # Files left over from a previous worker would be merged into the totals
+        for name in os.listdir(MULTIPROC_DIR):
+            path = os.path.join(MULTIPROC_DIR, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+    start_http_server(settings.METRICS_PORT, registry=get_registry())
+    print(f"Serving worker metrics on :{settings.METRICS_PORT}/metrics")
+
+
+@worker_process_shutdown.connect
+def mark_process_dead(pid=None, **kwargs):
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
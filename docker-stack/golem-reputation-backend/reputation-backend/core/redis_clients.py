@@ -0,0 +1,65 @@
+import asyncio
+import contextlib
+import redis
+import redis.asyncio
+from django.conf import settings
+
+# One connection pool per process, shared by every module's client and
+# configured by the REDIS_* settings. redis-py replaces the pool's connections
+# in a forked Celery worker, so sharing it across the fork is safe.
+pool = redis.ConnectionPool.from_url(settings.REDIS_URL, max_connections=settings.REDIS_MAX_CONNECTIONS)
+
+redis_client = redis.Redis(connection_pool=pool)
+
+# The asyncio client shared by the ASGI server's event loop, opened by
+# core.asgi on the first request and closed on the lifespan shutdown event
+_server_loop = None
+_server_client = None
+
+
+def get_async_redis():
+    """
+    Returns an asyncio client with its own pool. asyncio connections belong to
+    the event loop they were opened in, so close it before that loop ends with
+    `await client.close(close_connection_pool=True)`, or use `async_redis()`.
+    """
+    return redis.asyncio.Redis.from_url(settings.REDIS_URL, max_connections=settings.REDIS_MAX_CONNECTIONS)
+
+
+async def open_server_async_redis():
+    """
+    Opens the client shared by every request served in the running event loop,
+    unless it is open already. Called by the ASGI application for each request.
+    """
+    global _server_loop, _server_client
+    if _server_client is None:
+        _server_loop, _server_client = asyncio.get_running_loop(), get_async_redis()
+
+
+async def close_server_async_redis():
+    """
+    Closes the shared client and its connections. Called on the ASGI server's
+    shutdown, for servers that send lifespan events.
+    """
+    global _server_loop, _server_client
+    client, _server_loop, _server_client = _server_client, None, None
+    if client is not None:
+        await client.close(close_connection_pool=True)
+
+
+@contextlib.asynccontextmanager
+async def async_redis():
+    """
+    Yields an asyncio client: the shared one in the ASGI server's event loop,
+    otherwise a client of its own that's closed on exit. Loops started by
+    asyncio.run() or async_to_sync() (management commands, WSGI, the test
+    client) end after the call, and their connections have to go with them.
+    """
+    if _server_client is not None and _server_loop is asyncio.get_running_loop():
+        yield _server_client
+        return
+    client = get_async_redis()
+    try:
+        yield client
+    finally:
+        await client.close(close_connection_pool=True)
@@ -0,0 +1,157 @@
+import functools
+import inspect
+import json
+import time
+from core.redis_clients import redis_client
+from datetime import timedelta
+from celery import current_task
+from celery.schedules import schedule, remaining
+from celery.signals import before_task_publish
+from redis.exceptions import LockError, RedisError
+
+# Singleton execution for periodic tasks. A run holds a Redis lock for its task
+# name and arguments: copies that start while it runs are skipped, and copies
+# that were queued before the last run started are dropped as already covered
+# by it, so a backlog of duplicates coalesces into a single run.
+# Every run's duration is kept, so adaptive_schedule can stretch the interval of
+# a task whose runtime approaches its period.
+LOCK_KEY = 'task_lock:{}'
+LAST_STARTED_KEY = 'task_last_started:{}'
+RUNTIMES_KEY = 'task_runtimes:{}'  # LIST of run durations in seconds, newest first
+RUNTIME_HISTORY = 20
+TASK_LAST_SUCCESS_KEY = 'task_last_success'  # HASH task key -> time its last successful run finished
+ENQUEUED_AT_HEADER = 'singleton_enqueued_at'
+
+r = redis_client
+
+# Task name -> undecorated function, used to normalise call arguments
+_singleton_tasks = {}
+
+
+def task_key(name, args=(), kwargs=None):
+    """
+    Identifies a task together with its arguments, regardless of whether they
+    were passed positionally or by keyword.
+    """
+    kwargs = kwargs or {}
+    func = _singleton_tasks.get(name)
+    if func is not None:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+    else:
+        arguments = {'args': list(args), 'kwargs': kwargs}
+    if not arguments:
+        return name
+    return f"{name}:{json.dumps(arguments, sort_keys=True, default=list)}"
+
+
+def get_task_runtimes(name, args=(), kwargs=None):
+    """
+    Returns the durations of the latest runs of a task, newest first.
+    """
+    return [float(value) for value in r.lrange(RUNTIMES_KEY.format(task_key(name, args, kwargs)), 0, -1)]
+
+
+def run_unlocked(task, *args, **kwargs):
+    """
+    Runs a singleton task's body in-process, without its lock and run bookkeeping.
+    """
+    return task.run.__wrapped__(*args, **kwargs)
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(sender=None, headers=None, **kwargs):
+    if sender in _singleton_tasks and headers is not None:
+        headers.setdefault(ENQUEUED_AT_HEADER, time.time())
+
+
+def singleton_task(lock_timeout=1800):
+    """
+    Runs the decorated task at most once at a time per set of arguments.
+    Goes between @app.task and the function.
+
+    :param lock_timeout: Seconds after which the lock of a run that died without releasing it expires.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__name__}"
+        _singleton_tasks[name] = func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = task_key(name, args, kwargs)
+            enqueued_at = None
+            if current_task and current_task.name == name:
+                enqueued_at = getattr(current_task.request, ENQUEUED_AT_HEADER, None)
+
+            lock = r.lock(LOCK_KEY.format(key), timeout=lock_timeout)
+            if not lock.acquire(blocking=False):
+                print(f"Skipping {key}: a run is already in progress")
+                return None
+
+            try:
+                last_started = r.get(LAST_STARTED_KEY.format(key))
+                if enqueued_at is not None and last_started is not None and enqueued_at < float(last_started):
+                    print(f"Skipping {key}: queued before the last run started")
+                    return None
+
+                started = time.time()
+                r.set(LAST_STARTED_KEY.format(key), started)
+                try:
+                    result = func(*args, **kwargs)
+                    r.hset(TASK_LAST_SUCCESS_KEY, key, time.time())
+                    return result
+                finally:
+                    pipe = r.pipeline()
+                    pipe.lpush(RUNTIMES_KEY.format(key), time.time() - started)
+                    pipe.ltrim(RUNTIMES_KEY.format(key), 0, RUNTIME_HISTORY - 1)
+                    pipe.execute()
+            finally:
+                try:
+                    lock.release()
+                except LockError:
+                    print(f"Lock of {key} expired before the run finished, consider raising lock_timeout")
+
+        return wrapper
+    return decorator
+
+
+class adaptive_schedule(schedule):
+    """
+    Interval schedule for a singleton task that stretches its period while the
+    task's latest runs take longer than `headroom` of it, up to `max_stretch`
+    times the base period.
+
+    :param sig: Signature of the scheduled task, as passed to add_periodic_task.
+    """
+
+    def __init__(self, run_every, sig, headroom=0.8, max_stretch=10, window=5,
+                 relative=False, nowfun=None, app=None):
+        self.sig = sig
+        self.headroom = headroom
+        self.max_stretch = max_stretch
+        self.window = window
+        super().__init__(run_every, relative=relative, nowfun=nowfun, app=app)
+
+    def effective_run_every(self):
+        try:
+            runtimes = get_task_runtimes(self.sig.task, self.sig.args, self.sig.kwargs)[:self.window]
+        except RedisError:
+            return self.run_every
+        if not runtimes:
+            return self.run_every
+        stretched = min(max(runtimes) / self.headroom, self.run_every.total_seconds() * self.max_stretch)
+        return max(self.run_every, timedelta(seconds=stretched))
+
+    def remaining_estimate(self, last_run_at):
+        return remaining(
+            self.maybe_make_aware(last_run_at), self.effective_run_every(),
+            self.maybe_make_aware(self.now()), self.relative,
+        )
+
+    def __repr__(self):
+        return f'<adaptive freq: {self.human_seconds}>'
+
+    def __reduce__(self):
+        return self.__class__, (self.run_every, self.sig, self.headroom, self.max_stretch,
+                                self.window, self.relative, self.nowfun)
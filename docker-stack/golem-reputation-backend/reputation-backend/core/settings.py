@@ -54,6 +54,9 @@ USE_TZ = False
 TIME_ZONE = "Europe/Copenhagen"
 
 CELERY_TASK_RESULT_EXPIRES = 3600  # Expire tasks after 1 hour
+
+# Port of the Prometheus /metrics endpoint served by each Celery worker
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9808"))
 # Fargate container metadata
 if 'ECS_CONTAINER_METADATA_URI' in os.environ:
     METADATA_URI = os.environ['ECS_CONTAINER_METADATA_URI']
@@ -79,6 +82,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "core.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     # 'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -130,10 +134,12 @@ DATABASES = {
     }
 }
 
-# Unit tests
+# Unit tests, on sqlite unless TEST_POSTGRES is set. The migrations do not
+# apply on sqlite (0052 removes a field before its index), so run the suite
+# with TEST_POSTGRES=1 against Postgres, as the CI workflow does.
 if (
     "test" in sys.argv or "test_coverage" in sys.argv
-):  # Covers regular testing and django-coverage
+) and not os.environ.get("TEST_POSTGRES"):  # Covers regular testing and django-coverage
     DATABASES["default"]["ENGINE"] = "django.db.backends.sqlite3"
     DATABASES["default"]["NAME"] = ":memory:"
 
@@ -194,8 +200,13 @@ USE_I18N = True
 
 USE_L10N = True
 
-broker_url = "redis://redis:6379/0"
-result_backend = "redis://redis:6379/0"
+# Shared by the Celery broker and every Redis client, see core/redis_clients.py
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
+# Connections per process and pool
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "50"))
+
+broker_url = REDIS_URL
+result_backend = REDIS_URL
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
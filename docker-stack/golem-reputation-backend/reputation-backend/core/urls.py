@@ -15,6 +15,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import include, path
+from core.metrics import metrics_view
 
 
 
@@ -22,4 +23,5 @@ urlpatterns = [
     path('v1/', include('api.urls')),
     path('v2/', include('api2.urls')),
     path('stats/', include('stats.urls')),
+    path('metrics', metrics_view),
 ]
@@ -7,9 +7,8 @@ from django.db.models import Value as V
 from ninja import NinjaAPI
 from api.models import Provider, TaskCompletion, MemoryBenchmark, DiskBenchmark, CpuBenchmark, NetworkBenchmark, Offer
 from .schemas import TaskParticipationSchema, ProviderDetailsResponseSchema
-import redis
+from core.redis_clients import redis_client, async_redis
 import json
-redis_client = redis.Redis(host='redis', port=6379, db=0)
 api = NinjaAPI(
     title="Golem Reputation Stats API",
     version="1.0.0",
@@ -378,10 +377,13 @@ def online_provider_summary(request):
                         100) if provider.total_count > 0 else None
         is_blacklisted_provider = provider.node_id in blacklisted_providers
 
-        # Determine the correct payment address key based on network
-        payment_address_key = 'golem.com.payment.platform.erc20-mainnet-glm.address' if provider.network == 'mainnet' else 'golem.com.payment.platform.erc20-holesky-tglm.address'
-        is_blacklisted_wallet = provider.payment_addresses.get(
-            payment_address_key) in blacklisted_wallets
+        # Mainnet providers use the indexed wallet column, testnet ones their holesky address
+        if provider.network == 'mainnet':
+            wallet_address = provider.wallet_address
+        else:
+            wallet_address = provider.payment_addresses.get(
+                'golem.com.payment.platform.erc20-holesky-tglm.address')
+        is_blacklisted_wallet = wallet_address in blacklisted_wallets
 
         result.append({
             "node_id": provider.node_id,
@@ -415,14 +417,15 @@ def get_gpu_benchmark(request, node_id: str):
 
 
 @api.get("/network/uptime", tags=["Stats"])
-def get_cached_uptime(request):
+async def get_cached_uptime(request):
     """
     Retrieve cached provider uptime statistics from Redis.
 
     Returns:
         JsonResponse: A JSON response containing the uptime statistics.
     """
-    uptime_data = redis_client.get('stats_provider_uptime')
+    async with async_redis() as client:
+        uptime_data = await client.get('stats_provider_uptime')
     if uptime_data:
         return JsonResponse(json.loads(uptime_data))
     else:
@@ -430,14 +433,15 @@ def get_cached_uptime(request):
 
 
 @api.get("/network/success-rate", tags=["Stats"])
-def get_cached_success_rate(request):
+async def get_cached_success_rate(request):
     """
     Retrieve cached provider success rate statistics from Redis.
 
     Returns:
         JsonResponse: A JSON response containing the success rate statistics.
     """
-    success_rate_data = redis_client.get('stats_provider_success_ratio')
+    async with async_redis() as client:
+        success_rate_data = await client.get('stats_provider_success_ratio')
     if success_rate_data:
         return JsonResponse(json.loads(success_rate_data))
     else:
@@ -535,16 +539,18 @@ def get_network_average_latency(request):
 
 
 @api.get("/cpu/performance-ranking", tags=["Stats"])
-def get_cpu_performance_ranking(request):
-    cached_data = redis_client.get('stats_cpu_performance_ranking')
+async def get_cpu_performance_ranking(request):
+    async with async_redis() as client:
+        cached_data = await client.get('stats_cpu_performance_ranking')
     if cached_data:
         return JsonResponse(json.loads(cached_data), safe=False)
     else:
         return JsonResponse({"error": "CPU performance ranking data not available"}, status=503)
 
 @api.get("/gpu/performance-ranking", tags=["Stats"])
-def get_gpu_performance_ranking(request):
-    cached_data = redis_client.get('stats_gpu_performance_ranking')
+async def get_gpu_performance_ranking(request):
+    async with async_redis() as client:
+        cached_data = await client.get('stats_gpu_performance_ranking')
     if cached_data:
         return JsonResponse(json.loads(cached_data), safe=False)
     else:
@@ -570,25 +576,36 @@ def get_provider_uptime(request, node_id: str):
     current_time = timezone.now()
     thirty_days_ago = current_time - timedelta(days=30)
 
-    statuses = NodeStatusHistory.objects.filter(
+    # (timestamp, is_online) of the window's statuses, one per timestamp, plus the
+    # timestamps seen online and offline, as duplicate statuses may disagree
+    statuses = []
+    online_timestamps = set()
+    offline_timestamps = set()
+    for timestamp, is_online in NodeStatusHistory.objects.filter(
         node_id=node_id,
         timestamp__gte=thirty_days_ago
-    ).order_by("timestamp")
+    ).order_by("timestamp", "id").values_list("timestamp", "is_online"):
+        (online_timestamps if is_online else offline_timestamps).add(timestamp)
+        if not statuses or statuses[-1][0] != timestamp:
+            statuses.append((timestamp, is_online))
 
     response_data = []
     last_offline_timestamp = None
 
     for day_offset in range(30):
         day = (current_time - timedelta(days=day_offset)).date()
-        day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        day_start = datetime.combine(day, datetime.min.time())
+        if timezone.is_aware(current_time):
+            day_start = timezone.make_aware(day_start)
         day_end = day_start + timedelta(days=1)
-        data_points_for_day = statuses.filter(
-            timestamp__range=(day_start, day_end)
-        ).distinct("timestamp")
-
-        if data_points_for_day.exists():
-            online_count = data_points_for_day.filter(is_online=True).count()
-            offline_count = data_points_for_day.filter(is_online=False).count()
+        data_points_for_day = [
+            (timestamp, is_online) for timestamp, is_online in statuses
+            if day_start <= timestamp <= day_end
+        ]
+
+        if data_points_for_day:
+            online_count = sum(1 for timestamp, _ in data_points_for_day if timestamp in online_timestamps)
+            offline_count = sum(1 for timestamp, _ in data_points_for_day if timestamp in offline_timestamps)
             if online_count == 0:
                 status = "offline"
             elif offline_count == 0:
@@ -597,14 +614,14 @@ def get_provider_uptime(request, node_id: str):
                 status = "outage"
 
             downtime_periods = []
-            for point in data_points_for_day:
-                if not point.is_online:
+            for timestamp, is_online in data_points_for_day:
+                if not is_online:
                     if last_offline_timestamp is None:
-                        last_offline_timestamp = point.timestamp
+                        last_offline_timestamp = timestamp
                 else:
                     if last_offline_timestamp is not None:
                         downtime_period = process_downtime(
-                            last_offline_timestamp, point.timestamp
+                            last_offline_timestamp, timestamp
                         )
                         downtime_periods.append(downtime_period)
                         last_offline_timestamp = None
@@ -622,8 +639,8 @@ def get_provider_uptime(request, node_id: str):
                 status = "unregistered"
             else:
                 # Infer status from last known status
-                last_known_status = statuses.filter(timestamp__lt=day_start).last()
-                status = "online" if last_known_status and last_known_status.is_online else "offline"
+                earlier = [is_online for timestamp, is_online in statuses if timestamp < day_start]
+                status = "online" if earlier and earlier[-1] else "offline"
 
             response_data.append(
                 {
@@ -641,13 +658,11 @@ def get_provider_uptime(request, node_id: str):
     # Reverse the list so that the most recent day is first
     response_data.reverse()
 
-    latest_status = statuses.last()
-
     return JsonResponse(
         {
             "first_seen": node.created_at.strftime("%Y-%m-%d %H:%M:%S"),
             "uptime_percentage": calculate_uptime(node_id, node),
             "data": response_data,
-            "current_status": "online" if latest_status and latest_status.is_online else "offline",
+            "current_status": "online" if statuses and statuses[-1][1] else "offline",
         }
     )
\ No newline at end of file
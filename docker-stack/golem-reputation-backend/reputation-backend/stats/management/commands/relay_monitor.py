@@ -5,7 +5,7 @@ import aiohttp
 import requests
 from django.core.management.base import BaseCommand
 from django.db.models import Q
-from api.models import NodeStatusHistory
+from api.online import aget_online_node_ids
 from api.tasks import bulk_update_node_statuses
 
 
@@ -39,10 +39,8 @@ class Command(BaseCommand):
             except requests.RequestException as e:
                 print(f"Error fetching data for prefix {prefix:02x}: {e}")
 
-        # Query the database for all online providers
-        online_providers = set(NodeStatusHistory.objects.filter(
-            is_online=True
-        ).order_by('node_id', '-timestamp').distinct('node_id').values_list('node_id', flat=True))
+        # Currently online providers according to the maintained online set
+        online_providers = await aget_online_node_ids()
 
         # Check for providers that are marked as online in the database but not in the relay data
         for provider_id in online_providers:
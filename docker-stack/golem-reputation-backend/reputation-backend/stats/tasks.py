@@ -2,26 +2,26 @@ from django.db.models import Count, Q
 from django.utils import timezone
 import requests
 from core.celery import app
+from core.scheduling import singleton_task
 from .models import DailyProviderStats
 from api.models import PingResult, NodeStatusHistory, Provider
 from api.scoring import calculate_uptime
-import redis
+from api.online import get_online_node_ids
+from core.redis_clients import redis_client
 import json
+from django.db import connection
 
-redis_client = redis.Redis(host='redis', port=6379, db=0)
 
 
 @app.task
+@singleton_task()
 def populate_daily_provider_stats():
-    url = "http://django:8002/v2/providers/scores"
-    try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-        else:
-            print(f"Error fetching data: HTTP {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
+    # The snapshot served by /v2/providers/scores for the mainnet
+    snapshot = redis_client.get('provider_scores_v2_mainnet')
+    if snapshot is None:
+        print("Provider scores are not available yet")
+        return
+    data = json.loads(snapshot)
 
     tested_providers = data['testedProviders']
     untested_providers = data['untestedProviders']
@@ -69,18 +69,10 @@ def populate_daily_provider_stats():
 
 
 @app.task
+@singleton_task()
 def cache_provider_uptime():
-    # Get the latest online status for each provider
-    latest_statuses = NodeStatusHistory.objects.filter(
-        timestamp=Subquery(
-            NodeStatusHistory.objects.filter(node_id=OuterRef('node_id'))
-            .order_by('-timestamp')
-            .values('timestamp')[:1]
-        )
-    )
-
     # Get online node_ids that also exist in the Provider model
-    online_node_ids = [status.node_id for status in latest_statuses if status.is_online]
+    online_node_ids = get_online_node_ids()
     existing_providers = Provider.objects.filter(node_id__in=online_node_ids).values_list('node_id', flat=True)
 
     uptime_data = {
@@ -114,17 +106,9 @@ def cache_provider_uptime():
 
 from django.db.models import Subquery, OuterRef
 @app.task
+@singleton_task()
 def cache_provider_success_ratio():
-    # Get the latest online status for each provider
-    latest_statuses = NodeStatusHistory.objects.filter(
-        timestamp=Subquery(
-            NodeStatusHistory.objects.filter(node_id=OuterRef('node_id'))
-            .order_by('-timestamp')
-            .values('timestamp')[:1]
-        )
-    )
-
-    online_node_ids = [status.node_id for status in latest_statuses if status.is_online]
+    online_node_ids = get_online_node_ids()
 
     # Get providers that exist in the Provider model and are online
     existing_providers = Provider.objects.filter(node_id__in=online_node_ids)
@@ -170,54 +154,45 @@ from api.models import CpuBenchmark, Offer, GPUTask
 from datetime import timedelta
 
 
-@app.task
-def cache_cpu_performance_ranking():
-    # Get the date 30 days ago
-    thirty_days_ago = timezone.now() - timedelta(days=30)
+CPU_PERFORMANCE_RANKING_SQL = """
+WITH latest_benchmark AS (
+    SELECT DISTINCT ON (provider_id) provider_id, events_per_second
+    FROM api_cpubenchmark
+    WHERE benchmark_name = 'CPU Multi-thread Benchmark'
+    ORDER BY provider_id, created_at DESC
+),
+latest_offer AS (
+    -- The JSON value covers property sets stored before cpu_brand was filled
+    SELECT DISTINCT ON (o.provider_id) o.provider_id,
+           COALESCE(op.cpu_brand, op.properties->>'golem.inf.cpu.brand') AS cpu_brand
+    FROM api_offer o
+    JOIN api_offerproperties op ON op.hash = o.properties_id
+    WHERE o.accepted
+    ORDER BY o.provider_id, o.created_at DESC
+)
+SELECT DISTINCT ON (lo.cpu_brand) lo.cpu_brand, lb.events_per_second, lb.provider_id
+FROM latest_benchmark lb
+JOIN latest_offer lo ON lo.provider_id = lb.provider_id
+WHERE lo.cpu_brand <> ''
+ORDER BY lo.cpu_brand, lb.events_per_second DESC
+"""
 
-    # Get the latest CPU Multi-thread Benchmark for each provider in the last 30 days
-    latest_benchmarks = CpuBenchmark.objects.filter(
-        #created_at__gte=thirty_days_ago,
-        benchmark_name='CPU Multi-thread Benchmark'
-    ).order_by('provider_id', '-created_at').distinct('provider_id')
-
-    # Prefetch related providers and their latest offers
-    providers = Provider.objects.filter(
-        cpubenchmark__in=latest_benchmarks
-    ).prefetch_related(
-        Prefetch(
-            'offer_set',
-            queryset=Offer.objects.filter(
-                accepted=True
-            ).order_by('-created_at'),
-            to_attr='latest_offer'
-        )
-    )
 
-    cpu_performance = []
-
-    for provider in providers:
-        benchmark = next((b for b in latest_benchmarks if b.provider_id == provider.node_id), None)
-        if benchmark and provider.latest_offer:
-            latest_offer = provider.latest_offer[0]
-            cpu_brand = latest_offer.offer.get('golem.inf.cpu.brand')
-            if cpu_brand:
-                cpu_performance.append({
-                    'cpu_brand': cpu_brand,
-                    'events_per_second': benchmark.events_per_second,
-                    'provider_id': provider.node_id
-                })
-
-    # Remove duplicates, keeping the highest performance for each CPU brand
-    unique_cpu_performance = {}
-    for item in cpu_performance:
-        cpu_brand = item['cpu_brand']
-        if cpu_brand not in unique_cpu_performance or item['events_per_second'] > unique_cpu_performance[cpu_brand]['events_per_second']:
-            unique_cpu_performance[cpu_brand] = item
+@app.task
+@singleton_task()
+def cache_cpu_performance_ranking():
+    # Best multi-thread score per CPU brand, taking each provider's latest
+    # benchmark and the brand from its latest accepted offer
+    with connection.cursor() as cursor:
+        cursor.execute(CPU_PERFORMANCE_RANKING_SQL)
+        unique_cpu_performance = [
+            {'cpu_brand': cpu_brand, 'events_per_second': events_per_second, 'provider_id': provider_id}
+            for cpu_brand, events_per_second, provider_id in cursor.fetchall()
+        ]
 
     # Sort the list from most performant to least
     sorted_cpu_performance = sorted(
-        unique_cpu_performance.values(),
+        unique_cpu_performance,
         key=lambda x: x['events_per_second'],
         reverse=True
     )
@@ -230,6 +205,7 @@ from django.db.models import JSONField
 import json
 
 @app.task
+@singleton_task()
 def cache_gpu_performance_ranking():
     # Get the date 30 days ago
     thirty_days_ago = timezone.now() - timedelta(days=30)
@@ -1,3 +1,60 @@
-from django.test import TestCase
+import importlib
+import json
+from django.apps import apps
+from api.models import OfferProperties
+from api.query_budgets import QueryBudgetTestCase
+from core.scheduling import run_unlocked
+from stats.tasks import cache_cpu_performance_ranking
 
-# Create your tests here.
+typed_columns_migration = importlib.import_module('api.migrations.0060_offerproperties_typed_columns')
+
+
+class StatsQueryBudgetTests(QueryBudgetTestCase):
+    # Path: (queries, per provider, seconds)
+    budgets = {
+        '/stats/benchmark/cpu/{node_id}': (3, 0, 2),
+        '/stats/benchmark/memory/seq/single/{node_id}': (3, 0, 2),
+        '/stats/benchmark/memory/rand/multi/{node_id}': (3, 0, 2),
+        '/stats/benchmark/disk/fileio_rand/{node_id}': (3, 0, 2),
+        '/stats/benchmark/disk/fileio_seq/{node_id}': (3, 0, 2),
+        '/stats/benchmark/network/{node_id}': (3, 0, 2),
+        '/stats/benchmark/gpu/{gpu_node_id}': (3, 0, 2),
+        '/stats/provider/{node_id}/details': (8, 0, 2),
+        '/stats/providers/online': (4, 0, 2),
+        '/stats/network/uptime': (0, 0, 2),
+        '/stats/network/success-rate': (0, 0, 2),
+        '/stats/ping/average/{node_id}': (8, 0, 2),
+        '/stats/network/average-latency': (14, 0, 2),
+        '/stats/cpu/performance-ranking': (0, 0, 2),
+        '/stats/gpu/performance-ranking': (0, 0, 2),
+        '/stats/provider/uptime/{node_id}': (4, 0, 2),
+    }
+
+    def test_endpoints_stay_within_budget(self):
+        for path, (queries, per_provider, seconds) in self.budgets.items():
+            path = path.format(node_id=self.node_id, gpu_node_id=self.gpu_node_id)
+            with self.subTest(path=path):
+                with self.assertWithinBudget(path, self.budget(queries, per_provider), seconds):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+
+
+class CpuPerformanceRankingTests(QueryBudgetTestCase):
+    def ranking(self):
+        run_unlocked(cache_cpu_performance_ranking)
+        return json.loads(self.redis.get('stats_cpu_performance_ranking'))
+
+    def test_property_sets_without_typed_columns_are_ranked(self):
+        ranking = self.ranking()
+        self.assertTrue(ranking)
+        # As stored before migration 0060
+        OfferProperties.objects.update(**{column: None for column in OfferProperties.TYPED_PROPERTIES})
+        self.assertEqual(self.ranking(), ranking)
+
+    def test_migration_fills_the_typed_columns(self):
+        OfferProperties.objects.update(**{column: None for column in OfferProperties.TYPED_PROPERTIES})
+        typed_columns_migration.fill_typed_columns(apps, None)
+        for offer_properties in OfferProperties.objects.all():
+            for column, value in OfferProperties.typed_values(offer_properties.properties).items():
+                self.assertEqual(getattr(offer_properties, column), value)
+        self.assertTrue(OfferProperties.objects.filter(cpu_brand__isnull=False).exists())